@@ -0,0 +1,329 @@
+from __future__ import print_function
+import sys, os
+import json, time, glob
+import threading
+import datetime as d
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from .CPTPool import CPTPool
+from .Downloader import Downloader
+from .DownloadCache import DownloadCache
+from .FileManager import FileManager
+from .PYCPT import PYCPT
+from .Planner import Planner
+
+
+class Batch:
+	"""Class for running many saved .pycpt configurations at once, each in its own work directory, and reporting how each one went
+	Identical IRIDL queries are only downloaded once per batch (see IRIDL.download), and every run shares one CPTPool
+	With superset, configs over overlapping domains share one download per dataset for a box around all of them, and each cuts its own domain out of it
+	---------------------------------------------------------------------------
+	Variables:
+		configs (list)	:	paths of the .pycpt files to run
+		root (str)		:	directory every config gets its own work folder in - root/<config name>. None keeps each config's own workdir / work
+		runs (int)		:	number of configs running at the same time
+		workers (int)	:	workers passed to PYCPT.execute for each config
+		pool (CPTPool)	:	CPTPool shared by every config
+		downloaded (dict):	url -> file for every IRIDL query a config in this run() fetched, shared by all of them - so force_download refreshes each query once per batch
+		report (list)	:	one dict per config - name, config, directory, status, walltime, stage (where it failed), failed (failed steps), skipped, error
+		verbose (bool)	:	whether or not to print progress - the configs themselves always run quietly and log to their results.out
+	---------------------------------------------------------------------------
+	Class Methods (callable without instantiation):
+		find(configs: str or list) -> list (expands a directory, a glob, or a list of either into .pycpt file paths)
+		bound(boxes: list, growth: float) -> list of (box, members) (groups overlapping (sla, nla, wlo, elo) boxes under one bounding box, as long as it isnt more than 'growth' times their combined area)
+		dataset(url: str) -> str (what the IRIDL publishes on its own schedule - the query up to its first (start date))
+		available(cache: DownloadCache) -> dict (days after the 1st of the forecast month each dataset's forecasts first answered, from past warm() calls - kept in the cache as available.json)
+		expected(history: dict, url: str, monf: str, fyr: int) -> datetime (when url's forecasts should be there, a day before the earliest the history has seen. None if it hasnt seen its dataset yet)
+	---------------------------------------------------------------------------
+	Object Methods:
+		__init__(configs: str or list, root: str, runs: int, workers: int, cpt_workers: int, verbose: bool) -> Batch
+		validate_args(configs: list, root: str, runs: int, workers: int) -> Boolean
+		load(name: str, config: str, **changes) -> PYCPT (loads a config, pointed at its work folder in root - changes replace fields of the saved config, like monf and fyr)
+		plan() -> dict (estimates every config with PYCPT.plan and when the whole batch should finish, without running anything)
+		supersets(growth: float) -> list (one IRIDL query per dataset, over a box bounding every config's domain for it - see DownloadCache.box)
+		prefetch(urls: list) -> list (downloads queries into the DownloadCache, so each config's own smaller queries are cut from them instead of downloaded. returns the ones that failed)
+		upcoming(monf: str, fyr: int) -> dict (url -> (monf, fyr) of the forecasts it's downloaded for, for every url the configs will download - see IRIDL.sources. None keeps each config's own monf / fyr)
+		warm(monf: str, fyr: int, poll: float, until: float) -> list (downloads upcoming() into the DownloadCache, trying what the IRIDL doesnt have yet again every poll seconds until until (a time.time()) - returns the urls still missing)
+		run(superset: bool) -> list (runs every config, returns the report. superset prefetches supersets() first)
+		run_one(name: str, config: str) -> dict (runs one config, returns its line of the report)
+		write_report(fname: str) -> None (writes the report as JSON, plus a .txt table next to it)
+	---------------------------------------------------------------------------"""
+
+	months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'] #monf, as the configs spell it
+
+	def __init__(self, configs, root=None, runs=2, workers=2, cpt_workers=None, verbose=True):
+		self.verbose = verbose
+		self.configs = Batch.find(configs)
+		if not self.validate_args(self.configs, root, runs, workers):
+			raise ValueError('Invalid Batch parameters')
+		self.root, self.runs, self.workers = root, runs, workers
+		self.pool = CPTPool(cpt_workers, verbose=verbose)
+		self.names = self.unique_names(self.configs)
+		self.report = []
+		self.downloaded = {}
+		self.lock = threading.Lock()
+
+	def validate_args(self, configs, root, runs, workers):
+		retval = True
+		if len(configs) == 0:
+			print('No .pycpt configs found')
+			retval = retval and False
+		if root is not None and not Path(root).parent.absolute().is_dir():
+			print('root must be inside an existing directory')
+			retval = retval and False
+		if type(runs) != int or runs < 1:
+			print('runs must be an int >= 1')
+			retval = retval and False
+		if type(workers) != int or workers < 1:
+			print('workers must be an int >= 1')
+			retval = retval and False
+		return retval
+
+	@classmethod
+	def find(self, configs):
+		configs = [configs] if type(configs) == str or isinstance(configs, Path) else configs
+		found = []
+		for pattern in configs:
+			if os.path.isdir(str(pattern)):
+				found.extend(sorted(glob.glob(os.path.join(str(pattern), '*.pycpt'))))
+			else:
+				found.extend(sorted(glob.glob(str(pattern))))
+		return [path for i, path in enumerate(found) if path not in found[:i]] #same file twice would race itself
+
+	def unique_names(self, configs):
+		"""work folder name for each config - its file name, with a number added if two configs are named the same"""
+		names, seen = [], {}
+		for config in configs:
+			name = Path(config).name.split('.')[0]
+			seen[name] = seen.get(name, 0) + 1
+			names.append(name if seen[name] == 1 else '{}_{}'.format(name, seen[name]))
+		return names
+
+	def load(self, name, config, **changes):
+		f = open(str(config), 'r')
+		params = json.loads(f.read())
+		f.close()
+		params.update({key: [value] * len(params[key]) if type(params.get(key)) == list and type(value) != list else value for key, value in changes.items()}) #one monf for every target season
+		py = PYCPT.from_dict(params)
+		if self.root is not None:
+			py.workdir, py.work = str(Path(self.root).absolute()), name
+		py.verbose = False #runs are interleaved, so print to each work dir's results.out instead
+		return py
+
+	def plan(self):
+		"""dry run of the whole batch - plans each config with its share of the CPT pool, then lines the configs up 'runs' at a time like run() would"""
+		plans, slots = [], [0.0] * self.runs
+		for i in range(len(self.configs)):
+			try:
+				plan = self.load(self.names[i], self.configs[i]).plan(workers=self.workers, cpt_workers=max(1, self.pool.workers // self.runs))
+			except Exception as e:
+				plans.append({'work': self.names[i], 'error': '{}: {}'.format(type(e).__name__, e), 'makespan': 0.0, 'bytes': 0, 'start': None, 'end': None})
+				continue
+			slot = slots.index(min(slots)) #next config starts as soon as a run slot frees up
+			plan['start'], plan['end'] = slots[slot], slots[slot] + plan['makespan']
+			slots[slot] = plan['end']
+			plans.append(plan)
+		batch = {'configs': plans, 'bytes': sum(plan['bytes'] for plan in plans), 'makespan': max(slots), 'runs': self.runs}
+		if self.verbose:
+			for plan in plans:
+				if 'error' in plan:
+					print('{:<30} could not be planned - {}'.format(plan['work'], plan['error']))
+				else:
+					print('{:<30} ~{:>7.1f} MB  ~{:>6.1f} min  (starts at ~{:.1f} min, critical path {})'.format(plan['work'], plan['bytes'] / 1e6, plan['makespan'] / 60.0, plan['start'] / 60.0, ' -> '.join(Planner.kind(name) for name in plan['critical_path'])))
+			print('Batch of {} configs, {} at a time: ~{:.1f} MB to download, expected to finish in ~{:.1f} min'.format(len(plans), self.runs, batch['bytes'] / 1e6, batch['makespan'] / 60.0))
+		return batch
+
+	@classmethod
+	def bound(self, boxes, growth=2.0):
+		groups = []
+		for box in sorted(set(boxes), key=lambda b: -(b[1] - b[0]) * (b[3] - b[2])): #biggest first, so smaller ones mostly land inside a group already
+			area = (box[1] - box[0]) * (box[3] - box[2])
+			for group in groups:
+				union = (min(group[0][0], box[0]), max(group[0][1], box[1]), min(group[0][2], box[2]), max(group[0][3], box[3]))
+				if (union[1] - union[0]) * (union[3] - union[2]) <= growth * (group[2] + area): #far apart domains would mostly download ocean in between
+					group[0], group[2] = union, group[2] + area
+					group[1].append(box)
+					break
+			else:
+				groups.append([box, [box], area])
+		return [(group[0], group[1]) for group in groups]
+
+	def supersets(self, growth=2.0):
+		"""queries for one bounding box per dataset, instead of one box per config - only for datasets more than one config asks for"""
+		templates = {} #url with the box taken out -> urls of every config for it
+		for i in range(len(self.configs)):
+			py = self.load(self.names[i], self.configs[i])
+			py.force_download = False #just looking - never wipe a work folder
+			py.initialize()
+			for iridl in py.IRIDLs:
+				for url in [iridl.query(None, 'Observations')] + [iridl.query(model, datatype) for model in py.models for datatype in ['Hindcasts', 'Forecasts']]:
+					template, box = DownloadCache.box(url)
+					if template is not None and url not in templates.setdefault(template, []):
+						templates[template].append(url)
+			py.reset()
+		urls = []
+		for template in templates:
+			boxes = {DownloadCache.box(url)[1]: url for url in templates[template]}
+			for box, members in Batch.bound(list(boxes.keys()), growth):
+				if len(members) > 1:
+					urls.append(boxes[box] if box in boxes else DownloadCache.with_box(templates[template][0], box)) #the union may just be one config's own box
+		if self.verbose:
+			print('{} bounding queries cover {} queries from {} configs'.format(len(urls), sum(len(v) for v in templates.values()), len(self.configs)))
+		return urls
+
+	def prefetch(self, urls):
+		cache = DownloadCache.shared()
+		if cache is None:
+			if self.verbose:
+				print('Download cache is off - nothing to cut config domains from, skipping superset downloads')
+			return []
+		def one(url):
+			try:
+				cache.fetch(url, None, lambda path: Downloader.shared().download(url, path, check=FileManager.check_tsv))
+				return None
+			except Exception as e:
+				if self.verbose:
+					print('Superset download failed, configs will download their own domains - {}: {}'.format(type(e).__name__, e))
+				return url
+		with ThreadPoolExecutor(max_workers=4) as executor:
+			return [url for url in executor.map(one, urls) if url is not None]
+
+	def upcoming(self, monf=None, fyr=None):
+		"""every url the configs will download when they're run for forecasts from monf fyr, and the (monf, fyr) each is for - hindcasts and observations are the same every month, so the cache has them already unless the configs changed"""
+		changes = dict(([('monf', monf)] if monf is not None else []) + ([('fyr', fyr)] if fyr is not None else []))
+		urls = {}
+		for i in range(len(self.configs)):
+			py = self.load(self.names[i], self.configs[i], **changes)
+			py.force_download = False #just looking - never wipe a work folder
+			py.initialize()
+			for iridl in py.IRIDLs:
+				for model in py.models:
+					for url in iridl.sources(model):
+						urls.setdefault(url, (iridl.forecasts_tgt.monf, int(iridl.forecasts_domain.fyr)))
+			py.reset()
+		return urls
+
+	@classmethod
+	def dataset(self, url):
+		return url.split('%28')[0]
+
+	@classmethod
+	def available(self, cache):
+		try:
+			f = open(os.path.join(cache.root, 'available.json'), 'r')
+			history = json.load(f)
+			f.close()
+		except (IOError, OSError, ValueError):
+			return {}
+		return history
+
+	@classmethod
+	def expected(self, history, url, monf, fyr):
+		days = history.get(Batch.dataset(url))
+		if not days:
+			return None
+		return d.datetime(int(fyr), Batch.months.index(monf) + 1, 1) + d.timedelta(days=min(days) - 1)
+
+	def warm(self, monf=None, fyr=None, poll=3600.0, until=None):
+		"""fills the DownloadCache with everything the configs need for forecasts from monf fyr (each config's own by default), so their run downloads nothing. what the IRIDL doesnt have yet is tried again every poll seconds -
+		or, once past warm() calls have seen when a dataset's forecasts usually show up, not before the day ahead of that. gives up at until (a time.time(), None waits for everything)"""
+		cache = DownloadCache.shared()
+		if cache is None:
+			if self.verbose:
+				print('Download cache is off - nowhere to download ahead of the run to, skipping prefetch')
+			return []
+		urls = self.upcoming(monf, fyr)
+		pending, missed = list(urls.keys()), set()
+		history = Batch.available(cache)
+		if self.verbose:
+			print('{} Prefetching {} queries for {} configs'.format(d.datetime.now(), len(urls), len(self.configs)))
+		def one(url):
+			try:
+				cache.fetch(url, None, lambda path: Downloader.shared().download(url, path, check=FileManager.check_tsv))
+				return url, None
+			except Exception as e:
+				return url, e
+		while True:
+			now = d.datetime.now()
+			due = [url for url in pending if (Batch.expected(history, url, *urls[url]) or now) <= now]
+			with ThreadPoolExecutor(max_workers=4) as executor:
+				results = list(executor.map(one, due))
+			for url, error in results:
+				if error is not None:
+					missed.add(url)
+					continue
+				pending.remove(url)
+				if url in missed: #we saw it show up, give or take poll - remember when, for next month
+					monf_url, fyr_url = urls[url]
+					days = history.get(Batch.dataset(url), []) + [(d.date.today() - d.date(fyr_url, Batch.months.index(monf_url) + 1, 1)).days]
+					history[Batch.dataset(url)] = days[-12:]
+					f = open(os.path.join(cache.root, 'available.json.part'), 'w')
+					json.dump(history, f)
+					f.close()
+					os.replace(os.path.join(cache.root, 'available.json.part'), os.path.join(cache.root, 'available.json'))
+			if self.verbose:
+				print('{} {} of {} queries cached{}'.format(d.datetime.now(), len(urls) - len(pending), len(urls), '' if len(pending) == 0 else ' - waiting for the IRIDL to have the rest'))
+			if len(pending) == 0:
+				return []
+			expected = [Batch.expected(history, url, *urls[url]) or now for url in pending]
+			wait = max(poll, min((when - d.datetime.now()).total_seconds() for when in expected)) #nothing is due before the first one expected
+			if until is not None and time.time() + wait > until:
+				if self.verbose:
+					print('{} Gave up on {} queries - the run will download them itself'.format(d.datetime.now(), len(pending)))
+				return pending
+			time.sleep(wait)
+
+	def run(self, superset=False):
+		if self.root is not None:
+			os.makedirs(str(self.root), exist_ok=True)
+		start = time.time()
+		self.downloaded = {} #a new batch run downloads again what force_download asks for
+		if superset:
+			self.prefetch(self.supersets())
+		with ThreadPoolExecutor(max_workers=self.runs) as executor:
+			futures = [executor.submit(self.run_one, self.names[i], self.configs[i]) for i in range(len(self.configs))]
+			self.report = [future.result() for future in futures]
+		if self.verbose:
+			print('{} Batch finished: {} of {} configs succeeded in {:.1f}s'.format(d.datetime.now(), len([r for r in self.report if r['status'] == 'done']), len(self.report), time.time() - start))
+		return self.report
+
+	def run_one(self, name, config):
+		result = {'name': name, 'config': str(config), 'directory': None, 'status': 'failed', 'walltime': None, 'stage': None, 'failed': [], 'skipped': 0, 'error': None}
+		start = time.time()
+		try:
+			py = self.load(name, config)
+			result['directory'] = str(Path(py.workdir, py.work).absolute())
+			py.initialize()
+			py.cpt.pool, py.ngcpt.pool = self.pool, self.pool
+			for iridl in py.IRIDLs:
+				iridl.downloaded = self.downloaded #identical queries in different configs are fetched once per batch
+			jobs, total = [], len(py.build_jobs())
+			failed = py.execute(workers=self.workers, on_done=jobs.append)
+			if len(failed) > 0:
+				first = sorted(failed, key=lambda job: job.end)[0] #the first thing that broke is usually the cause of the rest
+				result['stage'], result['error'] = first.stage, '{}: {}'.format(type(first.error).__name__, first.error)
+				result['failed'] = [job.fail_msg for job in failed]
+			result['skipped'] = total - len(jobs) #on_done only sees jobs that ran, the rest were skipped
+			result['status'] = 'done' if len(failed) == 0 else 'failed'
+		except Exception as e:
+			result['stage'], result['error'] = 'initialize', '{}: {}'.format(type(e).__name__, e)
+		result['walltime'] = time.time() - start
+		if self.verbose:
+			with self.lock:
+				print('{} {}: {} in {:.1f}s{}'.format(d.datetime.now(), name, result['status'], result['walltime'], '' if result['stage'] is None else ' - failed at {} ({})'.format(result['stage'], result['error'])))
+				sys.stdout.flush()
+		return result
+
+	def write_report(self, fname):
+		f = open(str(fname), 'w')
+		json.dump(self.report, f, indent=4)
+		f.close()
+		f = open(str(Path(fname).with_suffix('.txt')), 'w')
+		f.write('{:<30} {:<8} {:>10} {:<12} {}\n'.format('config', 'status', 'walltime', 'stage', 'error'))
+		for r in self.report:
+			f.write('{:<30} {:<8} {:>10} {:<12} {}\n'.format(r['name'], r['status'], '{:.1f}s'.format(r['walltime']), str(r['stage'] or ''), r['error'] or ''))
+		f.close()
+
+	def __str__(self):
+		return "Batch: {} configs, {} at a time".format(len(self.configs), self.runs)
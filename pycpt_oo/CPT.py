@@ -3,10 +3,13 @@ import sys, os
 import json
 from pathlib import Path
 import platform, copy, warnings
-import subprocess
+import subprocess, shutil, tempfile
 import struct, copy, json
 import numpy as np
 import datetime as d
+from concurrent.futures import ThreadPoolExecutor
+from .CPTPool import CPTPool
+from .DownloadCache import DownloadCache
 
 
 class CPT:
@@ -20,16 +23,22 @@ class CPT:
 		mpref (str)	 :	string describing MOS- not sure why we dont use MOS but here we are
 		met (list)	 :	list of metrics to use - must be from ['Pearson','Spearman','2AFC','RocAbove','RocBelow', 'RMSE',  'Ignorance', 'RPSS', 'GROC']
 		verbose (Boolean): Whether or not to print output
+		pool (CPTPool)	 :	bounded pool every CPT invocation goes through - shared by copies of this object
 	---------------------------------------------------------------------------
 	Class Methods (callable without instantiation):
 		None
 	---------------------------------------------------------------------------
 	Object Methods:
 		callSys(arg) -> runs a system command
-		__init__(cptdir: Path, modes: Modes, MOS: str, met: list	) -> Mode (holds modes for CPT)
+		__init__(cptdir: Path, modes: Modes, MOS: str, met: list, pool: CPTPool	) -> Mode (holds modes for CPT)
 		validate_args( same as init ) -> Boolean (returns false if there are invalid parameters)
 		write_cpt_script( IRIDL: IRIDL, model: str) -> None (writes a CPT file)
-		run (IRIDL: IRIDL, model: str) -> None (Runs CPT for a given season / domain and model )
+		script_name(IRIDL: IRIDL, model: str) -> str (name of the per model / season copy of the CPT script in ./scripts/)
+		job_dir(IRIDL: IRIDL, model: str) -> str (scratch directory for one CPT invocation - holds its params file, stdout log and staged outputs)
+		publish(IRIDL: IRIDL, model: str) -> list (moves a finished job's staged outputs into ./output/ atomically, returns their paths)
+		unpacked(IRIDL: IRIDL, model: str) -> str (a directory on tmpfs that looks like the work directory, with the compressed inputs the job's params name decompressed into it - None if it names none. see DownloadCache)
+		run (IRIDL: IRIDL, model: str) -> dict (Runs CPT for a given season / domain and model, returns exit status / wall time / peak RSS / published outputs )
+		run_batch(jobs: list of (IRIDL, model)) -> list of dicts (Runs CPT for many seasons / models at once through the pool)
 		set_model_output_statistic (newmos: str) -> None (sets MOS and mpref)
 	---------------------------------------------------------------------------"""
 	def callSys(self, arg):
@@ -39,8 +48,9 @@ class CPT:
 		except:
 			subprocess.check_output(arg, shell=True)
 
-	def __init__(self, cptdir, modes, MOS, met, verbose=True):
+	def __init__(self, cptdir, modes, MOS, met, verbose=True, pool=None):
 		self.verbose = verbose
+		cptdir = os.path.abspath(cptdir) #CPT.x runs from the work directory (or its /dev/shm stand-in), not from where we were started
 		if not self.validate_args(cptdir, MOS, met):
 			print('Fix your parameters!')
 			return -999
@@ -48,6 +58,7 @@ class CPT:
 		self.modes, self.MOS, self.met = modes, MOS, met
 		self.MOSs = {"None": "noMOS", "CCA":"CCA", "PCR":"PCR", "ELR":"ELRho"} #just so we can set mpref, though its only used in filenames now
 		self.mpref = self.MOSs[self.MOS]
+		self.pool = CPTPool(verbose=verbose) if pool is None else pool #one CPT per physical core unless told otherwise
 
 	def set_model_output_statistic(self, newmos):
 		self.MOS=newmos
@@ -57,8 +68,14 @@ class CPT:
 		"""write a CPT script using an IRIDL object and a model name"""
 		MOS_options = {'CCA':611, 'PCR':612, 'ELR':614, 'None':614}
 
-		# Set up CPT parameter file
-		f=open("./scripts/params","w")
+		# Set up CPT parameter file - each model / season gets its own job directory so several CPTs can run at once
+		jobdir = self.job_dir(IRIDL, model)
+		outdir = jobdir + '/output/' #CPT writes into the staging area, run() moves everything into ./output/ once CPT is done
+		stage = IRIDL.fm.path(outdir) #paths inside the script are relative to the work directory, CPT runs there - python side uses absolute paths
+		if os.path.isdir(stage):
+			shutil.rmtree(stage) #leftovers from a previous attempt
+		os.makedirs(stage)
+		f=open(IRIDL.fm.path(jobdir, "params"),"w")
 		f.write("{}\n".format(MOS_options[self.MOS]))
 
 
@@ -203,7 +220,7 @@ class CPT:
 
 		# save goodness index
 		f.write("112\n")
-		file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_Kendallstau_'+IRIDL.hindcasts_tgt.tgt+'_'+IRIDL.hindcasts_tgt.tgt+'\n'
+		file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_Kendallstau_'+IRIDL.hindcasts_tgt.tgt+'_'+IRIDL.hindcasts_tgt.tgt+'\n'
 		f.write(file)
 
 		# Build cross-validated model
@@ -214,7 +231,7 @@ class CPT:
 			f.write("111\n")
 			#X EOF
 			f.write("302\n")
-			file= './output/'+model +'_'+ IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_EOFX_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+			file= outdir+model +'_'+ IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_EOFX_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 			f.write(file)
 			#Exit submenu
 			f.write("0\n")
@@ -222,7 +239,7 @@ class CPT:
 			f.write("111\n")
 			#Y EOF
 			f.write("312\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_EOFY_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_EOFY_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 			f.write(file)
 			#Exit submenu
 			f.write("0\n")
@@ -231,42 +248,42 @@ class CPT:
 		f.write("413\n")
 		# save Pearson's Correlation
 		f.write("1\n")
-		file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_Pearson_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+		file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_Pearson_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 		f.write(file)
 
 		# cross-validated skill maps
 		f.write("413\n")
 		# save Spearmans Correlation
 		f.write("2\n")
-		file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_Spearman_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+		file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_Spearman_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 		f.write(file)
 
 		# cross-validated skill maps
 		f.write("413\n")
 		# save 2AFC score
 		f.write("3\n")
-		file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_2AFC_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+		file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_2AFC_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 		f.write(file)
 
 		# cross-validated skill maps
 		f.write("413\n")
 		# save RocBelow score
 		f.write("15\n")
-		file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_RocBelow_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+		file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_RocBelow_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 		f.write(file)
 
 		# cross-validated skill maps
 		f.write("413\n")
 		# save RocAbove score
 		f.write("16\n")
-		file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_RocAbove_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+		file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_RocAbove_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 		f.write(file)
 
 		# cross-validated skill maps
 		f.write("413\n")
 		# save RocAbove score
 		f.write("7\n")
-		file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_RMSE_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+		file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_RMSE_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 		f.write(file)
 
 
@@ -279,7 +296,7 @@ class CPT:
 			f.write("111\n")
 			# Forecast probabilities
 			f.write("501\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_P_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_P_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			#502 # Forecast odds
 			#Exit submenu
@@ -291,7 +308,7 @@ class CPT:
 			f.write("111\n")
 			# Forecast values
 			f.write("511\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_V_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_V_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			#502 # Forecast odds
 
@@ -299,23 +316,23 @@ class CPT:
 			#######Following files are used to plot the flexible format
 			# Save cross-validated predictions
 			f.write("201\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_xvPr_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_xvPr_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			# Save deterministic forecasts [mu for Gaussian fcst pdf]
 			f.write("511\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_mu_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_mu_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			# Save prediction error variance [sigma^2 for Gaussian fcst pdf]
 			f.write("514\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_var_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_var_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			# Save z
 			f.write("532\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_z_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_z_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			# Save predictand [to build predictand pdf]
 			f.write("102\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_Obs_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'FCST_Obs_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 
 			#Exit submenu
@@ -329,27 +346,27 @@ class CPT:
 			f.write("111\n")
 			# Save cross-validated predictions
 			f.write("201\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_xvPr_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_xvPr_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			# Save deterministic forecasts [mu for Gaussian fcst pdf]
 			f.write("511\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_mu_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_mu_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			# Forecast probabilities
 			f.write("501\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_P_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_P_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			# Save prediction error variance [sigma^2 for Gaussian fcst pdf]
 			f.write("514\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_var_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_var_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			# Save z
 			f.write("532\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_z_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_z_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			# Save predictand [to build predictand pdf]
 			f.write("102\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_Obs_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+'_'+self.mpref+'FCST_Obs_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 
 			# cross-validated skill maps
@@ -360,7 +377,7 @@ class CPT:
 			f.write("413\n")
 			# save 2AFC score
 			f.write("3\n")
-			file='./output/'+model+'_'+IRIDL.fprefix+'_'+self.mpref+'_2AFC_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+			file=outdir+model+'_'+IRIDL.fprefix+'_'+self.mpref+'_2AFC_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 			f.write(file)
 			# Stop saving  (not needed in newest version of CPT)
 
@@ -396,7 +413,7 @@ class CPT:
 		f.write("111\n")
 		# Forecast probabilities --Note change in name for reforecasts:
 		f.write("501\n")
-		file='./output/'+model+'_RFCST_'+IRIDL.fprefix+'_'+IRIDL.forecasts_tgt.tgt+'_ini'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
+		file=outdir+model+'_RFCST_'+IRIDL.fprefix+'_'+IRIDL.forecasts_tgt.tgt+'_ini'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'\n'
 		f.write(file)
 		#502 # Forecast odds
 		#Exit submenu
@@ -409,7 +426,7 @@ class CPT:
 		f.write("621\n")
 		# Opens X input file
 		f.write("1\n")
-		file='./output/'+model+'_RFCST_'+IRIDL.fprefix+'_'+IRIDL.forecasts_tgt.tgt+'_ini'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'.txt\n'
+		file=outdir+model+'_RFCST_'+IRIDL.fprefix+'_'+IRIDL.forecasts_tgt.tgt+'_ini'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'.txt\n'
 		f.write(file)
 		# Nothernmost latitude
 		f.write(str(IRIDL.hindcasts_domain.nla)+'\n')
@@ -457,7 +474,7 @@ class CPT:
 		#Reliability diagram
 		f.write("431\n")
 		f.write("Y\n") #yes, save results to a file
-		file='./output/'+model+'_RFCST_reliabdiag_'+IRIDL.fprefix+'_'+IRIDL.forecasts_tgt.tgt+'_ini'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'.tsv\n'
+		file=outdir+model+'_RFCST_reliabdiag_'+IRIDL.fprefix+'_'+IRIDL.forecasts_tgt.tgt+'_ini'+IRIDL.forecasts_tgt.monf+str(IRIDL.forecasts_domain.fyr)+'.tsv\n'
 		f.write(file)
 
 		# select output format -- GrADS, so we can plot it in Python
@@ -469,21 +486,21 @@ class CPT:
 		f.write("437\n")
 		# save Ignorance (all cats)
 		f.write("101\n")
-		file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_Ignorance_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+		file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_Ignorance_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 		f.write(file)
 
 		# Probabilistic skill maps
 		f.write("437\n")
 		# save Ranked Probability Skill Score (all cats)
 		f.write("122\n")
-		file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_RPSS_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+		file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_RPSS_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 		f.write(file)
 
 		# Probabilistic skill maps
 		f.write("437\n")
 		# save Ranked Probability Skill Score (all cats)
 		f.write("131\n")
-		file='./output/'+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_GROC_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
+		file=outdir+model+'_'+IRIDL.fprefix+IRIDL.predictand+'_'+self.mpref+'_GROC_'+IRIDL.forecasts_tgt.tgt+'_'+IRIDL.forecasts_tgt.init+'\n'
 		f.write(file)
 
 
@@ -491,33 +508,85 @@ class CPT:
 		f.write("0\n")
 		f.write("0\n")
 		f.close()
-		if platform.system() == 'Windows':
-			self.callSys("cd scripts && copy params "+model+"_"+IRIDL.fprefix+"_"+self.mpref+"_"+IRIDL.forecasts_tgt.tgt+"_"+IRIDL.forecasts_tgt.init+".cpt")
-		else:
-			self.callSys("cp ./scripts/params ./scripts/"+model+"_"+IRIDL.fprefix+"_"+self.mpref+"_"+IRIDL.forecasts_tgt.tgt+"_"+IRIDL.forecasts_tgt.init+".cpt")
+		shutil.copyfile(IRIDL.fm.path(jobdir, "params"), IRIDL.fm.path("scripts", self.script_name(IRIDL, model))) #keep a copy next to the others so users can find the scripts
+
+	def script_name(self, IRIDL, model):
+		"""name of the copy of the CPT script for this model & season in ./scripts/"""
+		return model+"_"+IRIDL.fprefix+"_"+self.mpref+"_"+IRIDL.forecasts_tgt.tgt+"_"+IRIDL.forecasts_tgt.init+".cpt"
+
+	def job_dir(self, IRIDL, model):
+		"""scratch directory for one CPT invocation: params, stdout log, and output/ staging area"""
+		return "./scripts/" + self.script_name(IRIDL, model)[:-4]
+
+	def publish(self, IRIDL, model):
+		"""moves everything CPT wrote to the job's staging area into ./output/ - os.replace is atomic, so readers never see half-written files"""
+		stage = IRIDL.fm.path(self.job_dir(IRIDL, model), 'output')
+		published = []
+		for fname in sorted(os.listdir(stage)):
+			os.replace(os.path.join(stage, fname), IRIDL.fm.path('output', fname))
+			published.append('output/' + fname)
+		return published
+
+	def unpacked(self, IRIDL, model):
+		"""CPT.x only reads plain text - so for a job whose inputs the download cache stored compressed, it runs in a stand-in work directory on tmpfs instead. everything in it links back to the real one, apart from those inputs, decompressed"""
+		f = open(IRIDL.fm.path(self.job_dir(IRIDL, model), 'params'), 'r')
+		inputs = set(os.path.normpath(line.strip()) for line in f if line.startswith('./input/'))
+		f.close()
+		packed = [path for path in inputs if os.path.isfile(IRIDL.fm.path(path)) and DownloadCache.codec(IRIDL.fm.path(path)) is not None]
+		if len(packed) == 0:
+			return None
+		root = tempfile.mkdtemp(prefix='pycpt-', dir='/dev/shm' if os.access('/dev/shm', os.W_OK) else None) #memory backed where there is one - the copies only live as long as CPT does
+		try:
+			for name in os.listdir(IRIDL.fm.path()):
+				if name != 'input':
+					os.symlink(IRIDL.fm.path(name), os.path.join(root, name)) #outputs land in the real work directory
+			os.makedirs(os.path.join(root, 'input'))
+			for name in os.listdir(IRIDL.fm.path('input')):
+				if os.path.join('input', name) in packed:
+					DownloadCache.unpack(IRIDL.fm.path('input', name), os.path.join(root, 'input', name))
+				else:
+					os.symlink(IRIDL.fm.path('input', name), os.path.join(root, 'input', name))
+		except BaseException:
+			shutil.rmtree(root, ignore_errors=True)
+			raise
+		return root
 
 	def run(self, IRIDL, model):
+		jobdir = self.job_dir(IRIDL, model)
 		if self.verbose:
 			print('Executing CPT for '+model+' and initialization '+IRIDL.hindcasts_tgt.init+'...')
 		else:
-			f = open('./results.out', 'a')
+			f = open(IRIDL.fm.path('results.out'), 'a')
 			f.write('Executing CPT for '+model+' and initialization '+IRIDL.hindcasts_tgt.init+'...\n')
 			f.close()
-		try: #this calls CPT and runs it on the inputs we downloaded with the script we just wrote
-			subprocess.check_output(self.cpt + ' < ./scripts/params > ./scripts/CPT_stout_train_'+model+'_'+IRIDL.hindcasts_tgt.tgt+'_'+IRIDL.hindcasts_tgt.init+'.txt',stderr=subprocess.STDOUT, shell=True) #Calls CPT with a params.cpt input file
-		except subprocess.CalledProcessError as e:
+		unpacked = self.unpacked(IRIDL, model)
+		try:
+			result = self.pool.run_one(self.cpt, IRIDL.fm.path(jobdir, 'params'), IRIDL.fm.path(jobdir, 'CPT_stout_train_'+model+'_'+IRIDL.hindcasts_tgt.tgt+'_'+IRIDL.hindcasts_tgt.init+'.txt'), cwd=IRIDL.fm.path() if unpacked is None else unpacked, name=os.path.basename(jobdir)) #Calls CPT with this job's own params file from inside the work directory, waits for a free slot in the pool first
+		finally:
+			if unpacked is not None:
+				shutil.rmtree(unpacked, ignore_errors=True) #only removes the links, never what they point to
+		if result['returncode'] != 0 and platform.system() != 'Windows':
+			raise RuntimeError('CPT exited with {} for {} - see {}'.format(result['returncode'], model, os.path.normpath(jobdir)))
+		if result['returncode'] != 0:
 			if self.verbose:
 				print("CPT Windows version throws an error right at the end of its operation- everything should be fine for the rest of this notebook, but you need to click 'close' on the 'Access Violation' Window that pops up for now. ")
 			else:
-				f = open('./results.out', 'a')
+				f = open(IRIDL.fm.path('results.out'), 'a')
 				f.write("CPT Windows version throws an error right at the end of its operation- everything should be fine for the rest of this notebook, but you need to click 'close' on the 'Access Violation' Window that pops up for now. \n")
 				f.close()
+		result['outputs'] = self.publish(IRIDL, model) #move results into ./output/ now that CPT is done with them
 		if self.verbose:
 			print('----------------------------------------------')
 			print('Calculations for '+IRIDL.hindcasts_tgt.init+' initialization completed!')
-			print('See output folder, and check scripts/CPT_stout_train_'+ model+'_'+IRIDL.hindcasts_tgt.tgt+'_'+IRIDL.hindcasts_tgt.init+'.txt for errors')
+			print('See output folder, and check '+os.path.normpath(jobdir)+'/CPT_stout_train_'+ model+'_'+IRIDL.hindcasts_tgt.tgt+'_'+IRIDL.hindcasts_tgt.init+'.txt for errors')
 			print('----------------------------------------------')
 			print('----------------------------------------------\n\n\n')
+		return result
+
+	def run_batch(self, jobs):
+		"""runs CPT for a list of (IRIDL, model) pairs at once - the pool decides how many actually run side by side"""
+		with ThreadPoolExecutor(max_workers=self.pool.workers) as pool:
+			return list(pool.map(lambda job: self.run(job[0], job[1]), jobs))
 
 	def validate_args(self, cptdir, MOS, met):
 		retval = True
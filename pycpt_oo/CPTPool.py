@@ -0,0 +1,132 @@
+from __future__ import print_function
+import sys, os
+import platform, time
+import subprocess, threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CPTPool:
+	"""Class for running many CPT.x / CPT_batch.exe invocations at once, never more than 'workers' at a time
+	CPT is single threaded, so throughput scales with the number of cores we let it use
+	---------------------------------------------------------------------------
+	Variables:
+		workers (int)	:	maximum number of CPT processes running at the same time - defaults to the number of physical cores
+		affinity (bool or list): False to let the OS place processes, True to pin each worker slot to its own core, or a list of cpu ids to pin to
+		cpus (list)		:	cpu id each worker slot gets pinned to (empty if affinity is off or unsupported)
+		results (list)	:	one dict per finished invocation - name, returncode, walltime (s), maxrss (kB)
+		verbose (bool)	:	whether or not to print stuff
+	---------------------------------------------------------------------------
+	Class Methods (callable without instantiation):
+		physical_cores() -> int (number of physical cores we're allowed to run on)
+		core_cpus() -> list (one logical cpu id per physical core we're allowed to run on)
+	---------------------------------------------------------------------------
+	Object Methods:
+		__init__(workers: int, affinity: bool or list, verbose: bool) -> CPTPool
+		validate_args(workers: int, affinity: bool or list) -> Boolean
+		run_one(exe: str, params: str, log: str, cwd: str, name: str) -> dict (runs one CPT invocation in a free slot, blocks until its done)
+		map(jobs: list of dicts) -> list of dicts (runs a batch of invocations through the pool, returns their results in order)
+	---------------------------------------------------------------------------"""
+
+	def __init__(self, workers=None, affinity=False, verbose=True):
+		self.verbose = verbose
+		if not self.validate_args(workers, affinity):
+			raise ValueError('Invalid CPTPool parameters')
+		self.workers = CPTPool.physical_cores() if workers is None else workers
+		self.affinity = affinity
+		if affinity is True:
+			cores = CPTPool.core_cpus()
+			self.cpus = [cores[i % len(cores)] for i in range(self.workers)] #more workers than cores just doubles up
+		elif type(affinity) == list:
+			self.cpus = [affinity[i % len(affinity)] for i in range(self.workers)]
+		else:
+			self.cpus = []
+		self.results = []
+		self._slots = list(range(self.workers)) #free worker slots - a slot decides which core a process is pinned to
+		self._cond = threading.Condition()
+
+	def validate_args(self, workers, affinity):
+		retval = True
+		if workers is not None and (type(workers) != int or workers < 1):
+			print('workers must be an int >= 1, or None for one per physical core')
+			retval = retval and False
+		if affinity not in [True, False] and type(affinity) != list:
+			print('affinity must be True, False, or a list of cpu ids')
+			retval = retval and False
+		if affinity is not False and not hasattr(os, 'sched_setaffinity'):
+			if self.verbose:
+				print('CPU pinning is not supported on {} - running unpinned'.format(platform.system()))
+		return retval
+
+	@classmethod
+	def core_cpus(self):
+		"""one logical cpu id per physical core, limited to cpus this process may use (containers, taskset)"""
+		allowed = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+		cores, cpu, phys, core = {}, None, '0', None
+		try:
+			with open('/proc/cpuinfo', 'r') as f: #linux lists a block per logical cpu, hyperthreads share (physical id, core id)
+				for line in f.readlines() + ['']:
+					key, _, val = line.partition(':')
+					key, val = key.strip(), val.strip()
+					if key == 'processor':
+						cpu = int(val)
+					elif key == 'physical id':
+						phys = val
+					elif key == 'core id':
+						core = val
+					elif key == '' and cpu is not None: #blank line ends a block
+						if cpu in allowed and (phys, core if core is not None else cpu) not in cores:
+							cores[(phys, core if core is not None else cpu)] = cpu
+						cpu, phys, core = None, '0', None
+		except (IOError, OSError, ValueError):
+			return allowed #not linux - cant tell hyperthreads apart, so use every cpu
+		return sorted(cores.values()) if len(cores) > 0 else allowed
+
+	@classmethod
+	def physical_cores(self):
+		return max(1, len(CPTPool.core_cpus()))
+
+	def _acquire(self):
+		with self._cond:
+			while len(self._slots) == 0:
+				self._cond.wait()
+			return self._slots.pop(0)
+
+	def _release(self, slot):
+		with self._cond:
+			self._slots.append(slot)
+			self._cond.notify()
+
+	def run_one(self, exe, params, log, cwd=None, name=None):
+		"""runs 'exe < params > log' without a shell, in a free worker slot - returns exit status, wall time and peak RSS"""
+		slot = self._acquire() #blocks until fewer than 'workers' CPTs are running
+		try:
+			start = time.time()
+			with open(params, 'r') as stdin, open(log, 'w') as stdout:
+				proc = subprocess.Popen([exe], stdin=stdin, stdout=stdout, stderr=subprocess.STDOUT, cwd=cwd)
+			if len(self.cpus) > 0 and hasattr(os, 'sched_setaffinity'):
+				try:
+					os.sched_setaffinity(proc.pid, {self.cpus[slot]}) #pin from out here so we dont need preexec_fn, which isnt safe with threads
+				except OSError:
+					pass #process may already be gone, or the cpu went offline
+			if hasattr(os, 'wait4'): #wait4 gives us the rusage of exactly this child, so peak RSS is per job
+				_, status, usage = os.wait4(proc.pid, 0)
+				proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status) #what Popen would say - waitstatus_to_exitcode is 3.9+
+				maxrss = usage.ru_maxrss if platform.system() != 'Darwin' else usage.ru_maxrss // 1024 #mac reports bytes, linux kB
+			else:
+				proc.wait()
+				maxrss = None
+			result = {'name': name if name is not None else params, 'returncode': proc.returncode, 'walltime': time.time() - start, 'maxrss': maxrss, 'cpu': self.cpus[slot] if len(self.cpus) > 0 else None}
+		finally:
+			self._release(slot)
+		with self._cond:
+			self.results.append(result)
+		return result
+
+	def map(self, jobs):
+		"""runs a batch of invocations - jobs is a list of dicts with keys exe, params, log, and optionally cwd, name"""
+		with ThreadPoolExecutor(max_workers=self.workers) as pool: #threads just babysit processes, the real work is in CPT
+			futures = [pool.submit(self.run_one, job['exe'], job['params'], job['log'], job.get('cwd'), job.get('name')) for job in jobs]
+			return [future.result() for future in futures]
+
+	def __str__(self):
+		return "CPTPool: {} workers, pinned to {}".format(self.workers, self.cpus if len(self.cpus) > 0 else 'nothing')
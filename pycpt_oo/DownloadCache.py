@@ -0,0 +1,422 @@
+from __future__ import print_function
+import sys, os
+import time, hashlib, re, json
+import shutil, threading, gzip, io, platform
+from pathlib import Path
+from contextlib import contextmanager
+try:
+	import fcntl
+except ImportError:
+	fcntl = None #windows - runs in one process still share downloads, separate processes may both download
+try:
+	import zstandard
+except ImportError:
+	zstandard = None #optional - gzip is always there
+
+
+class DownloadCache:
+	"""Class for keeping every downloaded IRIDL file in one place on the machine, keyed by the full query url, so no work directory downloads what another already has
+	A query for a lat / lon box inside one the cache already has for the same data (same url apart from the box) is cut from that file locally instead of downloaded,
+	and a query for more years of one the cache has (same url apart from the last year) only downloads the new years and appends them
+	Files are stored compressed (gzip, or zstd if the zstandard package is installed) - FileManager reads them through reader() and CPT.run decompresses the ones CPT.x needs to tmpfs, so the only plain copies are short-lived
+	Revalidating asks the server whether a cached file changed - with the ETag / Last-Modified it was downloaded with if it sent any (kept in entry.meta), otherwise by downloading it again and comparing - and only replaces it if it did
+	Work directories get hard links to the cached files (copies if the cache is on another filesystem), and the least recently used files are deleted once the cache is over its size cap
+	---------------------------------------------------------------------------
+	Variables:
+		root (str)		:	cache directory - $PYCPT_CACHE, or ~/.cache/pycpt
+		max_bytes (int)	:	size cap - $PYCPT_CACHE_GB gigabytes, or 10GB. files linked into work directories stay there when evicted from the cache
+		compress (str)	:	how new files are stored - 'gzip', 'zstd' or 'none', $PYCPT_CACHE_COMPRESS if not given. gzip by default, none on windows where CPT cant be handed a decompressed copy
+		verbose (bool)	:	whether or not to print stuff
+	---------------------------------------------------------------------------
+	Class Methods (callable without instantiation):
+		shared() -> DownloadCache (the process-wide cache every IRIDL uses - None if $PYCPT_CACHE is 'off')
+		key(url: str) -> str (sha256 of the url)
+		box(url: str) -> (str, tuple) (the url with its lat / lon box taken out, and the box - (sla, nla, wlo, elo). (None, None) if the query cant be cut locally)
+		with_box(url: str, box: tuple) -> str (the same query for a different box)
+		years(url: str) -> (str, tuple) (the url with its start years taken out, and the years - (first, last). (None, None) if it has no year range)
+		with_years(url: str, first: int, last: int) -> str (the same query for different years)
+		validators(path: str) -> dict (the ETag / Last-Modified a file was downloaded with, from path.meta - None if there arent any)
+		note(path: str, result: dict) -> None (writes the ETag / Last-Modified of a Downloader result to path.meta)
+		codec(path: str) -> str ('gzip' or 'zstd' if the file is compressed, from its first bytes - None if its plain)
+		reader(path: str) -> file (opens a file for reading in binary, decompressing it on the fly if it is compressed)
+		pack(src: str, dest: str, codec: str) -> None (writes a compressed copy of src to dest - the same bytes for the same src, so ledger hashes only change when the data does)
+		unpack(src: str, dest: str) -> None (writes the plain contents of a possibly compressed file to dest)
+		same(a: str, b: str) -> Boolean (whether two files hold the same data, compressed or not)
+	---------------------------------------------------------------------------
+	Object Methods:
+		__init__(root: str, max_bytes: int, compress: str, verbose: bool) -> DownloadCache
+		validate_args(root: str, max_bytes: int, compress: str) -> Boolean
+		entry(url: str) -> str (where the cache keeps url's file)
+		lock(url: str, blocking: bool) -> context manager (yields whether it got the lock - holds an exclusive lock on url across threads and processes, so concurrent runs asking for the same url wait for one download)
+		fetch(url: str, dest: str, download: callable, refresh: bool, cut: callable, splice: callable, revalidate: bool) -> str (puts url's file at dest - 'cached' if the cache had it, 'cut' if cut(src, path, box) made it from a cached query for a bigger box,
+			'spliced' if splice(old, new, path) made it from a cached query for fewer years plus a download of just the rest, 'downloaded' if download(path) had to fetch it all. download(path, url) downloads some other url. dest=None only fills the cache.
+			with revalidate, a cached file is checked with the server first - 'unchanged' if it still matches, 'changed' if it was replaced)
+		revalidate(url: str, entry: str, part: str, download: callable) -> (Boolean, dict) (asks the server for url again with download(part, url, validators) - True if the cached file is still what it sends, False with the new file at part if not. and download's result)
+		cut(url: str, part: str, cut: callable) -> Boolean (makes url's file at part from the first covering query cut(src, part, box) works on)
+		covering(url: str) -> list of (url, entry) (cached queries for the same data over a box that contains url's box, smallest first)
+		splice(url: str, part: str, download: callable, splice: callable) -> Boolean (makes url's file at part from a cached query for its first years and a download of the rest)
+		prefixes(url: str) -> list of (url, entry, last) (cached queries for the same data starting the same year but ending earlier, most years first)
+		cached() -> list of (url, entry) (every query in the cache)
+		place(entry: str, dest: str) -> None (hard links a cached file to dest, or copies it)
+		size() -> int (bytes in the cache)
+		evict() -> list (deletes least recently used files until the cache is under max_bytes, returns their urls)
+	---------------------------------------------------------------------------"""
+
+	instance = None
+	instance_lock = threading.Lock()
+	thread_locks = {} #lock path -> threading.Lock, for platforms without fcntl
+	number = r'(%28)?(-?[0-9.]+)(%29)?'
+	box_pattern = re.compile('Y/{0}/{0}/RANGEEDGES/X/{0}/{0}/RANGEEDGES'.format(number)) #Y/sla/nla/RANGEEDGES/X/wlo/elo/RANGEEDGES, some sources put the numbers in (parentheses)
+	not_local = ['average', 'percentile', 'regrid', 'Average'] #after the box, these mix neighbouring cells together - a cut from a bigger box wouldnt match
+	years_pattern = re.compile(r'%20([0-9]{4})-([0-9]{4})%29/VALUES') #S/(0000 1 May 1982-2010)/VALUES - the start dates of hindcasts
+
+	def __init__(self, root=None, max_bytes=None, compress=None, verbose=True):
+		self.verbose = verbose
+		root = os.environ.get('PYCPT_CACHE', str(Path.home() / '.cache' / 'pycpt')) if root is None else root
+		max_bytes = int(float(os.environ.get('PYCPT_CACHE_GB', 10)) * 1e9) if max_bytes is None else max_bytes
+		compress = os.environ.get('PYCPT_CACHE_COMPRESS', 'none' if platform.system() == 'Windows' else 'gzip').lower() if compress is None else compress
+		if not self.validate_args(root, max_bytes, compress):
+			raise ValueError('Invalid DownloadCache parameters')
+		if compress == 'zstd' and zstandard is None:
+			print('zstd compression needs the zstandard package - storing downloads with gzip instead')
+			compress = 'gzip'
+		self.root, self.max_bytes, self.compress = str(Path(root).absolute()), max_bytes, compress
+		os.makedirs(os.path.join(self.root, 'locks'), exist_ok=True)
+
+	def validate_args(self, root, max_bytes, compress):
+		retval = True
+		if not Path(str(root)).absolute().parent.is_dir():
+			print('DownloadCache root must be inside an existing directory')
+			retval = retval and False
+		if type(max_bytes) != int or max_bytes < 0:
+			print('max_bytes must be an int >= 0')
+			retval = retval and False
+		if compress not in ['gzip', 'zstd', 'none']:
+			print("compress must be 'gzip', 'zstd' or 'none'")
+			retval = retval and False
+		return retval
+
+	@classmethod
+	def shared(self):
+		with DownloadCache.instance_lock:
+			if DownloadCache.instance is None and os.environ.get('PYCPT_CACHE', '').lower() not in ['off', 'none', '0']:
+				DownloadCache.instance = DownloadCache(verbose=False)
+			return DownloadCache.instance
+
+	@classmethod
+	def key(self, url):
+		return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+	@classmethod
+	def box(self, url):
+		matches = list(DownloadCache.box_pattern.finditer(url))
+		if len(matches) != 1 or any(word in url[matches[0].end():] for word in DownloadCache.not_local):
+			return None, None
+		m = matches[0]
+		try:
+			return url[:m.start()] + '{box}' + url[m.end():], tuple(float(m.group(i)) for i in [2, 5, 8, 11])
+		except ValueError:
+			return None, None
+
+	@classmethod
+	def with_box(self, url, box):
+		def replace(m):
+			edges = [('{:g}'.format(edge), m.group(i - 1) or '', m.group(i + 1) or '') for i, edge in zip([2, 5, 8, 11], box)]
+			return 'Y/{1}{0}{2}/{4}{3}{5}/RANGEEDGES/X/{7}{6}{8}/{10}{9}{11}/RANGEEDGES'.format(*[part for edge in edges for part in edge])
+		return DownloadCache.box_pattern.sub(replace, url, count=1)
+
+	@classmethod
+	def years(self, url):
+		matches = list(DownloadCache.years_pattern.finditer(url))
+		if len(matches) != 1:
+			return None, None
+		m = matches[0]
+		return url[:m.start()] + '{years}' + url[m.end():], (int(m.group(1)), int(m.group(2)))
+
+	@classmethod
+	def with_years(self, url, first, last):
+		return DownloadCache.years_pattern.sub('%20{}-{}%29/VALUES'.format(first, last), url, count=1)
+
+	@classmethod
+	def validators(self, path):
+		try:
+			f = open(str(path) + '.meta', 'r')
+			meta = json.load(f)
+			f.close()
+		except (IOError, OSError, ValueError):
+			return None
+		return meta if meta.get('etag') or meta.get('last_modified') else None
+
+	@classmethod
+	def note(self, path, result):
+		meta = {} if result is None else {'etag': result.get('etag'), 'last_modified': result.get('last_modified')}
+		if not meta.get('etag') and not meta.get('last_modified'):
+			if os.path.exists(str(path) + '.meta'):
+				os.remove(str(path) + '.meta') #the ones there belong to an older file
+			return
+		f = open(str(path) + '.meta.part', 'w')
+		json.dump(meta, f)
+		f.close()
+		os.replace(str(path) + '.meta.part', str(path) + '.meta')
+
+	@classmethod
+	def codec(self, path):
+		f = open(str(path), 'rb')
+		magic = f.read(4)
+		f.close()
+		if magic[:2] == b'\x1f\x8b':
+			return 'gzip'
+		if magic == b'\x28\xb5\x2f\xfd':
+			return 'zstd'
+		return None
+
+	@classmethod
+	def reader(self, path):
+		codec = DownloadCache.codec(path)
+		if codec == 'gzip':
+			return gzip.open(str(path), 'rb')
+		if codec == 'zstd':
+			if zstandard is None:
+				raise IOError('{} is zstd compressed - reading it needs the zstandard package'.format(path))
+			return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(str(path), 'rb'), closefd=True), 1 << 20)
+		return open(str(path), 'rb')
+
+	@classmethod
+	def pack(self, src, dest, codec='gzip'):
+		with open(str(src), 'rb') as f, open(str(dest), 'wb') as out:
+			if codec == 'zstd':
+				with zstandard.ZstdCompressor(level=3).stream_writer(out, closefd=False) as z:
+					shutil.copyfileobj(f, z, 1 << 20)
+			else:
+				with gzip.GzipFile(filename='', mode='wb', fileobj=out, compresslevel=6, mtime=0) as z: #no name or time in the header, so the same data always packs to the same bytes
+					shutil.copyfileobj(f, z, 1 << 20)
+
+	@classmethod
+	def unpack(self, src, dest):
+		with DownloadCache.reader(src) as f, open(str(dest), 'wb') as out:
+			shutil.copyfileobj(f, out, 1 << 20)
+
+	@classmethod
+	def same(self, a, b):
+		with DownloadCache.reader(a) as f, DownloadCache.reader(b) as g:
+			while True:
+				x, y = f.read(1 << 20), g.read(1 << 20)
+				if x != y:
+					return False
+				if len(x) == 0:
+					return True
+
+	def entry(self, url):
+		key = DownloadCache.key(url)
+		return os.path.join(self.root, key[:2], key + '.tsv') #first two hex digits as a folder, so no one folder gets huge
+
+	@contextmanager
+	def lock(self, url, blocking=True):
+		path = os.path.join(self.root, 'locks', DownloadCache.key(url) + '.lock')
+		if fcntl is None:
+			with DownloadCache.instance_lock:
+				lock = DownloadCache.thread_locks.setdefault(path, threading.Lock())
+			got = lock.acquire(blocking)
+			try:
+				yield got
+			finally:
+				if got:
+					lock.release()
+			return
+		f = open(path, 'a') #a separate open file per caller - flock treats those as separate owners even inside one process
+		try:
+			try:
+				fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+				got = True
+			except (IOError, OSError):
+				got = False
+			yield got
+		finally:
+			f.close() #closing drops the lock
+
+	def fetch(self, url, dest, download, refresh=False, cut=None, splice=None, revalidate=False):
+		entry = self.entry(url)
+		os.makedirs(os.path.dirname(entry), exist_ok=True)
+		with self.lock(url):
+			how = 'downloaded' if refresh or not os.path.isfile(entry) else 'cached'
+			part = '{}.{}.part'.format(entry, threading.get_ident())
+			try:
+				result = None
+				if how == 'cached' and revalidate:
+					same, result = self.revalidate(url, entry, part, download)
+					how = 'unchanged' if same else 'changed'
+				if how == 'downloaded':
+					if cut is not None and not refresh and self.cut(url, part, cut):
+						how = 'cut'
+					elif splice is not None and not refresh and self.splice(url, part, download, splice):
+						how = 'spliced'
+					else:
+						result = download(part)
+				if how not in ['cached', 'unchanged']: #a changed file is already at part too
+					f = open(entry + '.url', 'w') #before the data, so evict can always find the url of an entry
+					f.write(url)
+					f.close()
+					if self.compress != 'none' and DownloadCache.codec(part) is None:
+						DownloadCache.pack(part, part + '.packed', self.compress)
+						os.replace(part + '.packed', part)
+					os.replace(part, entry) #readers only ever see whole files
+					DownloadCache.note(entry, result) #cut or spliced files were never sent by the server, so theres nothing to revalidate them with
+				elif os.path.isfile(entry + '.url'):
+					os.utime(entry + '.url') #the sidecar's mtime is the entry's last use - touching the data file would change mtimes in every work dir linked to it
+			finally:
+				for path in [part, part + '.packed']:
+					if os.path.exists(path):
+						os.remove(path)
+			if dest is not None:
+				self.place(entry, str(dest))
+		if how not in ['cached', 'unchanged']:
+			self.evict()
+		return how
+
+	def revalidate(self, url, entry, part, download):
+		"""asks the server whether url's cached file changed - (True, result) if it didnt, (False, result) with the new file left at part if it did"""
+		validators = DownloadCache.validators(entry)
+		result = download(part, url, validators)
+		if result is not None and result.get('status') == 304:
+			return True, result
+		if DownloadCache.same(part, entry): #the server cant say - same bytes as before means nothing changed either
+			DownloadCache.note(entry, result) #and next time it can
+			os.remove(part)
+			return True, result
+		return False, result
+
+	def cut(self, url, part, cut):
+		"""makes url's file from a cached query for a bigger box, if there is one - returns True if it did"""
+		template, box = DownloadCache.box(url)
+		if template is None:
+			return False
+		for other, entry in self.covering(url):
+			with self.lock(other, blocking=False) as got: #never wait on another url while holding this one's lock - and evict cant drop it while we read
+				if not got or not os.path.isfile(entry):
+					continue
+				try:
+					cut(entry, part, box)
+				except (ValueError, IndexError) as e:
+					if self.verbose:
+						print('Could not cut {} from {} - {}'.format(url, other, e))
+					continue
+				if self.verbose:
+					print('Cut {} from the cached {}'.format(url, other))
+				return True
+		return False
+
+	def splice(self, url, part, download, splice):
+		"""makes url's file from a cached query for its first years plus a download of the years after them - returns True if it did"""
+		template, years = DownloadCache.years(url)
+		if template is None:
+			return False
+		for other, entry, last in self.prefixes(url):
+			with self.lock(other, blocking=False) as got:
+				if not got or not os.path.isfile(entry):
+					continue
+				tail = part + '.tail'
+				try:
+					download(tail, DownloadCache.with_years(url, last + 1, years[1])) #just the new years
+					added = splice(entry, tail, part)
+				except (ValueError, IndexError) as e:
+					if self.verbose:
+						print('Could not add the new years of {} to {} - {}'.format(url, other, e))
+					continue
+				finally:
+					if os.path.exists(tail):
+						os.remove(tail)
+				if self.verbose:
+					print('Added {} years to the cached {}'.format(added, other))
+				return True
+		return False
+
+	def prefixes(self, url):
+		template, years = DownloadCache.years(url)
+		if template is None:
+			return []
+		found = []
+		for other, entry in self.cached():
+			other_template, other_years = DownloadCache.years(other)
+			if other_template == template and other_years[0] == years[0] and other_years[1] < years[1]:
+				found.append((other_years[1], other, entry))
+		return [(other, entry, last) for last, other, entry in sorted(found, reverse=True)] #most years first - least left to download
+
+	def cached(self):
+		found = []
+		for entry in self.entries():
+			try:
+				f = open(entry + '.url', 'r')
+				found.append((f.read().strip(), entry))
+				f.close()
+			except (IOError, OSError):
+				continue #evicted while we looked
+		return found
+
+	def covering(self, url):
+		template, box = DownloadCache.box(url)
+		if template is None:
+			return []
+		found = []
+		for other, entry in self.cached():
+			other_template, other_box = DownloadCache.box(other)
+			if other == url or other_template != template:
+				continue
+			sla, nla, wlo, elo = other_box
+			if sla <= box[0] and box[1] <= nla and wlo <= box[2] and box[3] <= elo:
+				found.append(((nla - sla) * (elo - wlo), other, entry))
+		return [(other, entry) for area, other, entry in sorted(found)] #smallest box first - least to read through
+
+	def place(self, entry, dest):
+		if os.path.exists(dest) or os.path.islink(dest):
+			os.remove(dest) #never write through an old link into the cache
+		try:
+			os.link(entry, dest) #same bytes, no copy - CPT only reads its inputs
+		except OSError:
+			shutil.copyfile(entry, dest) #different filesystem, or the filesystem cant link
+
+	def entries(self):
+		found = []
+		for sub in os.listdir(self.root):
+			if sub == 'locks' or not os.path.isdir(os.path.join(self.root, sub)):
+				continue
+			for name in os.listdir(os.path.join(self.root, sub)):
+				if name.endswith('.tsv'):
+					found.append(os.path.join(self.root, sub, name))
+		return found
+
+	def size(self):
+		return sum(os.path.getsize(path) for path in self.entries() if os.path.isfile(path))
+
+	def evict(self):
+		entries = []
+		for path in self.entries():
+			try:
+				used = os.path.getmtime(path + '.url') if os.path.isfile(path + '.url') else os.path.getmtime(path)
+				entries.append((used, os.path.getsize(path), path))
+			except OSError:
+				continue #another process evicted it while we looked
+		total, evicted = sum(size for used, size, path in entries), []
+		for used, size, path in sorted(entries):
+			if total <= self.max_bytes:
+				break
+			url = None
+			if os.path.isfile(path + '.url'):
+				f = open(path + '.url', 'r')
+				url = f.read().strip()
+				f.close()
+			if url is None:
+				continue #cant lock what we cant name - leave it
+			with self.lock(url, blocking=False) as got:
+				if not got:
+					continue #someone is reading or writing it right now
+				for name in [path, path + '.url', path + '.meta']: #lock files stay - deleting one someone else has open would let two owners in
+					if os.path.exists(name):
+						os.remove(name)
+			total -= size
+			evicted.append(url)
+		if self.verbose and len(evicted) > 0:
+			print('Evicted {} files from the download cache, {:.1f} MB left'.format(len(evicted), total / 1e6))
+		return evicted
+
+	def __str__(self):
+		return "DownloadCache {}: {:.1f} of {:.1f} MB, {} compressed".format(self.root, self.size() / 1e6, self.max_bytes / 1e6, self.compress)
@@ -0,0 +1,429 @@
+from __future__ import print_function
+import sys, os
+import time, ssl, random, shutil
+import asyncio, threading
+from urllib.parse import urlsplit, urlunsplit, urljoin
+
+
+class HTTPStatusError(IOError):
+	"""the server answered, but not with the file - status is the HTTP status code"""
+	def __init__(self, status, message):
+		IOError.__init__(self, message)
+		self.status = status
+
+
+class Downloader:
+	"""Class for downloading IRIDL queries inside the python process instead of spawning curl for each file
+	One asyncio event loop runs in a background thread and keeps connections open between requests, so a run pays for a TLS handshake once per host, not once per file
+	Callers on any thread use the blocking download / download_many, which hand the work to the loop and wait for it
+	Files are written to path.download and only renamed to path once they're complete and pass check - failures are retried with exponential backoff, picking up where they stopped if the server takes Range requests
+	A host can have mirrors - other servers answering the same queries. Each try goes to the fastest one that hasnt failed lately, and with hedge set a slow try gets a copy sent to the next one, first to finish wins
+	---------------------------------------------------------------------------
+	Variables:
+		per_host (int)	:	maximum number of requests to one host at the same time - the IRIDL builds each file on request, so dont hammer it
+		timeout (float)	:	seconds to wait for any single read from the server before giving up
+		verify (bool)	:	whether to check TLS certificates - False matches the curl -k we used to call
+		chunk (int)		:	bytes read from the socket and written to disk at a time, so a file is never held in memory
+		retries (int)	:	times a failed download is tried again - connection errors, timeouts, 5xx / 408 / 429 answers, failed resumes, and files check rejects. other 4xx answers are never retried
+		backoff (float)	:	seconds before the first retry, doubled (with jitter) for each one after
+		mirrors (dict)	:	host -> list of 'scheme://host:port' of servers that answer the same queries - PYCPT_MIRRORS='iridl.ldeo.columbia.edu=http://localhost:8080,https://...;host2=...' if not given
+		hedge (float)	:	seconds a try can go without finishing before the same request goes to the next mirror as well - PYCPT_HEDGE if not given, None never hedges
+		cooldown (float):	seconds a server that just failed is tried last, doubled for each failure in a row (up to 10 minutes)
+		latency (dict)	:	(scheme, host, port) -> moving average of seconds until a server starts answering - what mirrors are ranked by
+		down (dict)		:	(scheme, host, port) -> time until which that server is tried last
+		loop (AbstractEventLoop): the event loop every download runs on
+		verbose (bool)	:	whether or not to print stuff
+	---------------------------------------------------------------------------
+	Class Methods (callable without instantiation):
+		shared() -> Downloader (the process-wide Downloader every IRIDL uses, started the first time its asked for)
+	---------------------------------------------------------------------------
+	Object Methods:
+		__init__(per_host: int, timeout: float, verify: bool, chunk: int, retries: int, backoff: float, mirrors: dict, hedge: float, cooldown: float, verbose: bool) -> Downloader (starts the loop thread)
+		validate_args(per_host: int, timeout: float, chunk: int, retries: int, backoff: float, mirrors: dict, hedge: float) -> Boolean
+		download(url: str, path: str, check: callable, validators: dict) -> dict (downloads one url to path, blocks until its done - url, path, status, bytes, walltime, attempts, modified, etag, last_modified. check(path) raises ValueError if the file isnt what was asked for. raises IOError / ValueError once out of retries.
+			validators ({'etag': ..., 'last_modified': ...} from an earlier download) make it a conditional request - if the server says the file hasnt changed, path is left alone, status is 304 and modified False)
+		download_many(pairs: list of (url, path), check: callable) -> list (downloads them all at once, returns one result dict per pair, with 'error' set instead of raising)
+		retryable(error: Exception) -> Boolean (whether trying again could help)
+		origin(url: str) -> tuple (the (scheme, host, port) a url is sent to)
+		candidates(url: str) -> list (url on every server that can answer it, best first - servers that are up by latency, then the ones in cooldown)
+		health() -> dict ('scheme://host:port' -> latency, failures in a row, seconds of cooldown left, for every server tried so far)
+		close() -> None (closes the open connections and stops the loop)
+	---------------------------------------------------------------------------"""
+
+	instance = None
+	instance_lock = threading.Lock()
+
+	def __init__(self, per_host=4, timeout=600, verify=False, chunk=1 << 16, retries=3, backoff=2.0, mirrors=None, hedge=None, cooldown=30.0, verbose=True):
+		self.verbose = verbose
+		if mirrors is None: #host=url,url;host=url
+			mirrors = {}
+			for entry in os.environ.get('PYCPT_MIRRORS', '').split(';'):
+				if '=' in entry:
+					host, urls = entry.split('=', 1)
+					mirrors[host.strip()] = [url.strip() for url in urls.split(',') if len(url.strip()) > 0]
+		if hedge is None and len(os.environ.get('PYCPT_HEDGE', '')) > 0:
+			hedge = float(os.environ['PYCPT_HEDGE'])
+		if not self.validate_args(per_host, timeout, chunk, retries, backoff, mirrors, hedge):
+			raise ValueError('Invalid Downloader parameters')
+		self.per_host, self.timeout, self.verify, self.chunk = per_host, timeout, verify, chunk
+		self.retries, self.backoff = retries, backoff
+		self.mirrors, self.hedge, self.cooldown = mirrors, hedge, cooldown
+		self.latency, self.failures, self.down = {}, {}, {}
+		self.probes = {} #host -> Task connecting to each of its servers, started the first time the host is asked for
+		self.idle = {} #(scheme, host, port) -> list of open (reader, writer) pairs nobody is using
+		self.limits = {} #host -> asyncio.Semaphore(per_host)
+		self.context = ssl.create_default_context()
+		if not verify:
+			self.context.check_hostname = False
+			self.context.verify_mode = ssl.CERT_NONE
+		self.loop = asyncio.new_event_loop()
+		self.thread = threading.Thread(target=self.loop.run_forever, name='pycpt-downloader', daemon=True)
+		self.thread.start()
+
+	def validate_args(self, per_host, timeout, chunk, retries, backoff, mirrors, hedge):
+		retval = True
+		if type(per_host) != int or per_host < 1:
+			print('per_host must be an int >= 1')
+			retval = retval and False
+		if type(timeout) not in [int, float] or timeout <= 0:
+			print('timeout must be a number of seconds > 0')
+			retval = retval and False
+		if type(chunk) != int or chunk < 1:
+			print('chunk must be an int >= 1')
+			retval = retval and False
+		if type(retries) != int or retries < 0:
+			print('retries must be an int >= 0')
+			retval = retval and False
+		if type(backoff) not in [int, float] or backoff < 0:
+			print('backoff must be a number of seconds >= 0')
+			retval = retval and False
+		if type(mirrors) != dict or any(type(urls) != list or any(urlsplit(str(url)).scheme not in ['http', 'https'] or urlsplit(str(url)).hostname is None for url in urls) for urls in mirrors.values()):
+			print('mirrors must be a dict of host -> list of http(s)://host:port urls')
+			retval = retval and False
+		if hedge is not None and (type(hedge) not in [int, float] or hedge <= 0):
+			print('hedge must be None or a number of seconds > 0')
+			retval = retval and False
+		return retval
+
+	@classmethod
+	def shared(self):
+		with Downloader.instance_lock:
+			if Downloader.instance is None:
+				Downloader.instance = Downloader(verbose=False)
+			return Downloader.instance
+
+	def download(self, url, path, check=None, validators=None):
+		return asyncio.run_coroutine_threadsafe(self._download(url, str(path), check, validators), self.loop).result()
+
+	def download_many(self, pairs, check=None):
+		futures = [asyncio.run_coroutine_threadsafe(self._download(url, str(path), check), self.loop) for url, path in pairs] #all queued on the loop before we wait on any
+		results = []
+		for i, future in enumerate(futures):
+			try:
+				results.append(future.result())
+			except Exception as e:
+				results.append({'url': pairs[i][0], 'path': str(pairs[i][1]), 'status': None, 'bytes': 0, 'walltime': None, 'attempts': None, 'error': '{}: {}'.format(type(e).__name__, e)})
+		return results
+
+	def origin(self, url):
+		parts = urlsplit(url)
+		return (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+
+	def candidates(self, url):
+		parts = urlsplit(url)
+		urls = [url] + [urlunsplit(urlsplit(mirror)[:2] + parts[2:]) for mirror in self.mirrors.get(parts.hostname, [])]
+		now = time.time()
+		def rank(i):
+			down = self.down.get(self.origin(urls[i]), 0.0)
+			return (down > now, down if down > now else self.latency.get(self.origin(urls[i]), 0.0), i) #servers we havent heard from yet rank as fast, so each gets tried
+		return [urls[i] for i in sorted(range(len(urls)), key=rank)]
+
+	def seen(self, origin, latency):
+		self.latency[origin] = latency if origin not in self.latency else 0.7 * self.latency[origin] + 0.3 * latency
+		self.failures[origin] = 0
+		self.down.pop(origin, None)
+
+	def failed(self, origin):
+		self.failures[origin] = self.failures.get(origin, 0) + 1
+		self.down[origin] = time.time() + min(self.cooldown * 2 ** (self.failures[origin] - 1), 600.0)
+
+	def health(self):
+		async def snapshot(): #the loop thread is the only one that changes these
+			now = time.time()
+			return {'{}://{}:{}'.format(*origin): {'latency': self.latency.get(origin), 'failures': self.failures.get(origin, 0), 'cooldown': max(0.0, self.down.get(origin, now) - now)} for origin in set(self.latency) | set(self.failures)}
+		return asyncio.run_coroutine_threadsafe(snapshot(), self.loop).result()
+
+	def retryable(self, error):
+		if not isinstance(error, Exception) or isinstance(error, asyncio.CancelledError):
+			return False #ctrl-c, or the loop shutting down
+		if isinstance(error, HTTPStatusError):
+			return error.status >= 500 or error.status in [206, 408, 416, 429] #206 / 416 are a resume that didnt work, which starts over. the rest of 4xx mean the query itself is wrong
+		return True
+
+	async def _download(self, url, path, check=None, validators=None):
+		start, part, attempt, state = time.time(), path + '.download', 0, {'origin': None, 'validators': validators or {}, 'headers': {}}
+		f = open(part, 'wb')
+		try:
+			while True:
+				checking = False
+				try:
+					status, size = await self._fetch(url, f, state)
+					f.close() #check may rewrite part under a new inode (IRIDL.download gunzips it) - nothing can still be writing to the old one, and windows cant replace an open file
+					if check is not None and status != 304:
+						checking = True
+						await self.loop.run_in_executor(None, check, part) #reads the whole file - off the loop, so other downloads keep going
+					break
+				except BaseException as e:
+					if attempt >= self.retries or not self.retryable(e):
+						raise
+					if checking or isinstance(e, ValueError):
+						self.failed(state['origin']) #so a mirror sending bad files isnt asked first next time
+						f.close()
+						f = open(part, 'wb') #the file came through whole and is wrong - nothing to resume
+					elif f.closed:
+						f = open(part, 'ab') #closing it failed - carry on from what made it to disk
+					wait = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5) #jitter, so runs that failed together dont all come back together
+					attempt += 1
+					if self.verbose:
+						print('Download of {} failed ({}: {}) - trying again in {:.1f}s{}'.format(url, type(e).__name__, e, wait, '' if f.tell() == 0 else ', from byte {}'.format(f.tell())))
+					await asyncio.sleep(wait)
+			if status == 304:
+				os.remove(part) #the file we already have is still the right one
+			else:
+				os.replace(part, path) #only a whole, checked file ever has the real name
+		except BaseException:
+			f.close()
+			if os.path.isfile(part):
+				os.remove(part) #a half written file would look like a finished download next run
+			raise
+		return {'url': url, 'path': path, 'status': status, 'bytes': size, 'walltime': time.time() - start, 'attempts': attempt + 1, 'error': None,
+			'modified': status != 304, 'etag': state['headers'].get('etag'), 'last_modified': state['headers'].get('last-modified')}
+
+	async def _fetch(self, url, f, state):
+		"""one try at url - on the best of its servers, hedged on the next best if it takes longer than hedge. state['origin'] is the server whatever is already in f came from, state['validators'] make the request conditional and state['headers'] gets the response's"""
+		host = urlsplit(url).hostname
+		if host in self.mirrors:
+			if host not in self.probes:
+				self.probes[host] = asyncio.ensure_future(self._probe(url))
+			await asyncio.shield(self.probes[host]) #one download giving up shouldnt stop the probe the others wait on
+		candidates = self.candidates(url)
+		if f.tell() > 0 and self.origin(candidates[0]) != state['origin']:
+			f.seek(0) #another server's file may not be the same bytes - dont resume from it
+			f.truncate()
+		state['origin'] = self.origin(candidates[0])
+		if self.hedge is None or len(candidates) < 2 or f.tell() > 0:
+			return await self._on(candidates[0], f, state)
+		first = asyncio.ensure_future(self._on(candidates[0], f, state))
+		done, pending = await asyncio.wait([first], timeout=self.hedge)
+		if first in done:
+			return first.result()
+		if self.verbose:
+			print('{} slow after {:g}s - asking {} as well'.format(candidates[0], self.hedge, '{}://{}:{}'.format(*self.origin(candidates[1]))))
+		g = open(f.name + '.hedge', 'w+b')
+		second = asyncio.ensure_future(self._on(candidates[1], g, state))
+		try:
+			pending, error = set([first, second]), None
+			while len(pending) > 0:
+				done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+				for task in done:
+					if task.exception() is not None:
+						error = task.exception()
+						continue
+					if task is second: #the hedge finished first - its file is the download
+						g.seek(0)
+						f.seek(0)
+						f.truncate()
+						shutil.copyfileobj(g, f, self.chunk)
+						state['origin'] = self.origin(candidates[1])
+						self.failed(self.origin(candidates[0])) #and the server that lost goes to the back for a while
+					return task.result()
+			raise error
+		finally:
+			for task in [first, second]:
+				task.cancel()
+			await asyncio.gather(first, second, return_exceptions=True) #the loser has stopped writing before its file goes
+			g.close()
+			os.remove(g.name)
+
+	async def _on(self, url, f, state):
+		"""_get, counting a failure against the server if trying again could help - a 404 is the query's fault, not the server's"""
+		try:
+			return await self._get(url, f, 5, state)
+		except Exception as e:
+			if self.retryable(e):
+				self.failed(self.origin(url))
+			raise
+
+	async def _probe(self, url):
+		"""connects to each server for url's host at once - how long that takes is where ranking them starts, and one that cant be reached waits out its cooldown. the connections are kept for the downloads"""
+		async def one(candidate):
+			origin, start = self.origin(candidate), time.time()
+			try:
+				reader, writer, reused = await asyncio.wait_for(self._connect(origin, fresh=True), min(self.timeout, 10.0))
+			except Exception:
+				self.failed(origin)
+				return
+			self.seen(origin, time.time() - start)
+			self._release(origin, reader, writer, True)
+		await asyncio.gather(*[one(candidate) for candidate in self.candidates(url)])
+		if self.verbose:
+			print('Servers for {}: {}'.format(urlsplit(url).hostname, ', '.join('{}://{}:{} ({})'.format(*(self.origin(c) + ('down' if self.origin(c) in self.down else '{:.0f}ms'.format(1000 * self.latency[self.origin(c)]),))) for c in self.candidates(url))))
+
+	async def _get(self, url, f, redirects, state):
+		for attempt in range(redirects + 1):
+			status, size, location = await self._request(url, f, state)
+			if location is None:
+				return status, size
+			url = urljoin(url, location)
+		raise IOError('Too many redirects downloading {}'.format(url))
+
+	async def _request(self, url, f, state):
+		"""one GET on a pooled connection - returns (status, bytes in f, redirect location or None). if f already has part of the file, asks for the rest with a Range header, otherwise sends state['validators'] as If-None-Match / If-Modified-Since"""
+		offset = f.tell()
+		parts = urlsplit(url)
+		if parts.scheme not in ['http', 'https']:
+			raise IOError('Cannot download {} - only http and https urls are supported'.format(url))
+		key = self.origin(url)
+		if parts.hostname not in self.limits:
+			self.limits[parts.hostname] = asyncio.Semaphore(self.per_host)
+		target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+		if offset > 0:
+			extra = 'Range: bytes={}-\r\n'.format(offset)
+		else:
+			extra = ''.join('{}: {}\r\n'.format(header, state['validators'][name]) for name, header in [('etag', 'If-None-Match'), ('last_modified', 'If-Modified-Since')] if state['validators'].get(name))
+		request = 'GET {} HTTP/1.1\r\nHost: {}\r\nUser-Agent: PyCPT\r\nAccept-Encoding: identity\r\n{}Connection: keep-alive\r\n\r\n'.format(target, parts.netloc, extra).encode('latin-1')
+		async with self.limits[parts.hostname]:
+			reader, writer, reused = await self._connect(key)
+			try:
+				try:
+					sent = time.time()
+					writer.write(request)
+					await writer.drain()
+					status, headers = await self._head(reader)
+				except (ConnectionError, asyncio.IncompleteReadError, EOFError):
+					writer.close()
+					if not reused:
+						raise
+					reader, writer, reused = await self._connect(key, fresh=True) #the server closed a connection we kept open for too long - try once on a new one
+					sent = time.time()
+					writer.write(request)
+					await writer.drain()
+					status, headers = await self._head(reader)
+				self.seen(key, time.time() - sent)
+				keep = headers.get('connection', '').lower() != 'close'
+				if status in [301, 302, 303, 307, 308] and 'location' in headers:
+					await self._body(reader, headers, None)
+					self._release(key, reader, writer, keep)
+					return status, 0, headers['location']
+				if status == 304 and offset == 0: #never has a body, whatever its headers say
+					self._release(key, reader, writer, keep)
+					state['headers'] = headers
+					return status, 0, None
+				resumed = status == 206 and headers.get('content-range', '').startswith('bytes {}-'.format(offset))
+				if status not in [200, 206] or status == 206 and not resumed:
+					message = await self._body(reader, headers, None, keep=512)
+					self._release(key, reader, writer, keep)
+					if status in [206, 416]:
+						f.seek(0) #the server wont give us the rest we asked for - start over on the next try
+						f.truncate()
+					raise HTTPStatusError(status, 'HTTP {} downloading {} - {}'.format(status, url, message.decode('utf-8', 'replace').strip()[:200]))
+				if not resumed:
+					f.seek(0) #the whole file, even if we asked for the rest - the IRIDL makes most files on request and ignores Range
+					f.truncate()
+				await self._body(reader, headers, f)
+				state['headers'] = headers
+				self._release(key, reader, writer, keep and ('content-length' in headers or headers.get('transfer-encoding', '').lower() == 'chunked'))
+				return status, f.tell(), None
+			except BaseException:
+				if not writer.is_closing() and (reader, writer) not in self.idle.get(key, []):
+					writer.close() #a connection that failed mid-response cant be reused
+				raise
+
+	async def _connect(self, key, fresh=False):
+		"""an idle keep-alive connection to the host if we have one, otherwise a new one"""
+		pool = self.idle.setdefault(key, [])
+		while len(pool) > 0 and not fresh:
+			reader, writer = pool.pop()
+			if not reader.at_eof() and not writer.is_closing():
+				return reader, writer, True
+			writer.close()
+		reader, writer = await asyncio.wait_for(asyncio.open_connection(key[1], key[2], ssl=self.context if key[0] == 'https' else None, limit=self.chunk * 4), self.timeout)
+		return reader, writer, False
+
+	def _release(self, key, reader, writer, reusable):
+		if reusable and len(self.idle.setdefault(key, [])) < self.per_host:
+			self.idle[key].append((reader, writer))
+		elif not writer.is_closing():
+			writer.close()
+
+	async def _read(self, coro):
+		return await asyncio.wait_for(coro, self.timeout)
+
+	async def _head(self, reader):
+		line = await self._read(reader.readline())
+		if len(line) == 0:
+			raise EOFError('connection closed before a response')
+		fields = line.decode('latin-1').split(None, 2)
+		if len(fields) < 2 or not fields[0].startswith('HTTP/'):
+			raise IOError('Bad HTTP status line: {}'.format(line[:100]))
+		headers = {}
+		while True:
+			line = await self._read(reader.readline())
+			if line in [b'\r\n', b'\n', b'']:
+				break
+			name, _, value = line.decode('latin-1').partition(':')
+			headers[name.strip().lower()] = value.strip()
+		return int(fields[1]), headers
+
+	async def _body(self, reader, headers, f, keep=0):
+		"""streams the response body into f (or nowhere, if f is None) - returns its size, or its first 'keep' bytes if keep > 0"""
+		size, kept = 0, b''
+		def sink(data):
+			nonlocal kept
+			if f is not None:
+				f.write(data)
+			if len(kept) < keep:
+				kept += data[:keep - len(kept)]
+		if headers.get('transfer-encoding', '').lower() == 'chunked':
+			while True:
+				length = int((await self._read(reader.readline())).split(b';')[0].strip() or b'0', 16)
+				if length == 0:
+					while (await self._read(reader.readline())) not in [b'\r\n', b'\n', b'']: #trailers
+						pass
+					break
+				while length > 0:
+					data = await self._read(reader.read(min(length, self.chunk)))
+					if len(data) == 0:
+						raise EOFError('connection closed in the middle of a chunk')
+					sink(data)
+					size, length = size + len(data), length - len(data)
+				await self._read(reader.readline())
+		elif 'content-length' in headers:
+			length = int(headers['content-length'])
+			while size < length:
+				data = await self._read(reader.read(min(length - size, self.chunk)))
+				if len(data) == 0:
+					raise EOFError('connection closed after {} of {} bytes'.format(size, length))
+				sink(data)
+				size += len(data)
+		else: #no length given - the body ends when the server hangs up
+			while True:
+				data = await self._read(reader.read(self.chunk))
+				if len(data) == 0:
+					break
+				sink(data)
+				size += len(data)
+		return kept if keep > 0 else size
+
+	def close(self):
+		def shut():
+			for key in self.idle:
+				for reader, writer in self.idle[key]:
+					writer.close()
+			self.idle = {}
+			self.loop.stop()
+		self.loop.call_soon_threadsafe(shut)
+		self.thread.join(5)
+
+	def __str__(self):
+		return "Downloader: {} per host, {} idle connections, mirrors for {} hosts".format(self.per_host, sum(len(pool) for pool in self.idle.values()), len(self.mirrors))
@@ -4,8 +4,10 @@ import json, struct
 import numpy as np
 from pathlib import Path
 import platform, copy, warnings
-import subprocess
+import subprocess, shutil, glob, tarfile
+import threading, io, re
 from .MetaTensor import MetaTensor
+from .DownloadCache import DownloadCache
 
 
 
@@ -17,88 +19,78 @@ class FileManager:
 		workdir (str)(2): 	a string representing the start directory, where 'work' will be created if it doesnt already exist
 		work (str)		: 	a string representing the name of a new directory to be created in which all inputs and outputs will reside
 		working_directory: 	a pathlib object holding the combination of workdir and work-  /workdir/work
-		force_download (bool): whether or not to force erasure of files and redownload  - if true, deletes work folder
+		force_download (bool): whether or not to force erasure of files and redownload  - if true, deletes work folder. 'revalidate' keeps it, and only downloads inputs the server says changed
 		verbose (bool)	:	boolean indicating whether or not to print everything - stuff my print anyway from system commands
+		ctl_cache (dict):	class-level cache of parsed CTL files, (absolute path, mtime) -> MetaTensor
+		tsv_cache (dict):	class-level cache of parsed CPT input files, (absolute path, size, mtime) -> (lats, lons, data, times)
 	---------------------------------------------------------------------------
 	Class Methods (callable without instantiation):
-		None so far
+		open_tsv(path: str) -> file (opens a cptv10.tsv file for reading as text, decompressing it on the fly if the DownloadCache stored it compressed - every reader of input files goes through this)
+		check_tsv(path: str) -> int (checks a cptv10.tsv file is whole - its headers, field count and every block's nrow / ncol - and returns how many blocks it has. raises ValueError if not, see Downloader.download)
+		splice_tsv(old: str, new: str, dest: str) -> int (writes old with the later years in new appended to dest, after checking they're the same field on the same grid - returns how many years were added. see DownloadCache.fetch)
+		subset_tsv(src: str, dest: str, box: tuple) -> int (writes the grid cells / stations of a cptv10.tsv file inside box (sla, nla, wlo, elo) to dest as a cptv10.tsv, returns how many there are - see DownloadCache.fetch)
+		split_tsv(src: str, dest: str, years: tuple) -> int (writes the blocks of a cptv10.tsv file that start in years (first, last) to dest, returns how many - see IRIDL.split)
+		stitch_tsv(tiles: list, dest: str) -> int (writes gridded cptv10.tsv files [latitude band][longitude tile] to dest as one file over their whole box, returns how many blocks - see IRIDL.sharded)
 	---------------------------------------------------------------------------
 	Object Methods:
 		callSys(arg: str) -> None (calls a command in the system)
 		__init__(workdir: str, work: str, force_download: bool) -> Filemanager (constructor)
 		validate_args(workdir: str, work: str, force_download: bool) -> Bool (checks if all parameters are valid)
 		check(path: pathfile.Path) -> Bool, Path (checks if a file exists within working_directory (workdir/work) and then returns true if it does, also the global path to the file.)
+		path(*parts: str) -> str (absolute path of something inside working_directory - nothing in PyCPT relies on the process's current directory)
+		log(msg: str) -> None (appends a line to working_directory/results.out, used when verbose is False)
 		ensemblefiles(models: list) -> None (packages all IRIDL maproom-relevant output files into a .tgz file in the NextGen folder so users can send to their contacts at IRI)
-		NGensembles(models: list, obs_args: ArgSet, MOS: str, file: str) -> None (computes NextGen Multi-model Ensemble mean and writes input X file for CPT )
+		NGensembles(models: list, obs_args: ArgSet, MOS: str, file: str) -> str (computes NextGen Multi-model Ensemble mean and writes input X file for CPT, returns the file it wrote )
 		write_cpt_file(path: Path, var: Array[T,X,Y], obs_args: ArgSet, meta: MetaTensor) -> None (does the file writing part of NGensmeble )
 		read_xvPr_dat(path: Path, meta: MetaTensor) -> Array (Reads CPT output FCST_xvPr for a model and return data to NGensemble for averaging)
 		read_eof_dat(eofmodes: int, model:str, args: ArgSet, eof:int, MOS:str, metadata: MetaTensor) -> Array (reads and returns data from EOF output files from CPT to plteofs function for plotting )
 		read_met_dat(model:str, args: ArgSet, met: Str, MOS: str, metadata: MetaTensor) -> Array (reads and returns skill score output from CPT for a model to pltmap for plotting)
 		read_ctl(path:Path) -> MetaTensor (Reads a CTL file and returns a MetaTensor object)
+		read_tsv(path: Path) -> (lats, lons, Array[T,Y,X], times) (reads a cptv10.tsv input file, like the observations, with missing values as nan - raises ValueError if it isnt one)
+		read_leads(path: Path) -> (lats, lons, starts, leads, targets, Array[S,L,Y,X], header) (reads a cptv10.tsv file of monthly model fields, one block per start and lead)
+		wet_days(src: Path, dest: Path, tgt: str, threshold: float, pctle: bool) -> Path (counts each year's wet days in a season from a daily observations file and writes them as a CPT input file - see IRIDL.wet_days)
+		aggregate_leads(src: Path, dest: Path, tgti: float, tgtf: float, factor: float) -> Path (averages the leads of one target season out of a monthly leads file, times factor, and writes them as a CPT input file - see IRIDL.aggregate)
 		read_forecast(path: Path, MOS: str, fcst_type: str, ctlfname:Path) -> array (reads and returns a model's CPT FCST_mu or FCST_P .txt file data for plt_deterministic and plt_probabilistic respectively  )
 		read_forecast_bin(path: Path, MOS: str, fcst_type: str) -> array (reads and returns a model's CPT FCST_mu or FCST_P .dat file data for plt_deterministic and plt_probabilistic respectively - only for Windows  )
 	---------------------------------------------------------------------------"""
 
+	ctl_cache = {}
+	ctl_lock = threading.Lock()
+	tsv_cache = {}
+
 	def __init__(self, workdir, work, force_download, verbose=True):
-		"""creates a FileManager Object """
+		"""creates a FileManager Object - never changes the process's current directory, so several can live in one python process"""
+		self.verbose = verbose #whether or not to print output
+		self.workdir = workdir
 		if not self.validate_args(workdir, work, force_download):
 			if self.verbose:
 				print('Enter valid directories please!')
 			return -999
 		else:
 			self.work = work
-			self.workdir = workdir
 		self.force_download = force_download #whether to force download or not
-		self.working_directory = Path(copy.deepcopy(self.workdir), copy.deepcopy(self.work)) #use copy to make sure changing workdir and work dont change working_directory, python is funky
-		self.verbose = verbose #whether or not to print output
 		self.MOSs = {"None": "noMOS", "CCA":"CCA", "PCR":"PCR", "ELR":"ELRho"} #just so we can set mpref, though its only used in filenames now
 		self.workdir = str(self.workdir) #stringing it because we just Path'd it in validate_args if its not valid iniitialy.
 		self.work = str(self.work) #same for this
-		os.chdir(self.workdir) #should work with or without a trailing /
-
-		if self.force_download and os.path.isdir(str(self.work)): #we only delete folders if were forcing download AND the folders exist
-			if platform.system() == 'Windows':
-				if self.verbose:
-					print('Windows deleting folders')
-				self.callSys('del /S /Q {}/{}'.format(self.work)) #these all just delete  folders
-				self.callSys('rmdir /S /Q {}/{}'.format(self.work + '/scripts'))
-				self.callSys('rmdir /S /Q {}/{}'.format(self.work + '/input'))
-				self.callSys('rmdir /S /Q {}/{}'.format(self.work + '/output'))
-				self.callSys('rmdir /S /Q {}/{}'.format(self.work + '/images'))
-				self.callSys('rmdir /S /Q {}/{}'.format(self.work))
-			else:
-				if self.verbose:
-					print('Mac deleting folders')
-				self.callSys('rm -rf {}'.format(self.work)) #these delete folders on mac / unix
-
-		if not os.path.isdir(self.work):
-			self.callSys('mkdir {}'.format(self.work)) #makes the 'work' directory (JJAS_SEASONAL_ETC_EX) inside the working directory (/Users/KJ/Example/), these names are bad
+		self.working_directory = Path(self.workdir, self.work).absolute() #absolute so it means the same thing no matter what the cwd is later
 
-		if not os.path.isdir(self.work + '/scripts'): #the following all just remake folders
-			if platform.system() == 'Windows':
-				self.callSys('cd {} && mkdir scripts'.format(self.work))
-			else:
-				self.callSys('mkdir {}/scripts'.format(self.work))
-
-		if not os.path.isdir(self.work + '/images'):
-			if platform.system() == "Windows":
-				self.callSys('cd {} && mkdir images'.format(self.work))
-			else:
-				self.callSys('mkdir {}/images'.format(self.work))
+		if self.force_download == True and self.working_directory.is_dir(): #we only delete folders if were forcing download AND the folders exist - revalidating keeps them
+			if self.verbose:
+				print('Deleting folders')
+			shutil.rmtree(str(self.working_directory)) #same on windows, mac and unix
 
-		if not os.path.isdir(self.work + '/input'):
-			if platform.system() == "Windows":
-				self.callSys('cd {} && mkdir input'.format(self.work))
-			else:
-				self.callSys('mkdir {}/input'.format(self.work))
+		for sub in ['scripts', 'images', 'input', 'output']: #makes the 'work' directory (JJAS_SEASONAL_ETC_EX) inside the working directory (/Users/KJ/Example/) and its folders, if they dont exist yet
+			os.makedirs(self.path(sub), exist_ok=True)
 
-		if not os.path.isdir(self.work + '/output'):
-			if platform.system() == "Windows":
-				self.callSys('cd {} && mkdir output'.format(self.work))
-			else:
-				self.callSys('mkdir {}/output'.format(self.work))
+	def path(self, *parts):
+		"""absolute path of something inside working_directory"""
+		return str(Path(self.working_directory, *parts))
 
-		os.chdir(self.work) #we are now in working_directory/work for the rest of the scripts
+	def log(self, msg):
+		"""appends to results.out in the work directory - what we do instead of printing when verbose is False"""
+		f = open(self.path('results.out'), 'a')
+		f.write(msg)
+		f.close()
 
 	def callSys(self, arg):
 		"""Calling a system command, but get_ipython().system breaks too easily when youre not in a jupyter notebook"""
@@ -109,44 +101,24 @@ class FileManager:
 
 	def ensemblefiles(self, models):
 		"""saves all files relevant to maproom to a .tgz file in the NextGen folder for easy sending """
-		if platform.system() == 'Windows': #check if windows
-			self.callSys("cd output && mkdir NextGen") #windows command for making NextGen folder
-			self.callSys("cd output\\NextGen &&  del /s /q *_NextGen.tgz") #windows command for deleting previous tar.gz files
-			self.callSys("cd output\\NextGen && del /s /q *.txt") #windows command for deleting previous text files
-			for i in range(len(models)):
-				self.callSys("cd " + os.path.normpath("output/") + " && copy "+ os.path.normpath("*"+models[i]+"*.ctl") + " NextGen") #windows command for copying model ctl files to NextGen Folder
-				self.callSys("cd " + os.path.normpath("output/") + " && copy "+ os.path.normpath("*"+models[i]+"*.dat") + " NextGen") #windows command for copying model dat files to nextgenfolder - should be .txt , but CPT breaks on windows
-
-			self.callSys("cd " + os.path.normpath("output/") + " && copy "+ os.path.normpath("*NextGen*.ctl") + " NextGen") #windows command for copyitng nextgen ctl files
-			self.callSys("cd " + os.path.normpath("output/") + " && copy "+ os.path.normpath("*NextGen*.dat") + " NextGen") #windows command for copyting nextgen dat files
+		ngdir = self.path('output', 'NextGen')
+		if os.path.isdir(ngdir):
+			shutil.rmtree(ngdir) #start from an empty NextGen folder
+		os.makedirs(ngdir)
+		exts = ['ctl', 'dat'] if platform.system() == 'Windows' else ['txt'] #windows CPT doesnt write the .txt files, so package the binaries instead
+		names = set()
+		for model in list(models) + ['NextGen']: #copys all model outputs to nextgen folder - but we call with models = "nextgen" so only nextgen
+			for ext in exts:
+				for fname in glob.glob(self.path('output', '*{}*.{}'.format(model, ext))):
+					shutil.copy(fname, ngdir)
+					names.add(os.path.basename(fname))
+		tgz = tarfile.open(os.path.join(ngdir, self.work + '_NextGen.tgz'), 'w:gz') #tarfile instead of the tar command, works the same everywhere
+		for name in sorted(names):
 			if self.verbose:
-				self.callSys("cd " + os.path.normpath("output/NextGen/") + " && tar cvzf " + self.work + "_NextGen.tgz *") #this ~should~ be fine ? unless they have a computer older than last march 2019  - windows command for compressing all Nextgen files
-			else:
-				self.callSys("cd " + os.path.normpath("output/NextGen/") + " && tar czf " + self.work + "_NextGen.tgz *") #this ~should~ be fine ? unless they have a computer older than last march 2019  - windows command for compressing all Nextgen files
-
-			self.callSys("cd " + os.path.normpath("output/NextGen/") + " && del /s /q *.ctl") #windows delete files outside of .tgz file
-			self.callSys("cd " + os.path.normpath("output/NextGen/") + " && del /s /q *.dat") #windows dlete files outside of .tgz file
-			self.callSys("echo %cd%") #print current workign directory for some reason
-
-		else:
-			try:
-				self.callSys("cd ./output/; rm -rf NextGen")
-			except:
-				pass
-			try:
-				self.callSys("mkdir ./output/NextGen/") # unix makes NextGen folder
-			except:
-				pass
-			self.callSys("cd ./output/NextGen/; rm -Rf *_NextGen.tgz *.txt") #delets everything in nextgen folder
-			for i in range(len(models)):
-				self.callSys("cd ./output/NextGen; cp ../*"+models[i]+"*.txt .") #copys all model outputs to nextgen folder - but we call with models = "nextgen" so only nextgen
-			self.callSys("cd ./output/NextGen; cp ../*NextGen*.txt .") #copys all nextgen files to nextgen folder
-			if self.verbose:
-				self.callSys("cd ./output/NextGen; tar cvzf " + self.work+"_NextGen.tgz *.txt") #this ~should~ be fine ? unless they have a computer older than last march 2019 - unix compress all nextgen fiels
-			else:
-				self.callSys("cd ./output/NextGen; tar czf " + self.work+"_NextGen.tgz *.txt") #this ~should~ be fine ? unless they have a computer older than last march 2019 - unix compress all nextgen fiels
-			self.callSys("cd ./output/NextGen/; rm -Rf *.txt") #unix delete all files outside of .tgz file .
-			self.callSys('pwd') #unix print current directory for some reason
+				print(name) #same as tar -v
+			tgz.add(os.path.join(ngdir, name), arcname=name)
+			os.remove(os.path.join(ngdir, name)) #delete files outside of .tgz file
+		tgz.close()
 		if self.verbose:
 			print("Compressed file "+self.work+"_NextGen.tgz created in output/NextGen/") #success message .
 			print("Now send that file to your contact at the IRI")
@@ -164,15 +136,15 @@ class FileManager:
 				print('New "Work" Directory: {}'.format(work))
 
 
-		if not os.path.isdir(workdir): #if workdir is not a pre-existing directory, use current directory and warn
+		if not os.path.isdir(str(workdir)): #if workdir is not a pre-existing directory, use current directory and warn
 			if self.verbose:
 				print('Workdir does not exist! Go make it- copy output of "pwd" on Mac/Unix, or "cd" on Windows')
 				print('For now, using Current Directory as Workdir - {}'.format(Path.cwd()))
 			self.workdir = Path.cwd()
 
-		if force_download not in [True, False]:
+		if force_download not in [True, False, 'revalidate']:
 			if self.verbose:
-				print('force_download must be boolean - True, or False')
+				print("force_download must be boolean - True, or False - or 'revalidate'")
 			retval = retval and False
 		return retval
 
@@ -207,11 +179,13 @@ class FileManager:
 			self.write_cpt_file(filename, nextgen, obs_args, meta) #calles write CPT to write a .tsv input file for NextGen
 			if self.verbose:
 				print('Cross-validated prediction files successfully produced')
+			return filename
 		if file=='FCST_mu' or file == 'FCST_var':
 			filename = 'output/NextGen_{}{}_{}_{}{}_{}_{}{}.tsv'.format(obs_args.predictand, obs_args.predictand, MOS, file, obs_args.target_season.tgt, obs_args.target_season.monf, obs_args.domain.fyr)
 			self.write_cpt_file(filename, nextgen, obs_args, meta)
 			if self.verbose:
 				print('Forecast {} files successfully produced'.format('' if file=='FCTS_mu' else 'error'))
+			return filename
 
 	def write_cpt_file(self,  path, var, obs_args, meta):
 		"""function for writing a .tsv cpt input file by hand """
@@ -229,7 +203,7 @@ class FileManager:
 		xyear = True if obs_args.target_season.tgt=='Dec-Feb' or obs_args.target_season.tgt=='Nov-Jan' else False #set cross-year to true if target is cross-year
 		Xarr, Yarr, Tarr = meta.x_coords, meta.y_coords, meta.years #can just use x_coord, y coordinates, and years list from meta data class
 		#Now write the CPT file
-		f = open(path, 'w') #opens file to be written
+		f = open(str(Path(self.working_directory, path)), 'w') #opens file to be written - relative to the work directory, not the cwd
 		f.write("xmlns:cpt=http://iri.columbia.edu/CPT/v10/\n") #CPT header
 		f.write("cpt:nfields=1\n") #CPT Header
 		for it in range(meta.T): #for each year
@@ -297,8 +271,13 @@ class FileManager:
 		return var
 
 	def read_ctl(self, path):
-		"""reads a CTL file """
-		f = open(str(Path(self.working_directory, path)), 'r') #opens the file
+		"""reads a CTL file - remembered by (path, modification time), so a long-lived process only parses each one once"""
+		path = str(Path(self.working_directory, path))
+		key = (path, os.stat(path).st_mtime_ns) #a rerun that rewrites the file changes its mtime, so we never hand back stale metadata
+		with FileManager.ctl_lock:
+			if key in FileManager.ctl_cache:
+				return copy.deepcopy(FileManager.ctl_cache[key]) #copy so callers cant change whats cached
+		f = open(path, 'r') #opens the file
 		for line in f: #loops over every line in the file
 			line = line.split() #split line string on whitespace
 			if "XDEF" in line: #if the line has "XDEF" in it
@@ -308,7 +287,469 @@ class FileManager:
 			if "TDEF" in line: #if "TDEF in line lol"
 				T, Ti, dt = int(line[1]), int(line[3][-4:len(line[3])]), int(line[4][:-2]) #read number of years of data , first year, and distance between each year (its one year, plot twist ) - usuallly not used unless it IS
 		f.close()
-		return MetaTensor(X,Y,T,Xi,Yi,Ti,dx,dy,dt) #store this data in a metatensor object
+		meta = MetaTensor(X,Y,T,Xi,Yi,Ti,dx,dy,dt) #store this data in a metatensor object
+		with FileManager.ctl_lock:
+			FileManager.ctl_cache = {k: v for k, v in FileManager.ctl_cache.items() if k[0] != path} #drop older versions of this file
+			FileManager.ctl_cache[key] = copy.deepcopy(meta)
+		return meta
+
+	def read_tsv(self, path):
+		"""reads a cptv10.tsv file - gridded (rows are Y, one block per T) or station (rows are T, one column per station, with cpt:Y / cpt:X rows for where they are). remembered like read_ctl"""
+		path = str(Path(self.working_directory, path))
+		stat = os.stat(path)
+		key = (path, stat.st_size, stat.st_mtime_ns)
+		with FileManager.ctl_lock:
+			if key in FileManager.tsv_cache:
+				return copy.deepcopy(FileManager.tsv_cache[key])
+		lats, lons, station_lons, blocks, times, header = [], [], [], [], [], None
+		f = self.open_tsv(path)
+		for line in f:
+			line = line.rstrip('\n')
+			if line.startswith('xmlns') or line.startswith('cpt:nfields') or len(line.strip()) == 0:
+				continue
+			if line.startswith('cpt:') and '=' in line.split('\t')[0]: #start of a new block - cpt:field=prcp, cpt:T=1982-07/09, cpt:nrow=..., cpt:missing=-999 the first time, just cpt:T=... after that
+				header = dict(header or {}, **dict(item.strip().split('=', 1) for item in line.split(',') if '=' in item))
+				if 'cpt:T' not in line:
+					header.pop('cpt:T', None)
+				if 'cpt:T' in header:
+					times.append(header['cpt:T'])
+				blocks.append([])
+				lons = None
+				continue
+			if header is None:
+				raise ValueError('{} is not a CPT file - starts with {}'.format(path, line[:80])) #usually an error page from the server
+			values = line.split('\t')
+			if lons is None: #first line of a block is the column coordinates
+				lons = values[1:] if values[0] == '' else values
+				continue
+			if values[0] == 'cpt:Y': #station files put each station's location under the names
+				lats = [float(v) for v in values[1:]]
+				continue
+			if values[0] == 'cpt:X':
+				station_lons = [float(v) for v in values[1:]]
+				continue
+			if header.get('cpt:row') == 'T':
+				times.append(values[0])
+			elif len(blocks) == 1:
+				lats.append(float(values[0]))
+			blocks[-1].append(values[1:])
+		f.close()
+		if header is None or len(blocks) == 0 or len(blocks[-1]) == 0:
+			raise ValueError('{} has no data'.format(path))
+		missing = float(header.get('cpt:missing', -999))
+		if header.get('cpt:row') == 'T':
+			data = np.asarray(blocks[0], dtype=float)[:, None, :] #[T, 1, stations]
+			lons = station_lons
+		else:
+			data = np.asarray(blocks, dtype=float) #[T, Y, X]
+			lons = [float(v) for v in lons]
+		data[data == missing] = np.nan
+		result = (np.asarray(lats), np.asarray(lons), data, times)
+		with FileManager.ctl_lock:
+			FileManager.tsv_cache = {k: v for k, v in FileManager.tsv_cache.items() if k[0] != path}
+			FileManager.tsv_cache[key] = copy.deepcopy(result)
+		return result
+
+	def read_leads(self, path):
+		"""reads a cptv10.tsv file of monthly model fields with one block per start (cpt:S) and lead (cpt:L) - what IRIDL.monthly_query asks for. remembered like read_tsv
+		returns lats, lons (as the strings in the file, so they're written back exactly), starts, leads (floats, in months), targets (cpt:T of each start and lead), data[S, L, Y, X] with missing values as nan, and the first block's header"""
+		path = str(Path(self.working_directory, path))
+		stat = os.stat(path)
+		key = (path, stat.st_size, stat.st_mtime_ns, 'leads')
+		with FileManager.ctl_lock:
+			if key in FileManager.tsv_cache:
+				return copy.deepcopy(FileManager.tsv_cache[key])
+		lats, lons, blocks, header, first = [], None, {}, None, None
+		starts, leads, targets = [], [], {}
+		f = self.open_tsv(path)
+		for line in f:
+			line = line.rstrip('\r\n').rstrip('\t')
+			if line.startswith('xmlns') or line.startswith('cpt:nfields') or len(line.strip()) == 0:
+				continue
+			if line.startswith('cpt:') and '=' in line.split('\t')[0]:
+				header = dict(header or {}, **dict(item.strip().split('=', 1) for item in line.split(',') if '=' in item))
+				first = header if first is None else first
+				if 'cpt:S' not in header or 'cpt:L' not in header:
+					raise ValueError('{} has no cpt:S / cpt:L - not a file of monthly leads'.format(path))
+				start, lead = header['cpt:S'], float(header['cpt:L'].split()[0]) #cpt:L=1.5 months
+				if start not in starts:
+					starts.append(start)
+				if lead not in leads:
+					leads.append(lead)
+				targets[(start, lead)] = header.get('cpt:T')
+				block = blocks[(start, lead)] = []
+				lons = None
+				continue
+			if header is None:
+				raise ValueError('{} is not a CPT file - starts with {}'.format(path, line[:80]))
+			values = line.split('\t')
+			if lons is None:
+				lons = values[1:]
+				continue
+			if len(blocks) == 1:
+				lats.append(values[0])
+			block.append(values[1:])
+		f.close()
+		if len(blocks) == 0 or any(len(block) != len(lats) for block in blocks.values()):
+			raise ValueError('{} has no data, or blocks of different sizes'.format(path))
+		leads = sorted(leads)
+		data = np.full([len(starts), len(leads), len(lats), len(lons)], np.nan)
+		for (start, lead), block in blocks.items():
+			data[starts.index(start), leads.index(lead)] = np.asarray(block, dtype=float)
+		data[data == float(first.get('cpt:missing', -999))] = np.nan
+		result = (lats, lons, starts, leads, targets, data, first)
+		with FileManager.ctl_lock:
+			FileManager.tsv_cache = {k: v for k, v in FileManager.tsv_cache.items() if k[0] != path}
+			FileManager.tsv_cache[key] = copy.deepcopy(result)
+		return result
+
+	def aggregate_leads(self, src, dest, tgti, tgtf, factor=1.0):
+		"""writes the season between leads tgti and tgtf (months, like TargetSeason's) of a monthly leads file to dest as a cptv10.tsv - the mean of those leads times factor,
+		which is what the IRIDL's L/tgti/tgtf/RANGEEDGES/[L]//keepgrids/average/factor/mul does on its end. one download of the leads serves every season with the same start"""
+		lats, lons, starts, leads, targets, data, first = self.read_leads(src)
+		pick = [i for i in range(len(leads)) if float(tgti) - 1e-6 <= leads[i] <= float(tgtf) + 1e-6]
+		if len(pick) == 0 or len(pick) != int(round(float(tgtf) - float(tgti))) + 1:
+			raise ValueError('{} does not have every lead from {} to {}'.format(src, tgti, tgtf))
+		with warnings.catch_warnings():
+			warnings.simplefilter('ignore', category=RuntimeWarning) #cells missing in every lead stay nan, like the IRIDL's average
+			season = np.nanmean(data[:, pick], axis=1) * float(factor) #[S, Y, X] - every start year at once
+		season[np.isnan(season)] = -999.
+		lead = np.mean([leads[i] for i in pick])
+		units = 'mm' if float(factor) != 1.0 else first.get('cpt:units', 'mm') #mm/day * days in the season
+		f = open(str(Path(self.working_directory, dest)), 'w')
+		f.write("xmlns:cpt=http://iri.columbia.edu/CPT/v10/\n")
+		f.write("cpt:nfields=1\n")
+		for s in range(len(starts)):
+			ti, tf = str(targets.get((starts[s], leads[pick[0]]))), str(targets.get((starts[s], leads[pick[-1]])))
+			target = ti if ti == tf else ti + '/' + (tf[5:] if tf[:4] == ti[:4] else tf) #1982-07/09, or 1982-12/1983-02 across a year
+			f.write("cpt:field={}, cpt:L={:g} months, cpt:S={}, cpt:T={}, cpt:nrow={}, cpt:ncol={}, cpt:row=Y, cpt:col=X, cpt:units={}, cpt:missing=-999.\n".format(first.get('cpt:field', 'prec'), lead, starts[s], target, len(lats), len(lons), units))
+			f.write('\t' + '\t'.join(lons) + '\n')
+			for y in range(len(lats)):
+				f.write(lats[y] + '\t' + '\t'.join('{:.6f}'.format(v) for v in season[s, y]) + '\n')
+		f.close()
+		return dest
+
+	def wet_days(self, src, dest, tgt, threshold, pctle=False):
+		"""counts the days of season tgt ('Jun-Sep', 'Dec-Feb', 'Jul') at or above threshold mm in each year of a daily observations file, and writes them to dest as a cptv10.tsv.
+		with pctle, threshold is a percentile (0-1) of each cell's own days, and days at or below it are counted, like the IRIDL's percentileover/flagle. a year missing more than a tenth of a cell's days is missing"""
+		lats, lons, data, times = self.read_tsv(src)
+		try:
+			dates = np.asarray([[int(part) for part in t[:10].split('-')] for t in times]) #[day, (year, month, day)]
+		except ValueError:
+			raise ValueError('{} is not daily - its times look like {}'.format(src, times[0]))
+		months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+		first, last = [months.index(m) + 1 for m in (tgt.split('-') if '-' in tgt else [tgt, tgt])]
+		length = (last - first) % 12 + 1
+		offset = (dates[:, 1] - first) % 12 #months into the season
+		in_season = offset < length
+		start = dates[:, 0] - (dates[:, 1] < first).astype(int) #year the season started in, for Dec-Feb
+		valid = ~np.isnan(data)
+		if pctle:
+			with warnings.catch_warnings():
+				warnings.simplefilter('ignore', category=RuntimeWarning) #cells missing every day have no percentile, and flag nothing
+				value = np.nanpercentile(data, 100.0 * float(threshold), axis=0) #[Y, X] - each cell's own percentile, interpolated like percentileover
+			flags = data <= value #every day at or below it, ties and all - what flagle does
+		else:
+			flags = data >= float(threshold)
+		flags = np.where(valid, flags, 0).astype(float)
+		years, counts = [], []
+		for year in np.unique(start[in_season]):
+			days = in_season & (start == year)
+			if len(np.unique(dates[days][:, 1])) < length:
+				continue #a season cut off by the start or end of the record
+			count = flags[days].sum(axis=0)
+			count[valid[days].sum(axis=0) < 0.9 * days.sum()] = np.nan
+			years.append(int(year))
+			counts.append(count)
+		if len(years) == 0:
+			raise ValueError('{} has no complete {} season'.format(src, tgt))
+		counts = np.asarray(counts)
+		counts[np.isnan(counts)] = -999.
+		f = open(str(Path(self.working_directory, dest)), 'w')
+		f.write("xmlns:cpt=http://iri.columbia.edu/CPT/v10/\n")
+		f.write("cpt:nfields=1\n")
+		for i in range(len(years)):
+			end = years[i] + (1 if first + length - 1 > 12 else 0)
+			target = '{}-{:02d}'.format(years[i], first) + ('' if length == 1 else '/{:02d}'.format(last) if end == years[i] else '/{}-{:02d}'.format(end, last))
+			f.write("cpt:field=rfreq, cpt:T={}, cpt:nrow={}, cpt:ncol={}, cpt:row=Y, cpt:col=X, cpt:units=days, cpt:missing=-999.\n".format(target, len(lats), len(lons)))
+			f.write('\t' + '\t'.join('{:g}'.format(x) for x in lons) + '\n')
+			for y in range(len(lats)):
+				f.write('{:g}\t'.format(lats[y]) + '\t'.join('{:g}'.format(v) for v in counts[i, y]) + '\n')
+		f.close()
+		return dest
+
+	@classmethod
+	def open_tsv(self, path, errors='strict'):
+		return io.TextIOWrapper(DownloadCache.reader(path), errors=errors)
+
+	@classmethod
+	def check_tsv(self, path):
+		"""fast structural check of a downloaded cptv10.tsv file, without parsing a single value - the xmlns line, cpt:nfields, and every block having nrow rows of ncol values after its header.
+		raises ValueError for anything else - an error page, a file cut short, a block missing rows"""
+		f = FileManager.open_tsv(path, errors='replace')
+		first = f.readline()
+		if not first.startswith('xmlns'):
+			f.close()
+			raise ValueError('{} is not a CPT file - it starts with {}'.format(path, repr(first.strip()[:80])))
+		header, nfields, blocks, rows, nrow, ncol = {}, None, 0, 0, 0, 0
+		def close(): #a block is done - it should have had its coordinate line and nrow rows
+			if blocks > 0 and rows != nrow + 1:
+				raise ValueError('{} block {} has {} rows, its header says {}'.format(path, blocks, max(rows - 1, 0), nrow))
+		try:
+			for number, line in enumerate(f, 2):
+				text = line.rstrip('\r\n')
+				first = text.split('\t', 1)[0]
+				if first.startswith('cpt:nfields='):
+					nfields = int(first.split('=', 1)[1])
+					continue
+				if first.startswith('cpt:') and '=' in first:
+					close()
+					header.update(item.strip().split('=', 1) for item in text.split(',') if '=' in item) #later blocks often only say what changed
+					if 'cpt:nrow' not in header or 'cpt:ncol' not in header:
+						raise ValueError('{} line {} starts a block without cpt:nrow / cpt:ncol'.format(path, number))
+					blocks, rows, nrow, ncol = blocks + 1, 0, int(header['cpt:nrow']), int(header['cpt:ncol'])
+					continue
+				if len(text.strip()) == 0:
+					continue
+				if blocks == 0:
+					raise ValueError('{} line {} has data before any cpt: header'.format(path, number))
+				if text.rstrip('\t').count('\t') != ncol:
+					raise ValueError('{} line {} has {} values, its header says {}'.format(path, number, text.rstrip('\t').count('\t'), ncol))
+				if first not in ['cpt:Y', 'cpt:X']: #station coordinates come as extra rows
+					rows += 1
+			close()
+		finally:
+			f.close()
+		if nfields is None or nfields < 1:
+			raise ValueError('{} says cpt:nfields={}'.format(path, nfields))
+		if blocks == 0:
+			raise ValueError('{} has no data'.format(path))
+		return blocks
+
+	@classmethod
+	def subset_tsv(self, src, dest, box):
+		"""writes the part of cptv10.tsv file src inside box (sla, nla, wlo, elo) to dest - the same file the IRIDL would send for the smaller box, cut from one we already have for a bigger one.
+		gridded files keep each grid cell that overlaps the box (what RANGEEDGES does), station files keep each station inside it. raises ValueError if nothing is left"""
+		sla, nla, wlo, elo = [float(edge) for edge in box]
+		lats, lons, station, header = [], None, False, None
+		f = FileManager.open_tsv(src) #first pass - just the coordinates, files for big boxes can be too big to hold in memory
+		for line in f:
+			values = line.rstrip('\r\n').rstrip('\t').split('\t')
+			if values[0].startswith('cpt:') and '=' in values[0]:
+				if lons is not None:
+					break #the next block - same grid all the way down
+				header, station = line, 'cpt:row=T' in line
+				continue
+			if header is None or len(line.strip()) == 0:
+				continue
+			if station:
+				if values[0] == 'cpt:Y':
+					lats = [float(v) for v in values[1:]]
+				elif values[0] == 'cpt:X':
+					lons = [float(v) for v in values[1:]]
+					break
+			elif lons is None:
+				lons = [float(v) for v in values[1:]]
+			else:
+				lats.append(float(values[0]))
+		f.close()
+		if lons is None or len(lats) == 0:
+			raise ValueError('{} is not a CPT file with coordinates'.format(src))
+		def spacing(coords):
+			steps = [abs(coords[i+1] - coords[i]) for i in range(len(coords) - 1) if coords[i+1] != coords[i]]
+			return min(steps) if len(steps) > 0 else 0.0
+		def inside(c, step, lo, hi, wrap=False):
+			if wrap: #longitudes may come back as 0-360 for a -180-180 box or the other way round
+				c = (c - lo + step / 2.0) % 360.0 + lo - step / 2.0
+			if step == 0:
+				return lo <= c <= hi
+			return c + step / 2.0 > lo + 1e-9 and c - step / 2.0 < hi - 1e-9 #cell overlaps the box
+		if station:
+			cols = [i for i in range(len(lons)) if inside(lats[i], 0.0, sla, nla) and inside(lons[i], 0.0, wlo, elo, wrap=True)]
+			rows = None
+		else:
+			cols = [i for i in range(len(lons)) if inside(lons[i], spacing(lons), wlo, elo, wrap=True)]
+			rows = set(i for i in range(len(lats)) if inside(lats[i], spacing(lats), sla, nla))
+		if len(cols) == 0 or rows is not None and len(rows) == 0:
+			raise ValueError('{} has no {} inside {}'.format(src, 'stations' if station else 'grid cells', box))
+		f, out = FileManager.open_tsv(src), open(str(dest), 'w')
+		row, header = -1, False
+		for line in f:
+			text = line.rstrip('\r\n')
+			values = text.rstrip('\t').split('\t')
+			if values[0].startswith('cpt:') and '=' in values[0]:
+				text = text.replace('cpt:ncol={}'.format(len(lons)), 'cpt:ncol={}'.format(len(cols)))
+				if rows is not None:
+					text = text.replace('cpt:nrow={}'.format(len(lats)), 'cpt:nrow={}'.format(len(rows)))
+				out.write(text + '\n')
+				row, header = -1, True
+				continue
+			if not header or len(text.strip()) == 0:
+				out.write(text + '\n')
+				continue
+			if rows is not None and row >= 0 and row not in rows: #gridded - a latitude outside the box
+				row += 1
+				continue
+			out.write('\t'.join([values[0]] + [values[1 + i] for i in cols]) + '\n')
+			if rows is not None:
+				row += 1 #the column coordinates are row -1, latitudes count from 0
+		f.close()
+		out.close()
+		return len(cols) * (1 if rows is None else len(rows))
+
+	@classmethod
+	def splice_tsv(self, old, new, dest):
+		"""writes gridded cptv10.tsv file old with the years (blocks) of new after them to dest - once its checked both are the same field on the same grid, and new only has later years. raises ValueError if not"""
+		def layout(path):
+			header, coords, times = None, [], []
+			f = FileManager.open_tsv(path)
+			for line in f:
+				text = line.rstrip('\r\n')
+				first = text.split('\t', 1)[0]
+				if first.startswith('cpt:') and '=' in first:
+					items = dict(item.strip().split('=', 1) for item in text.split(',') if '=' in item)
+					header = items if header is None and 'cpt:field' in items else header
+					if 'cpt:T' in items:
+						times.append(items['cpt:T'])
+					continue
+				if len(times) == 1 and len(text.strip()) > 0: #the first block's coordinates - the longitude line, then each row's latitude
+					coords.append(text if len(coords) == 0 else first)
+			f.close()
+			if header is None or header.get('cpt:row') != 'Y' or len(times) == 0:
+				raise ValueError('{} is not a gridded CPT file with one block per year'.format(path))
+			return header, coords, times
+		old_header, old_coords, old_times = layout(old)
+		new_header, new_coords, new_times = layout(new)
+		for key in ['cpt:field', 'cpt:nrow', 'cpt:ncol', 'cpt:units', 'cpt:missing']:
+			if old_header.get(key) != new_header.get(key):
+				raise ValueError('{} has {}={}, {} has {}'.format(old, key, old_header.get(key), new, new_header.get(key)))
+		if old_coords != new_coords:
+			raise ValueError('{} and {} are on different grids'.format(old, new))
+		if min(int(t[:4]) for t in new_times) <= max(int(t[:4]) for t in old_times):
+			raise ValueError('{} has years {} already has'.format(new, old))
+		out = open(str(dest), 'w')
+		f = FileManager.open_tsv(old)
+		for line in f:
+			out.write(line if line.endswith('\n') else line + '\n')
+		f.close()
+		f, started = FileManager.open_tsv(new), False
+		for line in f:
+			started = started or line.startswith('cpt:field') #skip its xmlns / cpt:nfields lines
+			if started:
+				out.write(line)
+		f.close()
+		out.close()
+		return len(new_times)
+
+	@classmethod
+	def split_tsv(self, src, dest, years):
+		"""writes the blocks of cptv10.tsv file src that start (cpt:S, or cpt:T without one) in years (first, last) to dest - what the IRIDL would send for just those years.
+		the first block written gets the whole header, since in src it may only have said what changed from the block before. raises ValueError if no block is in years"""
+		first, last = [int(year) for year in years]
+		f, out = FileManager.open_tsv(src), None
+		preamble, header, order, keep, count = [], {}, [], False, 0
+		for line in f:
+			text = line.rstrip('\r\n')
+			lead = text.split('\t', 1)[0]
+			if lead.startswith('cpt:') and '=' in lead and not lead.startswith('cpt:nfields'):
+				for key, value in [item.strip().split('=', 1) for item in text.split(',') if '=' in item]:
+					order = order if key in header else order + [key]
+					header[key] = value
+				stamp = header.get('cpt:S', header.get('cpt:T', ''))
+				keep = stamp[:4].isdigit() and first <= int(stamp[:4]) <= last
+				if keep and out is None:
+					out = open(str(dest), 'w')
+					out.writelines(preamble)
+					text = ', '.join('{}={}'.format(key, header[key]) for key in order)
+				count += 1 if keep else 0
+			elif len(header) == 0:
+				preamble.append(text + '\n') #xmlns / cpt:nfields
+				continue
+			if keep:
+				out.write(text + '\n')
+		f.close()
+		if out is None:
+			raise ValueError('{} has no blocks from {} to {}'.format(src, first, last))
+		out.close()
+		return count
+
+	@classmethod
+	def stitch_tsv(self, tiles, dest):
+		"""writes gridded cptv10.tsv files tiles - [latitude band][longitude tile], west to east - to dest as one file over all of them, the same file the IRIDL would send for their whole box.
+		grid cells on an edge two tiles share are written once. raises ValueError if the tiles arent the same field and times, or dont line up"""
+		def blocks(f): #header, longitudes, [(latitude, values)] of each block
+			header, lons, rows = None, None, []
+			for line in f:
+				text = line.rstrip('\r\n')
+				values = text.rstrip('\t').split('\t')
+				if values[0].startswith('cpt:') and '=' in values[0]:
+					if values[0].startswith('cpt:nfields'):
+						continue
+					if header is not None:
+						yield header, lons, rows
+					header, lons, rows = text, None, []
+				elif header is None or len(text.strip()) == 0:
+					continue
+				elif lons is None:
+					lons = values[1:]
+				else:
+					rows.append((values[0], values[1:]))
+			if header is not None:
+				yield header, lons, rows
+		def same(header): #what every tile's header has to agree on
+			return dict(item.strip().split('=', 1) for item in header.split(',') if '=' in item and item.strip().split('=', 1)[0] not in ['cpt:nrow', 'cpt:ncol'])
+		files = [[FileManager.open_tsv(path) for path in band] for band in tiles]
+		readers = [[blocks(f) for f in band] for band in files]
+		out, count = open(str(dest), 'w'), 0
+		try:
+			out.write("xmlns:cpt=http://iri.columbia.edu/CPT/v10/\n")
+			out.write("cpt:nfields=1\n")
+			while True:
+				parts = [[next(reader, None) for reader in band] for band in readers]
+				flat = [part for band in parts for part in band]
+				if all(part is None for part in flat):
+					break
+				if any(part is None for part in flat) or any(part[1] is None for part in flat):
+					raise ValueError('the tiles of {} do not all have the same blocks'.format(dest))
+				header = flat[0][0]
+				if count == 0 and 'cpt:row=Y' not in header:
+					raise ValueError('the tiles of {} are not gridded'.format(dest))
+				if any(same(part[0]) != same(header) for part in flat):
+					raise ValueError('the tiles of {} are not all the same field and time'.format(dest))
+				lons, known = [], set()
+				for part in parts[0]:
+					lons.extend(lon for lon in part[1] if lon not in known)
+					known.update(part[1])
+				lats = [float(row[0]) for row in parts[0][0][2]]
+				south_first = len(lats) < 2 or lats[0] < lats[-1] #bands go in the order the file's own latitudes do
+				rows, seen = [], set()
+				for band in sorted(parts, key=lambda band: float(band[0][2][0][0]) if len(band[0][2]) > 0 else 0.0, reverse=not south_first):
+					if set(lon for part in band for lon in part[1]) != known or any([row[0] for row in part[2]] != [row[0] for row in band[0][2]] for part in band):
+						raise ValueError('the tiles of {} do not line up'.format(dest))
+					for r in range(len(band[0][2])):
+						lat = band[0][2][r][0]
+						if lat in seen:
+							continue #the row on the edge between two bands
+						seen.add(lat)
+						cells = {}
+						for part in band:
+							for lon, value in zip(part[1], part[2][r][1]):
+								cells.setdefault(lon, value)
+						rows.append(lat + '\t' + '\t'.join(cells[lon] for lon in lons))
+				header = re.sub(r'cpt:ncol=\d+', 'cpt:ncol={}'.format(len(lons)), re.sub(r'cpt:nrow=\d+', 'cpt:nrow={}'.format(len(rows)), header))
+				out.write(header + '\n')
+				out.write('\t' + '\t'.join(lons) + '\n')
+				for row in rows:
+					out.write(row + '\n')
+				count += 1
+		finally:
+			out.close()
+			for band in files:
+				for f in band:
+					f.close()
+		if count == 0:
+			raise ValueError('the tiles of {} have no data'.format(dest))
+		return count
 
 	def read_forecast(self, path, MOS, fcst_type='type', ctlfname='None'):
 		"""reads a FCST_P .txt or a FCST_mu .txt file"""
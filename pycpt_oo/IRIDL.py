@@ -3,11 +3,15 @@ import sys, os
 import json
 from pathlib import Path
 import platform, copy, warnings
-import subprocess
-import struct, copy, json
+import subprocess, shutil, threading, gzip
+from concurrent.futures import ThreadPoolExecutor
+import struct, copy, json, re, math, time
 import numpy as np
 import datetime as d
 
+from .Downloader import Downloader
+from .DownloadCache import DownloadCache
+
 class IRIDL:
 	"""Class for fetching & managing Hindcasts, Obs, & Forecasts Files from the IRIDL for one Target Season
 	---------------------------------------------------------------------------
@@ -26,8 +30,14 @@ class IRIDL:
 		forecast_tgt (TargetSeason): TargetSeason object holding data about season we will be forecasting
 		predictor (str)		: 	string representing what kind of data were using, rainfall totals or wet day frequency
 		predictand(str)		: 	string holding what kind of predictand data we have
+		leads (dict)		:	{'Hindcasts': (first, last), 'Forecasts': (first, last)} - the leads of every season with this one's start, downloaded once as monthly fields and averaged locally for each season. None to ask the IRIDL for each season's average
+		obs_grid (tuple)	:	(lats, lons, data, times) of the observations, parsed once by prep_obs to validate them for every model of the target season - the Visualizer plots CPT's outputs and never reads them
+		obs_lock (Lock)		:	makes sure only one model fetches and parses the observations
 		arg_dict (dict)		:	dictionary holding all the data that needs to be unpacked into an IRIDL query Ingrid url string
-		url_dict (dict)		:	dictionary holding all of the URLs with {var-name} string formatters inserted in the required locations so arg_dict can be unpacked
+		downloaded (dict)	:	url -> file for every query fetched in this run, so force_download only refreshes a query several seasons share once - PYCPT.initialize gives every IRIDL of a run the same one, and a new one each run
+		shard_degrees (float):	class-level - boxes taller or wider than this many degrees are downloaded as tiles no bigger than it, all at once, and stitched back together (PYCPT_SHARD_DEGREES, 40 by default, 0 for off)
+		shard_years (int)	:	class-level - hindcasts are downloaded as blocks of this many years the same way (PYCPT_SHARD_YEARS, 0 by default - off)
+		url_dict (dict)		:	class-level dictionary holding all of the URLs with {var-name} string formatters inserted in the required locations so arg_dict can be unpacked
 		fprefix (str)		: 	this is the same as predictor, unless somebody else uses it differently
 		L (list)			:	the constant value ['1'] and i dont know why really, dont think its used anymore
 		obs_sources (dict) 	:	dictionary storing Ingrid strings to be put into the query URL for observations data
@@ -35,8 +45,9 @@ class IRIDL:
 		hdate_lasts (dict) 	:	dictionary containing a variable for IRIDL querying, i believe it is year of last available data for observations
 		hdate_last (int)	:	i beleive last available year of data for observations
 		rainfall_frequency (bool) :	 something to do with the RFREQ predictand
-		threshold_pctle (bool)	:	something to do with using the RFREQ predictand
+		threshold_pctle (bool)	:	something to do with using the RFREQ predictand - True reads wetday_threshold as a percentile (0-1) of each cell's days, and counts days at or below it
 		wetday_threshold	:	minimum amount of rainfall to define a 'wetday'
+		local_rfreq (bool)	:	count RFREQ observations here from daily data downloaded once per obs source and domain (TRMM, CPC, CHIRPS), so changing the threshold or season needs no new query - only with threshold_pctle, the one RFREQ query that counts from those daily sources. without it the IRIDL's RFREQ observations are CRU TS wet days, so they're still asked for
 		valid_models (list)	:	allowed model names: ['NextGen', 'CMC1-CanCM3', 'CMC2-CanCM4', 'CanSIPSv2', 'COLA-RSMAS-CCSM4', 'GFDL-CM2p5-FLOR-A06', 'GFDL-CM2p5-FLOR-B01','GFDL-CM2p1-aer04', 'NASA-GEOSS2S', 'NCEP-CFSv2']
 		valid_obs (list)	:	allowed obs names: ['CPC-CMAP-URD', 'CHIRPS', 'TRMM', 'CPC', 'Chilestations','GPCC', 'ENACTS-BD']
 		valid_preds (list)	:	allowed predictand/or names: ['PRCP', 'RFREQ', 'UQ', 'VQ']
@@ -53,11 +64,103 @@ class IRIDL:
 				predictor: str  ) -> IRIDL
 	validate_args( work: str, workdir: str, models: list of str, obs: str, station: bool, predictor: str) -> boolean
 	__setup() -> None (sets up more internal variables)
-	prep_files(model: str, check: Boolean) -> None (Calls 'fetch' for each datatype, hindcasts, forecasts, and observations for the model)
+	prep_files(model: str, obs: Boolean) -> None (Calls 'fetch' for each datatype, hindcasts, forecasts, and observations (unless obs=False) for the model, all at the same time)
+	prep_obs() -> tuple (fetches the observations once per target season and parses them with FileManager.read_tsv - lats, lons, data[T, Y, X], times. raises ValueError if there's no data in them)
 	fetch(model: str, check: boolean) -> None (queries the IRIDL for a file as appropriate, and writes to the working_directory/input folder )
+	query(model: str, datatype: str) -> str (the full IRIDL url fetch asks for)
+	monthly_query(model: str, datatype: str) -> (str, float) (the url for the monthly fields of every lead in self.leads, and the factor seasons are multiplied by - (None, None) if the query doesnt average leads)
+	monthly_file(model: str, datatype: str) -> Path (where the monthly leads go, relative to the work directory)
+	shared_download(url: str, path: Path, datatype: str) -> None (downloads a file several seasons are made from, once)
+	combined_query(model: str) -> (str, tuple, tuple) (the url for a model's hindcast and forecast streams appended from tini to fyr, and the years (first, last) of each - (None, None, None) if the model's queries arent two parts of one stream)
+	combined_file(model: str) -> Path (where the combined series goes, relative to the work directory)
+	split(model: str, datatype: str, outpath: Path) -> Boolean (writes the hindcasts or forecasts to outpath from the one series both are in, see FileManager.split_tsv - False if it couldnt)
+	daily_query() -> str (the url for daily observations RFREQ seasons are counted from - None if the obs source has no daily data, or without threshold_pctle, whose observations are CRU TS wet days instead)
+	wet_days(outpath: Path) -> Boolean (writes the season's RFREQ observations to outpath, counted from the daily observations with wetday_threshold / threshold_pctle, see FileManager.wet_days - False if it couldnt)
+	aggregate(model: str, datatype: str, outpath: Path) -> Boolean (writes the season to outpath from the monthly leads every season with the same start shares, see FileManager.aggregate_leads - False if it couldnt)
+	queries(model: str) -> list (every url prep_files asks for)
+	sources(model: str) -> list (every url prep_files downloads - the queries, or the shared downloads local_seasons / split / local_rfreq make files from instead)
+	current(path: Path, url: str) -> Boolean (False if the file was downloaded from a different query - written next to each file as path.url)
+	remember(path: Path, url: str) -> None (writes path.url)
+	shards(url: str) -> list (the smaller queries url is downloaded as, [year block][latitude band][longitude tile] - tiles no bigger than shard_degrees (PYCPT_SHARD_DEGREES, 40 by default), blocks of shard_years (PYCPT_SHARD_YEARS, off by default))
+	sharded(shards: list, path: Path, check: function) -> dict (downloads every shard at once and stitches them into path, see FileManager.stitch_tsv - raises if a shard fails after its retries)
+	gunzip(path: Path) -> None (replaces a gzipped download with the text inside it)
+	fix_nfields(path: Path) -> None (rewrites the cpt:nfields=0 Ingrid sends for station files as 1)
+	input_file(model: str, datatype: str) -> Path (where fetch puts a datatype's file, relative to the work directory)
+	input_files(model: str) -> list (every file prep_files makes for a model)
+	download(url: str, outpath: Path, datatype: str, fix_nfields: bool) -> None (with force_download='revalidate', first asks the server whether a file we have changed - see DownloadCache.revalidate. downloads one query with the shared Downloader into the DownloadCache, or links the cached file if any run already downloaded the same query, or cuts it from a cached query for a bigger domain, or only downloads the years a cached query for fewer years doesnt have. a download is only kept once FileManager.check_tsv passes)
 	callSys(arg: str) -> None (runs a system command)
 	---------------------------------------------------------------------------"""
 
+	shared_lock = threading.Lock()
+	file_locks = {} #monthly leads file -> Lock, so seasons sharing one wait for a single download
+	seasonal = 'L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/' #the part of a model query that averages the season's leads
+	multiplier = r'/\{(nmonths30|ndays)\}/mul/' #and turns mm/day into a seasonal total
+	appended = r'/appendstream/S/%280000%201%20(\w+)%20(\d{4})-(\d{4})%29/VALUES/' #a hindcast query's start dates, in the HINDCAST stream with the FORECAST one appended
+	single = r'/S/%280000%201%20(\w+)%20(\d{4})%29/VALUES/' #a forecast query's one start date
+	shard_degrees = float(os.environ.get('PYCPT_SHARD_DEGREES', 40)) #boxes taller or wider than this are downloaded as tiles no bigger than it, all at once - 0 turns it off
+	shard_years = int(os.environ.get('PYCPT_SHARD_YEARS', 0)) #and hindcasts as blocks of this many years - 0 (the default) asks for every year at once
+	daily_obs = ['TRMM', 'CPC', 'CHIRPS'] #obs sources with daily data, so wet days can be counted locally
+	daily_url = 'https://iridl.ldeo.columbia.edu/{daily_source}/Y/{sla}/{nla}/RANGE/X/{wlo}/{elo}/RANGE/T/(days%20since%201960-01-01)/streamgridunitconvert/T/(1%20Jan%201982)/(31%20Dec%202010)/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv' #same cells and years the IRIDL counts RFREQ over
+
+	url_dict = { #class level so its built once per process, not once per IRIDL - dict  that stores urls  to be dynamically formatted with arg_dicts contents
+	  'Hindcasts': { #Hindcasts is [fprefix][model]
+	    'PRCP': {	'CanSIPSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CanSIPSv2/.HINDCAST/.MONTHLY/.prec/SOURCES/.Models/.NMME/.CanSIPSv2/.FORECAST/.MONTHLY/.prec/appendstream/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'CMC1-CanCM3': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC1-CanCM3/.HINDCAST/.MONTHLY/.prec/SOURCES/.Models/.NMME/.CMC1-CanCM3/.FORECAST/.MONTHLY/.prec/appendstream/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'CMC2-CanCM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC2-CanCM4/.HINDCAST/.MONTHLY/.prec/SOURCES/.Models/.NMME/.CMC2-CanCM4/.FORECAST/.MONTHLY/.prec/appendstream/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'COLA-RSMAS-CCSM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.COLA-RSMAS-CCSM4/.MONTHLY/.prec/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p5-FLOR-A06': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-A06/.MONTHLY/.prec/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p5-FLOR-B01': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-B01/.MONTHLY/.prec/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p1-aer04': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p1-aer04/.MONTHLY/.prec/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'NASA-GEOSS2S': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NASA-GEOSS2S/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'NCEP-CFSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NCEP-CFSv2/.HINDCAST/.PENTAD_SAMPLES/.MONTHLY/.prec/SOURCES/.Models/.NMME/.NCEP-CFSv2/.FORECAST/.PENTAD_SAMPLES/.MONTHLY/.prec/appendstream/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/M/%281%29%2824%29RANGE/%5BM%5D/average/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
+	    'UQ': {'NCEP-CFSv2': 'http://iridl.ldeo.columbia.edu/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.ENSEMBLE/.PGBF/.pressure_level/.VGRD/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.ENSEMBLE/.PGBF/.pressure_level/.SPFH/mul/P/850/VALUE/S/%2812%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
+	    'VQ': {'NCEP-CFSv2': 'http://iridl.ldeo.columbia.edu/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.ENSEMBLE/.PGBF/.pressure_level/.VGRD/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.ENSEMBLE/.PGBF/.pressure_level/.SPFH/mul/P/850/VALUE/S/%281%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
+	    'RFREQ': {	'CanSIPSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CanSIPSv2/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'CMC1-CanCM3': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC1-CanCM3/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'CMC2-CanCM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC2-CanCM4/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'COLA-RSMAS-CCSM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.COLA-RSMAS-CCSM4/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p5-FLOR-A06': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-A06/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p5-FLOR-B01': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-B01/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p1-aer04': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p1-aer04/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'NASA-GEOSS2S': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NASA-GEOSS2S/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'NCEP-CFSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NCEP-CFSv2/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
+	},
+	  'Observations': { #obs is [fpre][threshold_pctle if fpre==RFREQ else obs]
+	    'RFREQ': {
+	        True: 'https://iridl.ldeo.columbia.edu/{obs_source}/Y/{sla}/{nla}/RANGE/X/{wlo}/{elo}/RANGE/T/(days%20since%201960-01-01)/streamgridunitconvert/T/(1%20Jan%201982)/(31%20Dec%202010)/RANGEEDGES/%5BT%5Dpercentileover/{wetday_threshold}/flagle/T/{ndays}/runningAverage/{ndays}/mul/T/2/index/.T/SAMPLE/nip/dup/T/npts//I/exch/NewIntegerGRID/replaceGRID/dup/I/5/splitstreamgrid/%5BI2%5Daverage/sub/I/3/-1/roll/.T/replaceGRID/-999/setmissing_value/grid%3A//name/(T)/def//units/(months%20since%201960-01-01)/def//standard_name/(time)/def//pointwidth/1/def/16/Jan/1901/ensotime/12./16/Jan/3001/ensotime/%3Agrid/use_as_grid//name/(fp)/def//units/(unitless)/def//long_name/(rainfall_freq)/def/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv.gz',
+	        False:'http://datoteca.ole2.org/SOURCES/.UEA/.CRU/.TS4p0/.monthly/.wet/lon/%28X%29/renameGRID/lat/%28Y%29/renameGRID/time/%28T%29/renameGRID/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv'},
+	    'PRCP': {   'Chilestations': 'http://iridl.ldeo.columbia.edu/{obs_source}/T/%28{tgt}%29/seasonalAverage/-999/setmissing_value/%5B%5D%5BT%5Dcptv10.tsv',
+	                'ENACTS-BD':'https://datalibrary.bmd.gov.bd/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv',
+	                'CPC-CMAP-URD': 'https://iridl.ldeo.columbia.edu/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv',
+	                'TRMM': 'https://iridl.ldeo.columbia.edu/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv',
+	                'CPC': 'https://iridl.ldeo.columbia.edu/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv',
+	                'CHIRPS': 'https://iridl.ldeo.columbia.edu/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv',
+	                'GPCC': 'https://iridl.ldeo.columbia.edu/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv'
+	    }
+	  },
+	  'Forecasts': { #keys if first key is forecasts are ['Forecasts'][fprefix][model]
+	    'PRCP': {	'CanSIPSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CanSIPSv2/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'CMC1-CanCM3': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC1-CanCM3/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+				    'CMC2-CanCM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC2-CanCM4/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'COLA-RSMAS-CCSM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.COLA-RSMAS-CCSM4/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p5-FLOR-A06': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-A06/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p5-FLOR-B01': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-B01/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p1-aer04': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p1-aer04/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'NASA-GEOSS2S': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NASA-GEOSS2S/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'NCEP-CFSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NCEP-CFSv2/.FORECAST/.EARLY_MONTH_SAMPLES/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
+	    'UQ': {'NCEP-CFSv2': 'http://iridl.ldeo.columbia.edu/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.REALTIME_ENSEMBLE/.PGBF/.pressure_level/.VGRD/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.REALTIME_ENSEMBLE/.PGBF/.pressure_level/.SPFH/mul/P/850/VALUE/S/%281%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
+	    'VQ': {'NCEP-CFSv2': 'http://iridl.ldeo.columbia.edu/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.REALTIME_ENSEMBLE/.PGBF/.pressure_level/.VGRD/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.REALTIME_ENSEMBLE/.PGBF/.pressure_level/.SPFH/mul/P/850/VALUE/S/%281%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
+	    'RFREQ': {	'CMC1-CanCM3': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC1-CanCM3/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+				    'CMC2-CanCM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC2-CanCM4/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'COLA-RSMAS-CCSM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.COLA-RSMAS-CCSM4/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p5-FLOR-A06': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-A06/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p5-FLOR-B01': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-B01/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'GFDL-CM2p1-aer04': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p1-aer04/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'NASA-GEOSS2S': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NASA-GEOSS2S/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
+					'NCEP-CFSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NCEP-CFSv2/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
+	  }
+	}
+
 	def callSys(self, arg):
 		"""Calling a system command, but get_ipython().system breaks too easily when youre not in a jupyter notebook"""
 		try:
@@ -65,7 +168,7 @@ class IRIDL:
 		except:
 			subprocess.check_output(arg, shell=True) #if were not, get_ipython acts weirdly so jsut used subprocess
 
-	def __init__(self, fm,  obs_args, hindcast_args, forecast_args,  models, verbose=True):
+	def __init__(self, fm,  obs_args, hindcast_args, forecast_args,  models, verbose=True, leads=None, local_rfreq=False, wetday_threshold=None, threshold_pctle=None, downloaded=None):
 		"""constructor - creates an IRIDL object"""
 		self.verbose = verbose #whether or not to print out the output. CURL output may print anyway.
 		obs, station, predictor, predictand = obs_args.obs, obs_args.station, obs_args.predictor, obs_args.predictand
@@ -88,7 +191,13 @@ class IRIDL:
 		self.predictor, self.predictand = predictor, predictand #Type of data we are working with, PRCP, UQ, VQ, RFREQ, and in the future TEMP
 		self.fprefix = self.predictor #this is an artifact of old versions of PyCPT, just roll with it
 		self.L=['1'] #this is an artefact of an older time, I dont think it's used anymore but dont have time to verify
+		self.local_rfreq = local_rfreq #count RFREQ observations here from daily data, instead of asking the IRIDL for each season
+		self.wetday_threshold, self.threshold_pctle = wetday_threshold, threshold_pctle #None keeps the defaults __setup picks
 		self.__setup() #finishes up some more internal variables automatically
+		self.obs_grid = None #(lats, lons, data, times) of the observations, once prep_obs has read them
+		self.leads = leads #{'Hindcasts': (first, last), 'Forecasts': (first, last)} - leads every season with the same start needs, to download once and average here. None asks the IRIDL for each season
+		self.obs_lock = threading.Lock() #models of one target season share one observations file, so only one of them fetches it
+		self.downloaded = {} if downloaded is None else downloaded #url -> file, for every query this run has fetched - shared with the other IRIDLs of the run
 
 		self.arg_dict = { #need to unpack stuff from TargetSeason and Domain members into a dict that we can use for dynamic string formatting
 			'Hindcasts': {**vars(self.hindcasts_tgt), **vars(self.hindcasts_domain), 'wetday_threshold':self.wetday_threshold, 'hdate_last':self.hdate_last, 'threshold_pctle': self.threshold_pctle, 'rainfall_frequency':self.rainfall_frequency},
@@ -96,108 +205,181 @@ class IRIDL:
 			'Forecasts': {**vars(self.forecasts_tgt), **vars(self.forecasts_domain), 'wetday_threshold':self.wetday_threshold, 'hdate_last':self.hdate_last, 'threshold_pctle': self.threshold_pctle, 'rainfall_frequency':self.rainfall_frequency}
 		}
 
-		self.url_dict = { #dict  that stores urls  to be dynamically formatted with arg_dicts contents
-		  'Hindcasts': { #Hindcasts is [fprefix][model]
-		    'PRCP': {	'CanSIPSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CanSIPSv2/.HINDCAST/.MONTHLY/.prec/SOURCES/.Models/.NMME/.CanSIPSv2/.FORECAST/.MONTHLY/.prec/appendstream/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'CMC1-CanCM3': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC1-CanCM3/.HINDCAST/.MONTHLY/.prec/SOURCES/.Models/.NMME/.CMC1-CanCM3/.FORECAST/.MONTHLY/.prec/appendstream/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'CMC2-CanCM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC2-CanCM4/.HINDCAST/.MONTHLY/.prec/SOURCES/.Models/.NMME/.CMC2-CanCM4/.FORECAST/.MONTHLY/.prec/appendstream/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'COLA-RSMAS-CCSM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.COLA-RSMAS-CCSM4/.MONTHLY/.prec/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p5-FLOR-A06': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-A06/.MONTHLY/.prec/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p5-FLOR-B01': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-B01/.MONTHLY/.prec/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p1-aer04': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p1-aer04/.MONTHLY/.prec/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'NASA-GEOSS2S': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NASA-GEOSS2S/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'NCEP-CFSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NCEP-CFSv2/.HINDCAST/.PENTAD_SAMPLES/.MONTHLY/.prec/SOURCES/.Models/.NMME/.NCEP-CFSv2/.FORECAST/.PENTAD_SAMPLES/.MONTHLY/.prec/appendstream/S/%280000%201%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/M/%281%29%2824%29RANGE/%5BM%5D/average/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
-		    'UQ': {'NCEP-CFSv2': 'http://iridl.ldeo.columbia.edu/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.ENSEMBLE/.PGBF/.pressure_level/.VGRD/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.ENSEMBLE/.PGBF/.pressure_level/.SPFH/mul/P/850/VALUE/S/%2812%20{init}%20{tini}-{tend}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
-		    'VQ': {'NCEP-CFSv2': 'http://iridl.ldeo.columbia.edu/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.ENSEMBLE/.PGBF/.pressure_level/.VGRD/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.ENSEMBLE/.PGBF/.pressure_level/.SPFH/mul/P/850/VALUE/S/%281%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
-		    'RFREQ': {	'CanSIPSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CanSIPSv2/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'CMC1-CanCM3': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC1-CanCM3/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'CMC2-CanCM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC2-CanCM4/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'COLA-RSMAS-CCSM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.COLA-RSMAS-CCSM4/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p5-FLOR-A06': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-A06/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p5-FLOR-B01': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-B01/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p1-aer04': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p1-aer04/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'NASA-GEOSS2S': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NASA-GEOSS2S/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'NCEP-CFSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NCEP-CFSv2/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{init}%201982-2009%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{ndays}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
-		},
-		  'Observations': { #obs is [fpre][threshold_pctle if fpre==RFREQ else obs]
-		    'RFREQ': {
-		        True: 'https://iridl.ldeo.columbia.edu/{obs_source}/Y/{sla}/{nla}/RANGE/X/{wlo}/{elo}/RANGE/T/(days%20since%201960-01-01)/streamgridunitconvert/T/(1%20Jan%201982)/(31%20Dec%202010)/RANGEEDGES/%5BT%5Dpercentileover/{wetday_threshold}/flagle/T/{ndays}/runningAverage/{ndays}/mul/T/2/index/.T/SAMPLE/nip/dup/T/npts//I/exch/NewIntegerGRID/replaceGRID/dup/I/5/splitstreamgrid/%5BI2%5Daverage/sub/I/3/-1/roll/.T/replaceGRID/-999/setmissing_value/grid%3A//name/(T)/def//units/(months%20since%201960-01-01)/def//standard_name/(time)/def//pointwidth/1/def/16/Jan/1901/ensotime/12./16/Jan/3001/ensotime/%3Agrid/use_as_grid//name/(fp)/def//units/(unitless)/def//long_name/(rainfall_freq)/def/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv.gz',
-		        False:'http://datoteca.ole2.org/SOURCES/.UEA/.CRU/.TS4p0/.monthly/.wet/lon/%28X%29/renameGRID/lat/%28Y%29/renameGRID/time/%28T%29/renameGRID/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv'},
-		    'PRCP': {   'Chilestations': 'http://iridl.ldeo.columbia.edu/{obs_source}/T/%28{tgt}%29/seasonalAverage/-999/setmissing_value/%5B%5D%5BT%5Dcptv10.tsv',
-		                'ENACTS-BD':'https://datalibrary.bmd.gov.bd/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv',
-		                'CPC-CMAP-URD': 'https://iridl.ldeo.columbia.edu/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv',
-		                'TRMM': 'https://iridl.ldeo.columbia.edu/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv',
-		                'CPC': 'https://iridl.ldeo.columbia.edu/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv',
-		                'CHIRPS': 'https://iridl.ldeo.columbia.edu/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv',
-		                'GPCC': 'https://iridl.ldeo.columbia.edu/{obs_source}/T/%28Jan%201982%29/%28Dec%202010%29/RANGE/T/%28{tgt}%29/seasonalAverage/Y/%28{sla}%29/%28{nla}%29/RANGEEDGES/X/%28{wlo}%29/%28{elo}%29/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BT%5Dcptv10.tsv'
-		    }
-		  },
-		  'Forecasts': { #keys if first key is forecasts are ['Forecasts'][fprefix][model]
-		    'PRCP': {	'CanSIPSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CanSIPSv2/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'CMC1-CanCM3': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC1-CanCM3/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-					    'CMC2-CanCM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC2-CanCM4/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'COLA-RSMAS-CCSM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.COLA-RSMAS-CCSM4/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p5-FLOR-A06': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-A06/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p5-FLOR-B01': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-B01/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p1-aer04': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p1-aer04/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'NASA-GEOSS2S': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NASA-GEOSS2S/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'NCEP-CFSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NCEP-CFSv2/.FORECAST/.EARLY_MONTH_SAMPLES/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/{nmonths30}/mul/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
-		    'UQ': {'NCEP-CFSv2': 'http://iridl.ldeo.columbia.edu/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.REALTIME_ENSEMBLE/.PGBF/.pressure_level/.VGRD/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.REALTIME_ENSEMBLE/.PGBF/.pressure_level/.SPFH/mul/P/850/VALUE/S/%281%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
-		    'VQ': {'NCEP-CFSv2': 'http://iridl.ldeo.columbia.edu/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.REALTIME_ENSEMBLE/.PGBF/.pressure_level/.VGRD/SOURCES/.NOAA/.NCEP/.EMC/.CFSv2/.REALTIME_ENSEMBLE/.PGBF/.pressure_level/.SPFH/mul/P/850/VALUE/S/%281%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
-		    'RFREQ': {	'CMC1-CanCM3': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC1-CanCM3/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-					    'CMC2-CanCM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.CMC2-CanCM4/.FORECAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'COLA-RSMAS-CCSM4': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.COLA-RSMAS-CCSM4/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p5-FLOR-A06': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-A06/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p5-FLOR-B01': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p5-FLOR-B01/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'GFDL-CM2p1-aer04': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.GFDL-CM2p1-aer04/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'NASA-GEOSS2S': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NASA-GEOSS2S/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv',
-						'NCEP-CFSv2': 'https://iridl.ldeo.columbia.edu/SOURCES/.Models/.NMME/.NCEP-CFSv2/.HINDCAST/.MONTHLY/.prec/S/%280000%201%20{monf}%20{fyr}%29/VALUES/L/{tgti}/{tgtf}/RANGEEDGES/%5BL%5D//keepgrids/average/%5BM%5D/average/Y/{sla}/{nla}/RANGEEDGES/X/{wlo}/{elo}/RANGEEDGES/-999/setmissing_value/%5BX/Y%5D%5BL/S/add%5D/cptv10.tsv'},
-		  }
-		}
-
-	def fetch(self, model, datatype):
-		"""downloads data from the IRI Data Library Using Ingrid"""
-		if datatype == 'Observations': #Get the proper URL from the URL dict defined in constructor - different datatypes have different key patterns, so you need the if/else
+	def query(self, model, datatype):
+		"""the full IRIDL url fetch asks for, for a model and datatype"""
+		if datatype == 'Observations': #Get the proper URL from the URL dict defined on the class - different datatypes have different key patterns, so you need the if/else
 			url = self.url_dict[datatype][self.fprefix][self.threshold_pctle if self.fprefix == 'RFREQ' else self.obs ]
 		else:
 			url = self.url_dict[datatype][self.fprefix][model]
+		return url.format(**self.arg_dict[datatype])
+
+	def queries(self, model):
+		"""every url prep_files asks for, for a model"""
+		return [self.query(model, datatype) for datatype in ['Hindcasts', 'Observations', 'Forecasts']]
+
+	def sources(self, model):
+		"""every url prep_files actually downloads for a model - with local_seasons, split and local_rfreq, the shared downloads its files are made from instead of their own queries"""
+		urls = [self.daily_query() if self.local_rfreq and self.fprefix == 'RFREQ' and self.daily_query() is not None else self.query(None, 'Observations')]
+		for datatype in ['Hindcasts', 'Forecasts']:
+			urls.append(self.monthly_query(model, datatype)[0] or self.combined_query(model)[0] or self.query(model, datatype))
+		return [url for i, url in enumerate(urls) if url not in urls[:i]]
 
+	def monthly_query(self, model, datatype):
+		"""the query for the monthly fields of every lead in self.leads, instead of one season's average - and the factor the season's average is multiplied by. (None, None) for queries that dont average leads"""
+		if self.leads is None or datatype not in self.leads or datatype == 'Observations':
+			return None, None
+		url = self.url_dict[datatype][self.fprefix].get(model)
+		if url is None or url.count(IRIDL.seasonal) != 1:
+			return None, None
+		factor = re.search(IRIDL.multiplier, url)
+		url = url.replace(IRIDL.seasonal, 'L/{lead_first}/{lead_last}/RANGEEDGES/')
+		if factor is not None:
+			url = url.replace(factor.group(0), '/')
+		first, last = self.leads[datatype]
+		return url.format(lead_first=first, lead_last=last, **self.arg_dict[datatype]), 1.0 if factor is None else float(self.arg_dict[datatype][factor.group(1)])
+
+	def monthly_file(self, model, datatype):
+		"""where aggregate puts the monthly leads a model's seasons are averaged from"""
+		first, last = self.leads[datatype]
 		if datatype == 'Hindcasts':
-			outpath =  Path('input', model+"_{}_".format(self.fprefix)+self.hindcasts_tgt.tgt+"_ini"+self.hindcasts_tgt.init+".tsv")
-		elif datatype == 'Observations':
-			outpath =  Path("input", "obs_"+self.fpre+"_"+self.observations_tgt.tgt+".tsv") #we set fpre as an artefact of old versions , its probably just predictand or predictor
-		else:
-			outpath = Path("input", model+"fcst_{}_".format(self.fprefix)+self.forecasts_tgt.tgt+"_ini"+self.forecasts_tgt.monf+str(self.forecasts_domain.fyr)+".tsv")
+			return Path('input', model+"_{}_monthly_L{}-{}_ini{}.tsv".format(self.fprefix, first, last, self.hindcasts_tgt.init))
+		return Path('input', model+"fcst_{}_monthly_L{}-{}_ini{}{}.tsv".format(self.fprefix, first, last, self.forecasts_tgt.monf, self.forecasts_domain.fyr))
 
-		check, outpath = self.fm.check(outpath) #filemanager looks if there is a file named this yet or not, returns true if so
+	def aggregate(self, model, datatype, outpath):
+		"""makes a season's file from the monthly leads of its start, downloading them if no season with the same start has yet - returns False if it cant, and the season should be asked for as usual"""
+		url, factor = self.monthly_query(model, datatype)
+		if url is None:
+			return False
+		path = self.fm.check(self.monthly_file(model, datatype))[1]
+		try:
+			self.shared_download(url, path, 'Monthly {}'.format(datatype))
+			tgt = self.hindcasts_tgt if datatype == 'Hindcasts' else self.forecasts_tgt
+			self.fm.aggregate_leads(path, outpath, tgt.tgti, tgt.tgtf, factor)
+		except (ValueError, IOError) as e:
+			message = 'Could not make {} {} from monthly leads, asking the IRIDL for the season instead - {}: {}'.format(model, datatype, type(e).__name__, e)
+			if self.verbose:
+				print(message)
+			else:
+				self.fm.log(message + '\n')
+			return False
+		return True
 
-		if self.fm.force_download or not check: #if user has selected force_download=True or the FileManager filecheck returned False indicating a missing input file
+	def combined_query(self, model):
+		"""the query for one series of a model's hindcast stream with its forecast stream appended, from tini to fyr - when the hindcast query appends the stream the forecast query asks for, with the same start month, season and domain.
+		returns it with the years (first, last) the hindcasts and forecasts each get out of it, or (None, None, None). NCEP-CFSv2 appends PENTAD_SAMPLES but forecasts from EARLY_MONTH_SAMPLES, so it never qualifies"""
+		if model not in self.url_dict['Hindcasts'][self.fprefix] or model not in self.url_dict['Forecasts'][self.fprefix]:
+			return None, None, None
+		hindcasts, forecasts = self.query(model, 'Hindcasts'), self.query(model, 'Forecasts')
+		h, f = re.search(IRIDL.appended, hindcasts), re.search(IRIDL.single, forecasts)
+		if h is None or f is None or '/SOURCES/' not in forecasts[:f.start()]:
+			return None, None, None
+		stream = '/SOURCES/' + forecasts[:f.start()].split('/SOURCES/', 1)[1]
+		tini, tend, fyr = int(h.group(2)), int(h.group(3)), int(f.group(2))
+		if not hindcasts[:h.start()].endswith(stream) or h.group(1) != f.group(1) or hindcasts[h.end():] != forecasts[f.end():] or fyr <= tend:
+			return None, None, None
+		url = hindcasts[:h.start()] + '/appendstream/S/%280000%201%20{}%20{}-{}%29/VALUES/'.format(h.group(1), tini, fyr) + hindcasts[h.end():]
+		return url, (tini, tend), (fyr, fyr)
+
+	def combined_file(self, model):
+		"""where split puts the series both of a model's files are made from"""
+		return Path('input', model+"_{}_".format(self.fprefix)+self.hindcasts_tgt.tgt+"_ini"+self.hindcasts_tgt.init+"_with_fcst"+str(self.forecasts_domain.fyr)+".tsv")
+
+	def split(self, model, datatype, outpath):
+		"""makes a model's hindcasts or forecasts file from one download of both (see combined_query), whichever of the two runs first downloads it - returns False if it cant, and the datatype should be asked for as usual"""
+		url, hindcast_years, forecast_years = self.combined_query(model)
+		if url is None:
+			return False
+		path = self.fm.check(self.combined_file(model))[1]
+		try:
+			self.shared_download(url, path, 'Hindcasts and Forecasts')
+			self.fm.split_tsv(path, outpath, hindcast_years if datatype == 'Hindcasts' else forecast_years)
+		except (ValueError, IOError) as e:
+			message = 'Could not make {} {} from one download of both, asking the IRIDL for them on their own instead - {}: {}'.format(model, datatype, type(e).__name__, e)
 			if self.verbose:
-				print("\033[1mWarning:\033[0;0m {0}".format("FileNotFoundError:")) #print message saying we need to download file
-				print("{} precip file doesn't exist --\033[1mSOLVING: downloading file\033[0;0m".format(datatype))  #dont ask me, it prints out the message lol
-				print("\n {} data - URL: \n\n ".format(datatype)+url.format(**self.arg_dict[datatype])) #print out the url - can click on the link in jupyter notebook to download the file / see where it takes you if theres an error
-				self.callSys("curl -k "+url.format(**self.arg_dict[datatype])+" > {}".format(outpath)) #curl is a command line utility that asks a website for the files it serves - we give it the url of an IRIDL download link
+				print(message)
 			else:
-				f = open('./results.out', 'a')
-				f.write("\033[1mWarning:\033[0;0m {0}".format("FileNotFoundError:\n"))
-				f.write("{} precip file doesn't exist --\033[1mSOLVING: downloading file\033[0;0m\n".format(datatype))
-				f.write("\n {} data - URL: \n\n ".format(datatype)+url.format(**self.arg_dict[datatype]))
-				self.callSys("curl -k "+url.format(**self.arg_dict[datatype])+" 2> {} > {}".format(str(outpath)[:-4] + '.out', outpath)) #curl is a command line utility that asks a website for the files it serves - we give it the url of an IRIDL download link
-				f.close()
-			if self.obs_source=='home/.xchourio/.ACToday/.CHL/.prcp':   #weirdly enough, Ingrid sends the file with nfields=0. This is my solution for now. AGM
-				replaceAll("./input/obs_"+self.predictor+"_"+self.observations_tgt.tgt+".tsv","cpt:nfields=0","cpt:nfields=1") #unclear
+				self.fm.log(message + '\n')
+			return False
+		return True
+
+	def shared_download(self, url, path, datatype):
+		"""downloads a file several seasons make theirs from, unless its already there from the same query - seasons run side by side, so one of them downloads and the rest wait for it"""
+		with IRIDL.shared_lock:
+			lock = IRIDL.file_locks.setdefault(str(path), threading.Lock())
+		with lock:
+			if not Path(path).is_file() or not self.current(path, url) or self.fm.force_download == 'revalidate' and url not in self.downloaded:
+				self.download(url, path, datatype)
+
+	def daily_query(self):
+		"""the query for the daily observations every RFREQ season is counted from - None if the obs source isnt daily, or if the IRIDL's own RFREQ observations dont come from it (threshold_pctle=False counts CRU TS wet days)"""
+		if self.obs not in IRIDL.daily_obs or self.threshold_pctle is not True:
+			return None
+		source = re.sub(r'/[0-9.]+/mul$', '', self.obs_source) #some sources scale to the season in the query - we want plain daily mm
+		return IRIDL.daily_url.format(daily_source=source, **self.arg_dict['Observations'])
+
+	def wet_days(self, outpath):
+		"""counts a season's wet days (or, with threshold_pctle, dry days - like the IRIDL's flagle) from daily observations downloaded once for every season and threshold, and writes them to outpath - returns False if it cant, and the season should be asked for as usual"""
+		if not self.local_rfreq or self.fprefix != 'RFREQ' or self.daily_query() is None:
+			return False
+		path = self.fm.check(Path('input', 'obs_daily_{}.tsv'.format(self.obs)))[1]
+		try:
+			self.shared_download(self.daily_query(), path, 'Daily Observations')
+			self.fm.wet_days(path, outpath, self.observations_tgt.tgt, self.wetday_threshold, self.threshold_pctle)
+		except (ValueError, IOError) as e:
+			message = 'Could not count {} wet days from daily observations, asking the IRIDL for the season instead - {}: {}'.format(self.observations_tgt.tgt, type(e).__name__, e)
+			if self.verbose:
+				print(message)
+			else:
+				self.fm.log(message + '\n')
+			return False
+		return True
+
+	def current(self, path, url):
+		"""False if the file at path was downloaded from a different url than this one - ie, the query changed since. files from before we kept track count as current"""
+		sidecar = str(path) + '.url'
+		if not os.path.isfile(sidecar):
+			return True
+		f = open(sidecar, 'r')
+		old = f.read().strip()
+		f.close()
+		return old == url
+
+	def fetch(self, model, datatype):
+		"""downloads data from the IRI Data Library Using Ingrid"""
+		url = self.query(model, datatype)
+		check, outpath = self.fm.check(self.input_file(model, datatype)) #filemanager looks if there is a file named this yet or not, returns true if so
+
+		if self.fm.force_download or not check or not self.current(outpath, url): #if user has selected force_download=True, the FileManager filecheck returned False indicating a missing input file, or the file is from a different query
+			made = self.wet_days(outpath) if datatype == 'Observations' else self.aggregate(model, datatype, outpath) or self.split(model, datatype, outpath) #from a download other seasons share, if asked to - or the other datatype does
+			if made:
+				self.remember(outpath, url) #same file the query would have made, as far as current() is concerned
+			else:
+				self.download(url, outpath, datatype, self.obs_source=='home/.xchourio/.ACToday/.CHL/.prcp') #weirdly enough, Ingrid sends Chilestations files with nfields=0 - download fixes that. AGM
 
 		if self.verbose:  #if force_download is false and check returns that it found the files, no need to download
 			print('{} file ready to go'.format(datatype))
 			print('----------------------------------------------')
 		else:
-			f = open('./results.out', 'a')
+			f = open(self.fm.path('results.out'), 'a')
 			f.write('Preparing CPT files for '+model+' and initialization '+self.hindcasts_tgt.init+'...\n')
 			f.close()
 
+	def input_file(self, model, datatype):
+		"""where fetch puts a datatype's file for a model, relative to the work directory"""
+		if datatype == 'Hindcasts':
+			return Path('input', model+"_{}_".format(self.fprefix)+self.hindcasts_tgt.tgt+"_ini"+self.hindcasts_tgt.init+".tsv")
+		elif datatype == 'Observations':
+			return Path("input", "obs_"+self.fpre+"_"+self.observations_tgt.tgt+".tsv") #we set fpre as an artefact of old versions , its probably just predictand or predictor
+		else:
+			return Path("input", model+"fcst_{}_".format(self.fprefix)+self.forecasts_tgt.tgt+"_ini"+self.forecasts_tgt.monf+str(self.forecasts_domain.fyr)+".tsv")
+
+	def input_files(self, model):
+		"""every file prep_files makes for a model"""
+		return [self.input_file(model, datatype) for datatype in ['Hindcasts', 'Observations', 'Forecasts']]
+
 	def fetch_one(self, model, datatype, arg_dict):
 		"""downloads data from the IRI Data Library Using Ingrid for one model if passed a dict filled with the args to put into the IRIDL url"""
-		if datatype == 'Observations': #Get the proper URL from the URL dict defined in constructor - different datatypes have different key patterns, so you need the if/else
+		if datatype == 'Observations': #Get the proper URL from the URL dict defined on the class - different datatypes have different key patterns, so you need the if/else
 			url = self.url_dict[datatype][arg_dict['fprefix']][arg_dict['threshold_pctle'] if arg_dict['fprefix'] == 'RFREQ' else arg_dict['obs'] ]
 		else:
 			url = self.url_dict[datatype][arg_dict['fprefix']][model]
@@ -212,47 +394,190 @@ class IRIDL:
 		check, outpath = self.fm.check(outpath) #filemanager looks if there is a file named this yet or not, returns true if so
 
 		if self.fm.force_download or not check: #if user has selected force_download=True or the FileManager filecheck returned False indicating a missing input file
-			if self.verbose:
+			self.download(url.format(**self.arg_dict[datatype]), outpath, datatype, arg_dict['obs_source']=='home/.xchourio/.ACToday/.CHL/.prcp')
+
+		if self.verbose:  #if force_download is false and check returns that it found the files, no need to download
+			print('{} file ready to go'.format(datatype))
+			print('----------------------------------------------')
+		else:
+			f = open(self.fm.path('results.out'), 'a')
+			f.write('Preparing CPT files for '+model+' and initialization '+arg_dict['init']+'...\n')
+			f.close()
+
+
+	def download(self, url, outpath, datatype, fix_nfields=False):
+		"""downloads one IRIDL query to outpath through the shared DownloadCache - a query any run on this machine already downloaded is linked instead of fetched again"""
+		def check(path): #runs on the finished .download file, before it gets its real name
+			f = open(path, 'rb')
+			packed = f.read(2) == b'\x1f\x8b'
+			f.close()
+			if packed: #queries ending in .tsv.gz come back gzipped - CPT only reads plain text
+				self.gunzip(path)
+			if fix_nfields:
+				self.fix_nfields(path) #unclear
+			self.fm.check_tsv(path)
+		def get(path, source=url, validators=None): #source is some other url when the cache only needs part of this one - the years it doesnt have yet. validators make it a conditional request, see DownloadCache.revalidate
+			if revalidate:
+				message = '{} data - asking the server whether it changed since it was downloaded: \n\n '.format(datatype) + source
+				if self.verbose:
+					print(message)
+				else:
+					self.fm.log(message + '\n')
+			elif self.verbose:
 				print("\033[1mWarning:\033[0;0m {0}".format("FileNotFoundError:")) #print message saying we need to download file
 				print("{} precip file doesn't exist --\033[1mSOLVING: downloading file\033[0;0m".format(datatype))  #dont ask me, it prints out the message lol
-				print("\n {} data - URL: \n\n ".format(datatype)+url.format(**self.arg_dict[datatype])) #print out the url - can click on the link in jupyter notebook to download the file / see where it takes you if theres an error
-				self.callSys("curl -k "+url.format(**self.arg_dict[datatype])+" > {}".format(outpath)) #curl is a command line utility that asks a website for the files it serves - we give it the url of an IRIDL download link
+				print("\n {} data - URL: \n\n ".format(datatype)+source) #print out the url - can click on the link in jupyter notebook to download the file / see where it takes you if theres an error
 			else:
-				f = open('./results.out', 'a')
+				f = open(self.fm.path('results.out'), 'a')
 				f.write("\033[1mWarning:\033[0;0m {0}".format("FileNotFoundError:\n"))
 				f.write("{} precip file doesn't exist --\033[1mSOLVING: downloading file\033[0;0m\n".format(datatype))
-				f.write("\n {} data - URL: \n\n ".format(datatype)+url.format(**self.arg_dict[datatype]))
-				self.callSys("curl -k "+url.format(**self.arg_dict[datatype])+" 2> {} > {}".format(str(outpath)[:-4] + '.out', outpath)) #curl is a command line utility that asks a website for the files it serves - we give it the url of an IRIDL download link
+				f.write("\n {} data - URL: \n\n ".format(datatype)+source)
 				f.close()
-			if arg_dict['obs_source']=='home/.xchourio/.ACToday/.CHL/.prcp':   #weirdly enough, Ingrid sends the file with nfields=0. This is my solution for now. AGM
-				replaceAll("./input/obs_"+arg_dict['predictor']+"_"+arg_dict['tgt']+".tsv","cpt:nfields=0","cpt:nfields=1") #unclear
+			shards, result = IRIDL.shards(source) if validators is None else [[[source]]], None #a conditional request has to be one request
+			if len(shards) * len(shards[0]) * len(shards[0][0]) > 1:
+				try:
+					result = self.sharded(shards, path, check)
+				except (ValueError, IOError) as e:
+					message = '{} data could not be put together from {} smaller queries, asking for all of it at once - {}: {}'.format(datatype, len(shards) * len(shards[0]) * len(shards[0][0]), type(e).__name__, e)
+					if self.verbose:
+						print(message)
+					else:
+						self.fm.log(message + '\n')
+			if result is None:
+				result = Downloader.shared().download(source, path, check=check, validators=validators) #streams the IRIDL's answer over a kept-alive connection, retrying until check passes - raises if it never does
+			if not result['modified']:
+				pass #fetch says so below
+			elif self.verbose:
+				print('{} data downloaded - {:.1f} MB in {:.1f}s'.format(datatype, result['bytes'] / 1e6, result['walltime']))
+			else:
+				self.fm.log('\n{} data downloaded - {} bytes in {:.1f}s\n'.format(datatype, result['bytes'], result['walltime']))
+			return result
+		with IRIDL.shared_lock:
+			refresh = self.fm.force_download == True and url not in self.downloaded #force_download means fresh data once per run, not once per season that asks for it
+			revalidate = self.fm.force_download == 'revalidate' and url not in self.downloaded and os.path.isfile(str(outpath)) #so does asking whether it changed
+			self.downloaded[url] = str(outpath)
+		def cut(src, path, box):
+			self.fm.subset_tsv(src, path, box) #same file the IRIDL would send, from one we have for a bigger box
+			if fix_nfields:
+				self.fix_nfields(path)
+		cache = DownloadCache.shared()
+		if cache is None:
+			result = get(str(outpath), validators=DownloadCache.validators(outpath) if revalidate else None) #no validators still downloads it, and the Ledger sees whether the contents changed
+			if result['modified']:
+				DownloadCache.note(outpath, result)
+			how = 'downloaded' if result['modified'] else 'unchanged'
+		else:
+			how = cache.fetch(url, str(outpath), get, refresh=refresh, cut=cut, splice=self.fm.splice_tsv, revalidate=revalidate)
+		if how != 'downloaded':
+			message = {'cached': '{} data already downloaded - linked from {}'.format(datatype, None if cache is None else cache.entry(url)),
+				'cut': '{} data cut from a download for a bigger domain - no query sent'.format(datatype),
+				'spliced': '{} data added to a download of earlier years - only the new years were queried'.format(datatype),
+				'unchanged': '{} data has not changed on the server - keeping the file we have, and everything made from it'.format(datatype),
+				'changed': '{} data changed on the server - downloaded again, the steps that use it will run again'.format(datatype)}[how]
+			if self.verbose:
+				print(message)
+			else:
+				self.fm.log(message + '\n')
+		self.remember(outpath, url)
 
-		if self.verbose:  #if force_download is false and check returns that it found the files, no need to download
-			print('{} file ready to go'.format(datatype))
-			print('----------------------------------------------')
+	@classmethod
+	def shards(self, url):
+		"""the smaller queries url can be downloaded as - [year block][latitude band][longitude tile], south to north and west to east. [[[url]]] if its box and years are small enough, or its query mixes neighbouring cells after the box"""
+		blocks = [url]
+		template, years = DownloadCache.years(url)
+		if template is not None and IRIDL.shard_years > 0:
+			blocks = [DownloadCache.with_years(url, year, min(year + IRIDL.shard_years - 1, years[1])) for year in range(years[0], years[1] + 1, IRIDL.shard_years)]
+		template, box = DownloadCache.box(url)
+		if template is None or IRIDL.shard_degrees <= 0:
+			return [[[block]] for block in blocks]
+		def cuts(lo, hi):
+			n = int(math.ceil((hi - lo) / IRIDL.shard_degrees - 1e-6)) if hi > lo else 1
+			return [(round(lo + (hi - lo) * i / float(n), 2) if i > 0 else lo, round(lo + (hi - lo) * (i + 1) / float(n), 2) if i < n - 1 else hi) for i in range(n)]
+		return [[[DownloadCache.with_box(block, (sla, nla, wlo, elo)) for wlo, elo in cuts(box[2], box[3])] for sla, nla in cuts(box[0], box[1])] for block in blocks]
+
+	def sharded(self, shards, path, check):
+		"""downloads every query in shards (see shards) at once, each retried on its own until check passes, and puts them together in path - the file the whole query would have sent. raises if any shard still fails"""
+		start = time.time()
+		name = lambda b, i, j: '{}.shard{}-{}-{}'.format(path, b, i, j)
+		pairs = [(shards[b][i][j], name(b, i, j)) for b in range(len(shards)) for i in range(len(shards[b])) for j in range(len(shards[b][i]))]
+		whole = '{}.shards'.format(path)
+		try:
+			results = Downloader.shared().download_many(pairs, check=check)
+			failed = [result for result in results if result['error'] is not None]
+			if len(failed) > 0:
+				raise IOError('{} of {} shards failed - {}'.format(len(failed), len(pairs), failed[0]['error']))
+			for b in range(len(shards)):
+				block = whole if b == 0 else '{}.shard{}'.format(path, b)
+				self.fm.stitch_tsv([[name(b, i, j) for j in range(len(shards[b][i]))] for i in range(len(shards[b]))], block)
+				if b > 0: #later years go after the ones already there
+					self.fm.splice_tsv(whole, block, whole + '.splice')
+					os.replace(whole + '.splice', whole)
+			self.fm.check_tsv(whole)
+			os.replace(whole, str(path))
+		finally:
+			for leftover in [pair[1] for pair in pairs] + ['{}.shard{}'.format(path, b) for b in range(len(shards))] + [whole, whole + '.splice']:
+				if os.path.isfile(leftover):
+					os.remove(leftover)
+		message = '{} queries downloaded at once and put together - the slowest took {:.1f}s'.format(len(pairs), max(result['walltime'] for result in results))
+		if self.verbose:
+			print(message)
 		else:
-			f = open('./results.out', 'a')
-			f.write('Preparing CPT files for '+model+' and initialization '+arg_dict['init']+'...\n')
-			f.close()
+			self.fm.log(message + '\n')
+		return {'url': shards[0][0][0], 'path': str(path), 'status': 200, 'bytes': sum(result['bytes'] for result in results), 'walltime': time.time() - start, 'attempts': max(result['attempts'] for result in results), 'error': None,
+			'modified': True, 'etag': None, 'last_modified': None}
+
+	def remember(self, path, url):
+		"""writes the url a file came from next to it, so current() can tell when the query changes"""
+		f = open(str(path) + '.url', 'w')
+		f.write(url)
+		f.close()
 
+	def gunzip(self, path):
+		"""replaces a gzipped download with the text inside it"""
+		with gzip.open(str(path), 'rb') as src, open(str(path) + '.gunzip', 'wb') as dest:
+			shutil.copyfileobj(src, dest, 1 << 20)
+		os.replace(str(path) + '.gunzip', str(path))
 
-	def prep_files(self, model):
-		"""Function to download (or not) the needed files"""
+	def fix_nfields(self, path):
+		"""Ingrid sends Chilestations files with cpt:nfields=0, CPT wants 1"""
+		f = open(str(path), 'r')
+		text = f.read().replace("cpt:nfields=0", "cpt:nfields=1")
+		f.close()
+		f = open(str(path) + '.fix', 'w')
+		f.write(text)
+		f.close()
+		os.replace(str(path) + '.fix', str(path)) #a new file, never a write through a link into the download cache
+
+	def prep_files(self, model, obs=True):
+		"""Function to download (or not) the needed files - obs=False leaves the observations to prep_obs"""
 		if model not in self.models:
 			if self.verbose:
 				print("unvalidated model - you may get an unexpected error")
 			else:
-				f = open('./results.out', 'a')
+				f = open(self.fm.path('results.out'), 'a')
 				f.write("unvalidated model - you may get an unexpected error\n")
 		if self.verbose:
 			print('Preparing CPT files for '+model+' and initialization '+self.hindcasts_tgt.init+'...')
 		else:
-			f = open('./results.out', 'a')
+			f = open(self.fm.path('results.out'), 'a')
 			f.write("'Preparing CPT files for '+model+' and initialization '+self.hindcasts_tgt.init+'...\n")
 			f.close()
-		self.fetch(model, 'Hindcasts') # download  HIndcasts data
-		self.fetch(model, 'Observations') #download observatiosn data
-		self.fetch(model, 'Forecasts')  #download forecasts data
+		datatypes = ['Hindcasts', 'Forecasts']
+		with ThreadPoolExecutor(max_workers=3) as pool: #hindcasts, forecasts and (if asked for) observations all download at once
+			futures = [pool.submit(self.fetch, model, datatype) for datatype in datatypes] + ([pool.submit(self.prep_obs)] if obs else [])
+			for future in futures:
+				future.result() #raises the first download that failed
+
+	def prep_obs(self):
+		"""fetches and parses the observations once per target season - every model trains against the same file, so the first model to ask does the work and the rest reuse it"""
+		with self.obs_lock:
+			if self.obs_grid is None or self.fm.force_download and self.query(None, 'Observations') not in self.downloaded:
+				self.fetch('observations', 'Observations')
+				grid = self.fm.read_tsv(self.input_file(None, 'Observations')) #raises if the IRIDL sent an error page instead of data
+				if not np.isfinite(grid[2]).any():
+					raise ValueError('{} observations for {} are all missing - check the obs domain and years'.format(self.obs, self.observations_tgt.tgt))
+				self.obs_grid = grid
+			return self.obs_grid
 
 	def __setup(self):
 		"""housekeeping to do"""
@@ -278,8 +603,8 @@ class IRIDL:
 
 		# set up Predictor switches
 		self.rainfall_frequency = False if self.predictor in ['PRCP', 'UQ','VQ'] else True #False uses total rainfall for forecast period, True uses frequency of rainy days
-		self.threshold_pctle = False if self.predictor in ['PRCP', 'UQ','VQ'] else False #False for threshold in mm; Note that if True then if counts DRY days!!!
-		self.wetday_threshold = -999 if self.predictor in ['PRCP', 'UQ','VQ'] else 3 #WET day threshold (mm) --only used if rainfall_frequency is True!
+		self.threshold_pctle = False if self.predictor in ['PRCP', 'UQ','VQ'] or self.threshold_pctle is None else self.threshold_pctle #False for threshold in mm; Note that if True then if counts DRY days!!!
+		self.wetday_threshold = -999 if self.predictor in ['PRCP', 'UQ','VQ'] else 3 if self.wetday_threshold is None else self.wetday_threshold #WET day threshold (mm) --only used if rainfall_frequency is True!
 
 		if self.verbose:
 			if self.rainfall_frequency:
@@ -287,7 +612,7 @@ class IRIDL:
 			else:
 				print('Predictand is Rainfall Total (mm)')
 		else:
-			f = open('./results.out', 'a')
+			f = open(self.fm.path('results.out'), 'a')
 			if self.rainfall_frequency:
 				f.write('Predictand is Rainfall Frequency; wet day threshold = '+str(self.wetday_threshold)+' mm\n')
 			else:
@@ -0,0 +1,78 @@
+import time, traceback
+
+
+class Job:
+	"""Class for holding one step of a PyCPT run (a download, a CPT script, a CPT run, a plot...) so a Scheduler can run it
+	---------------------------------------------------------------------------
+	Variables:
+		name (str)		:	unique name of the job, like 'cpt:NCEP-CFSv2:0'
+		func (callable)	:	function that does the actual work
+		args (tuple)	:	positional args passed to func
+		kwargs (dict)	:	keyword args passed to func
+		deps (list)		:	names of jobs that must finish successfully before this one can start
+		stage (str)		:	what kind of step this is - 'domain', 'fetch', 'script', 'cpt', 'plot', 'nextgen', 'package'
+		serial (bool)	:	if True, the job runs on the scheduler's own thread, one at a time (matplotlib & shared files need this)
+		io (bool)		:	if True, the job spends its time waiting on the network - it runs on the scheduler's io threads, so it doesnt take a worker from cpu bound jobs
+		fail_msg (str)	:	human readable message to report if this job fails
+		outputs (callable):	optional function that takes what func returned and gives back the files the job made, relative to the work directory (for the Ledger)
+		params (dict)	:	everything besides its input files that decides what the job makes (urls, colors...) - None means 'cant tell, always run it'
+		check (callable):	optional function, called with the job right before it would run - if it returns True the job is already up to date and func is skipped
+		key (str)		:	content hash of params + inputs, set by the Ledger's check
+		cached (bool)	:	True if check said the job was up to date, so func never ran
+		result			:	whatever func returned
+		status (str)	:	one of 'pending', 'running', 'done', 'failed', 'skipped'
+		error (Exception):	exception raised by func, if any
+		trace (str)		:	formatted traceback of error, if any
+		start, end (float):	wall clock times the job started and finished
+	---------------------------------------------------------------------------
+	Class Methods:
+		None
+	---------------------------------------------------------------------------
+	Object Methods:
+		__init__(name: str, func: callable, args: tuple, kwargs: dict, deps: list, stage: str, serial: bool, fail_msg: str, outputs: callable, params: dict, io: bool) -> Job
+		__call__() -> None (runs func(*args, **kwargs) unless check says its up to date, and records status, timing and errors)
+		walltime() -> float (seconds the job took, or None if it hasn't run)
+		files() -> list (files the job made, [] if it didn't say or hasn't finished)
+	---------------------------------------------------------------------------"""
+
+	def __init__(self, name, func, args=(), kwargs={}, deps=[], stage=None, serial=False, fail_msg=None, outputs=None, params=None, io=False):
+		self.name = name
+		self.func, self.args, self.kwargs = func, tuple(args), dict(kwargs)
+		self.deps = list(deps) #copy so jobs dont share a list by accident
+		self.stage = stage
+		self.serial, self.io = serial, io
+		self.fail_msg = 'Failed at {}'.format(name) if fail_msg is None else fail_msg
+		self.outputs, self.result = outputs, None
+		self.params, self.check, self.key, self.cached = params, None, None, False
+		self.status = 'pending'
+		self.error, self.trace = None, None
+		self.start, self.end = None, None
+
+	def __call__(self):
+		"""runs the job and records how it went - never raises, the Scheduler checks status instead"""
+		self.status, self.start = 'running', time.time()
+		try:
+			if self.check is not None and self.check(self): #checking here, not in the scheduler, so hashing inputs happens on a worker thread
+				self.cached = True
+			else:
+				self.result = self.func(*self.args, **self.kwargs)
+			self.status = 'done'
+		except Exception as e:
+			self.status, self.error, self.trace = 'failed', e, traceback.format_exc()
+		self.end = time.time()
+
+	def walltime(self):
+		if self.start is None or self.end is None:
+			return None
+		return self.end - self.start
+
+	def files(self):
+		if self.outputs is None or self.status != 'done' or self.cached:
+			return []
+		return [str(path) for path in self.outputs(self.result)]
+
+	def __str__(self):
+		return "Job {} ({}): {}".format(self.name, self.stage, self.status)
+
+	def __repr__(self):
+		return "Job({})".format(self.name)
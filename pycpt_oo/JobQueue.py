@@ -0,0 +1,164 @@
+from __future__ import print_function
+import sys, os
+import json, time
+import socket, sqlite3
+
+
+class JobQueue:
+	"""Class for sharing the Jobs of one PyCPT run between worker processes, on one host or many, through an SQLite file in the work directory
+	Workers claim a job by taking a lease on it - if a worker crashes its lease runs out and another worker re-claims the job
+	---------------------------------------------------------------------------
+	Variables:
+		path (str)		:	path to the queue database - put it on the volume every worker host can see (eg, NFS)
+		lease (float)	:	seconds a claimed job stays owned by its worker without being renewed - None takes the one the queue was published with (300 if it wasnt)
+		retries (int)	:	how many times a job whose worker disappeared gets handed out again before it counts as failed - None takes the one the queue was published with (2 if it wasnt)
+		verbose (bool)	:	whether or not to print stuff
+	---------------------------------------------------------------------------
+	Class Methods (callable without instantiation):
+		worker_name() -> str (hostname:pid, unique for every worker process across hosts)
+	---------------------------------------------------------------------------
+	Object Methods:
+		__init__(path: str, lease: float, retries: int, verbose: bool) -> JobQueue
+		validate_args(path: str, lease: float, retries: int) -> Boolean
+		publish(jobs: list, config: str) -> None (adds Jobs to the queue, and stores lease and retries for the workers - jobs already in it are left alone, so publishing twice is harmless)
+		config() -> str (path of the saved .pycpt file workers should load the run from)
+		claim(worker: str) -> str (name of a job whose dependencies are done, now leased to worker - None if nothing is ready)
+		renew(name: str, worker: str) -> Boolean (extends the lease, False if the job was taken away from worker)
+		complete(name: str, worker: str, error: str, walltime: float) -> None (reports how a claimed job went)
+		finished() -> Boolean (True once every job is done, failed or skipped)
+		status() -> dict (job name -> status)
+		failed() -> list (names of failed jobs)
+	---------------------------------------------------------------------------"""
+
+	def __init__(self, path, lease=None, retries=None, verbose=True):
+		self.verbose = verbose
+		if not self.validate_args(path, lease, retries):
+			raise ValueError('Invalid JobQueue parameters')
+		self.path = str(path)
+		with self._connect() as db:
+			db.execute('CREATE TABLE IF NOT EXISTS jobs (name TEXT PRIMARY KEY, seq INTEGER, deps TEXT, stage TEXT, status TEXT, worker TEXT, lease_until REAL, attempts INTEGER, error TEXT, walltime REAL)')
+			db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+			meta = dict(db.execute('SELECT key, value FROM meta').fetchall())
+		self.lease = (float(meta['lease']) if 'lease' in meta else 300) if lease is None else lease #workers go by what the publisher asked for
+		self.retries = (int(meta['retries']) if 'retries' in meta else 2) if retries is None else retries
+
+	def validate_args(self, path, lease, retries):
+		retval = True
+		if not os.path.isdir(os.path.dirname(os.path.abspath(str(path)))):
+			print('JobQueue directory {} does not exist'.format(os.path.dirname(os.path.abspath(str(path)))))
+			retval = retval and False
+		if lease is not None and (type(lease) not in [int, float] or lease <= 0):
+			print('lease must be a number of seconds > 0')
+			retval = retval and False
+		if retries is not None and (type(retries) != int or retries < 0):
+			print('retries must be an int >= 0')
+			retval = retval and False
+		return retval
+
+	@classmethod
+	def worker_name(self):
+		return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+	def _connect(self):
+		"""one connection per call - sqlite connections shouldnt be shared between threads, and short ones keep the file lock short on NFS"""
+		db = sqlite3.connect(self.path, timeout=60, isolation_level=None) #we BEGIN ourselves
+		db.execute('PRAGMA journal_mode=DELETE') #WAL needs shared memory, which doesnt work across hosts
+		return _Transaction(db)
+
+	def publish(self, jobs, config=None):
+		with self._connect() as db:
+			seq = db.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+			for i, job in enumerate(jobs):
+				db.execute('INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, ?, NULL, NULL, 0, NULL, NULL)', (job.name, seq + i, json.dumps(job.deps), job.stage, 'pending'))
+			if config is not None:
+				db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('config', str(config)))
+			db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('lease', str(self.lease)))
+			db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('retries', str(self.retries)))
+		if self.verbose:
+			print('Published {} jobs to {}'.format(len(jobs), self.path))
+
+	def config(self):
+		with self._connect() as db:
+			row = db.execute('SELECT value FROM meta WHERE key=?', ('config',)).fetchone()
+		return None if row is None else row[0]
+
+	def _expire(self, db, now):
+		"""hands jobs whose worker stopped renewing back out, or fails them if theyve been re-claimed too often"""
+		for name, attempts, worker in db.execute('SELECT name, attempts, worker FROM jobs WHERE status=? AND lease_until < ?', ('running', now)).fetchall():
+			if attempts > self.retries:
+				db.execute('UPDATE jobs SET status=?, error=? WHERE name=?', ('failed', 'lease expired {} times, last held by {}'.format(attempts, worker), name))
+			else:
+				db.execute('UPDATE jobs SET status=?, worker=NULL, lease_until=NULL WHERE name=?', ('pending', name))
+				if self.verbose:
+					print('Lease on {} held by {} expired - re-queueing'.format(name, worker))
+
+	def _skip_blocked(self, db):
+		"""same as Scheduler._skip_blocked, but on the table"""
+		changed = True
+		while changed:
+			changed = False
+			status = dict(db.execute('SELECT name, status FROM jobs').fetchall())
+			for name, deps in db.execute('SELECT name, deps FROM jobs WHERE status=?', ('pending',)).fetchall():
+				if any(status.get(dep) in ['failed', 'skipped'] for dep in json.loads(deps)):
+					db.execute('UPDATE jobs SET status=? WHERE name=?', ('skipped', name))
+					changed = True
+
+	def claim(self, worker):
+		now = time.time()
+		with self._connect() as db:
+			self._expire(db, now)
+			self._skip_blocked(db)
+			status = dict(db.execute('SELECT name, status FROM jobs').fetchall())
+			for name, deps in db.execute('SELECT name, deps FROM jobs WHERE status=? ORDER BY seq', ('pending',)).fetchall():
+				if all(status.get(dep) == 'done' for dep in json.loads(deps)):
+					db.execute('UPDATE jobs SET status=?, worker=?, lease_until=?, attempts=attempts+1 WHERE name=?', ('running', worker, now + self.lease, name))
+					return name
+		return None
+
+	def renew(self, name, worker):
+		with self._connect() as db:
+			cur = db.execute('UPDATE jobs SET lease_until=? WHERE name=? AND worker=? AND status=?', (time.time() + self.lease, name, worker, 'running'))
+			return cur.rowcount == 1
+
+	def complete(self, name, worker, error=None, walltime=None):
+		with self._connect() as db: #only the worker holding the lease may report - a re-claimed job belongs to someone else now
+			db.execute('UPDATE jobs SET status=?, error=?, walltime=?, lease_until=NULL WHERE name=? AND worker=? AND status=?', ('done' if error is None else 'failed', error, walltime, name, worker, 'running'))
+
+	def finished(self):
+		with self._connect() as db:
+			self._expire(db, time.time())
+			self._skip_blocked(db)
+			return db.execute('SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)', ('pending', 'running')).fetchone()[0] == 0
+
+	def status(self):
+		with self._connect() as db:
+			return dict(db.execute('SELECT name, status FROM jobs ORDER BY seq').fetchall())
+
+	def failed(self):
+		with self._connect() as db:
+			return [row[0] for row in db.execute('SELECT name FROM jobs WHERE status=? ORDER BY seq', ('failed',)).fetchall()]
+
+	def __str__(self):
+		status = self.status()
+		counts = {}
+		for name in status:
+			counts[status[name]] = counts.get(status[name], 0) + 1
+		return "JobQueue {}: ".format(self.path) + ", ".join('{} {}'.format(counts[key], key) for key in sorted(counts.keys()))
+
+
+class _Transaction:
+	"""holds sqlite's write lock for the whole with block, so a claim is read-check-update with nobody else in between"""
+
+	def __init__(self, db):
+		self.db = db
+
+	def __enter__(self):
+		self.db.execute('BEGIN IMMEDIATE')
+		return self.db
+
+	def __exit__(self, exc_type, exc, tb):
+		try:
+			self.db.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+		finally:
+			self.db.close()
+		return False
@@ -0,0 +1,120 @@
+from __future__ import print_function
+import sys, os
+import json, time
+import hashlib, threading
+
+
+class Ledger:
+	"""Class for keeping a record of every finished Job of a run in a JSON-lines file in the work directory, so a failed run can pick up where it stopped
+	One line per finished job - appending is cheap, and a crash can only ever lose the line being written
+	Each entry carries a key - a hash of the job's params, the keys of the jobs it depends on and the contents of the files they made - so, like make,
+	a job only runs again when something it depends on actually changed
+	---------------------------------------------------------------------------
+	Variables:
+		path (str)		:	path to the ledger file (workdir/work/ledger.jsonl)
+		root (str)		:	work directory the recorded input / output paths are relative to
+		entries (dict)	:	job name -> latest entry for that job
+		digests (dict)	:	class-level cache of file hashes, (path, size, mtime) -> sha256, so unchanged inputs are only read once per process
+		verbose (bool)	:	whether or not to print stuff
+	---------------------------------------------------------------------------
+	Class Methods (callable without instantiation):
+		None
+	---------------------------------------------------------------------------
+	Object Methods:
+		__init__(path: str, root: str, verbose: bool) -> Ledger (loads the entries already in the file, if there is one)
+		start() -> None (empties the ledger - a fresh run doesn't trust anything an older one did)
+		record(job: Job) -> dict (appends an entry for a finished job - its status, timing, error, key, and the files it read and made)
+		key(job: Job) -> str (content hash of the job's params and everything it depends on)
+		fresh(job: Job) -> Boolean (True if the job finished last time with the same key and its outputs are still there - never for a job that declares outputs but made none. used as Job.check)
+		revalidate(job: Job) -> Boolean (always False, so the job runs - but keyed like fresh, so the jobs after it are skipped if what it makes comes out the same. used as Job.check for downloads with force_download='revalidate')
+		digest(path: str) -> str (sha256 of a file in the work directory)
+	---------------------------------------------------------------------------"""
+
+	digests = {}
+	digests_lock = threading.Lock()
+
+	def __init__(self, path, root, verbose=True):
+		self.verbose = verbose
+		self.path, self.root = str(path), str(root)
+		self.lock = threading.Lock()
+		self.entries = {}
+		if os.path.isfile(self.path):
+			f = open(self.path, 'r')
+			for line in f:
+				try:
+					entry = json.loads(line)
+				except ValueError:
+					continue #half a line from a crash
+				self.entries[entry['name']] = entry
+			f.close()
+
+	def start(self):
+		with self.lock:
+			open(self.path, 'w').close()
+			self.entries = {}
+
+	def record(self, job):
+		with self.lock:
+			inputs = []
+			for dep in job.deps: #a job reads what the jobs it depends on made
+				if dep in self.entries:
+					inputs.extend(path for path in self.entries[dep]['outputs'] if path not in inputs)
+			outputs = self.entries[job.name]['outputs'] if job.cached else job.files() #an up to date job still has the files it made last time
+			entry = {'name': job.name, 'stage': job.stage, 'status': job.status, 'start': job.start, 'end': job.end, 'walltime': job.walltime(), 'error': None if job.error is None else '{}: {}'.format(type(job.error).__name__, job.error), 'deps': job.deps, 'inputs': inputs, 'outputs': outputs, 'key': job.key, 'cached': job.cached}
+			f = open(self.path, 'a')
+			f.write(json.dumps(entry) + '\n')
+			f.flush()
+			os.fsync(f.fileno()) #the whole point is surviving a crash
+			f.close()
+			self.entries[job.name] = entry
+		return entry
+
+	def digest(self, path):
+		path = os.path.join(self.root, path)
+		if not os.path.isfile(path):
+			return None
+		stat = os.stat(path)
+		cache = (path, stat.st_size, stat.st_mtime_ns)
+		with Ledger.digests_lock:
+			if cache in Ledger.digests:
+				return Ledger.digests[cache]
+		h = hashlib.sha256()
+		f = open(path, 'rb')
+		for chunk in iter(lambda: f.read(1 << 20), b''):
+			h.update(chunk)
+		f.close()
+		with Ledger.digests_lock:
+			Ledger.digests[cache] = h.hexdigest()
+		return Ledger.digests[cache]
+
+	def key(self, job):
+		"""hash of what the job would do - its params, plus the key and output contents of each job it depends on, so a change anywhere upstream reaches it"""
+		h = hashlib.sha256()
+		h.update(json.dumps({'name': job.name, 'params': job.params}, sort_keys=True, default=str).encode('utf-8'))
+		for dep in sorted(job.deps):
+			entry = self.entries.get(dep, {})
+			h.update('{}={}'.format(dep, entry.get('key')).encode('utf-8'))
+			for path in entry.get('outputs', []):
+				h.update('{}:{}'.format(path, self.digest(path)).encode('utf-8'))
+		return h.hexdigest()
+
+	def fresh(self, job):
+		job.key = self.key(job)
+		if job.params is None: #job cant tell us what decides its output, so it always runs
+			return False
+		entry = self.entries.get(job.name)
+		if entry is None or entry['status'] != 'done' or entry.get('key') != job.key:
+			return False
+		if job.outputs is not None and len(entry['outputs']) == 0:
+			return False #it should have made something - a run that made nothing didnt really finish
+		return all(os.path.exists(os.path.join(self.root, path)) for path in entry['outputs'])
+
+	def revalidate(self, job):
+		job.key = self.key(job)
+		return False
+
+	def __str__(self):
+		counts = {}
+		for name in self.entries:
+			counts[self.entries[name]['status']] = counts.get(self.entries[name]['status'], 0) + 1
+		return "Ledger {}: ".format(self.path) + ", ".join('{} {}'.format(counts[key], key) for key in sorted(counts.keys()))
@@ -3,7 +3,9 @@ import sys, os
 import json
 from pathlib import Path
 import platform, copy, warnings
-import subprocess
+import subprocess, threading, time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import struct, copy, json
 import numpy as np
 import datetime as d
@@ -22,17 +24,24 @@ from cartopy.feature import ShapelyFeature
 import fileinput
 import matplotlib as mpl
 from IPython import get_ipython
+from IPython.display import display, Image
 from mpl_toolkits.axes_grid1.inset_locator import inset_axes
 warnings.filterwarnings("ignore")
 
 from .ArgSet import ArgSet
 from .CPT import CPT
+from .CPTPool import CPTPool
 from .Domain import Domain
 from .FileManager import FileManager
 from .IRIDL import IRIDL
+from .Job import Job
+from .JobQueue import JobQueue
+from .Ledger import Ledger
 from .MetaTensor import MetaTensor
 from .MidpointNormalize import MidpointNormalize
 from .Modes import Modes
+from .Planner import Planner
+from .Scheduler import Scheduler
 from .TargetSeason import TargetSeason
 from .Visualizer import Visualizer
 
@@ -69,22 +78,39 @@ class PYCPT:
 		tend (int)		: 	last year of training data 																																																																- validated by domain constructor
 		monf (list)		:	list of initialization months for forecasts 																																																											- validated by TargetSeason constructor
 		fyr (int)		:	year of forecast																																																																		- validated by TargetSeason constructor
-		force_download (Boolean) : 	True or False - force redownload of data even if it exists locally 																																																				- validated by FileManager constructor
+		force_download (Boolean) : 	True or False - force redownload of data even if it exists locally (wipes the work folder), or 'revalidate' - ask the server whether each input changed, download only those, and rerun only what depends on them 																																																				- validated by FileManager constructor
 		nla1, sla1 (ints) :	northermost & southernmost latitudes of predictor (GCM data) spatial domain 																																																			- validated by Modes constructor
 		elo1, wlo1 (ints) :	easternmost & westernnmost longitudes of predictor (GCM data) spatial domain 																																																			- validated by Modes constructor
 		nla2, sla2 (ints) :	northermost & southernmost latitudes of predictand (observations) spatial domain																																																		- validated by Modes constructor
 		elo2, wlo2 (ints) :	easternmost & westernnmost longitudes of predictand (observations) spatial domain 																																																		- validated by Modes constructor
+		local_rfreq (bool) :	count RFREQ observations from daily data downloaded once per obs source and domain, instead of asking the IRIDL for each season - only with threshold_pctle=True, since without it the IRIDL's RFREQ observations are CRU TS wet days, not counted from daily data. see IRIDL.wet_days
+		wetday_threshold (float) : wet day threshold in mm (or a percentile, with threshold_pctle) for RFREQ - None keeps the default of 3mm
+		threshold_pctle (bool) : read wetday_threshold as a percentile of each cell's days, and count days at or below it
+		local_seasons (bool) :	download each model's monthly leads once per initialization month and average every target season from them here, instead of asking the IRIDL for each season - see IRIDL.aggregate
 	------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 	Class Methods (Callable without instantiation):
 		from_file(filename: str) -> PYCPT (loads a previously saved set of PYCPT run parameters)
+		from_dict(params: dict) -> PYCPT (same as from_file, for parameters that are already loaded)
+		worker(queue_path: str, poll: float, lease: float) -> list (loads the run a queue was published from and calls run_worker on it)
 		test(test: str) -> runs the pycpt script for every saved parameter set in this tests folder
 	---------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
 	Object Methods:
 		__init__(all args) -> PYCPT  (Constructor)
 		save() -> None (Saves current run parameters to file)
-		execute() -> runs entire script of jupyter notebook without plotting or printing anything
+		execute(workers: int, cpt_workers: int, affinity: bool, on_done: callable, stream: bool, on_map: callable, incremental: bool) -> runs entire script of jupyter notebook without plotting or printing anything, running up to 'workers' independent steps at once and up to 'cpt_workers' CPTs (default: one per physical core). on_done is called with each Job as it finishes. every finished step is recorded in workdir/work/ledger.jsonl with a hash of its params and inputs, and (if incremental) steps whose hash hasn't changed since they last succeeded are skipped
+		plan(workers: int, cpt_workers: int, stream: bool, history: str) -> dict (dry run - every job's IRIDL urls, estimated bytes and seconds, the critical path and expected finish time, without downloading or running anything. see Planner)
+		resume(same as execute) -> list (incremental execute that never wipes the work folder - for carrying on after a failure)
+		run_jobs(jobs: list, ledger: Ledger, workers: int, cpt_workers: int, affinity: bool, on_done: callable) -> list (schedules Jobs, records each in the ledger, returns the failed ones)
+		build_jobs(stream: bool, on_map: callable) -> list (the whole run as a list of Jobs with dependencies - fetch (plus one observations fetch per season) -> CPT script -> CPT run -> plots / NextGen. stream adds a preview job after each CPT run)
+		submit(workers, cpt_workers, affinity, on_done, stream, on_map) -> Future (runs execute in a background thread, streaming each model's maps as its CPT run finishes)
+		execute_async(same as submit) -> asyncio Future (awaitable version of submit, for notebooks)
+		background(func: callable, *args, **kwargs) -> Future (runs any single step, like prepFiles or run, without blocking the notebook)
+		preview(model: str, tgt: int, on_map: callable) -> None (plots every metric for one model / target season and passes each saved image to on_map - default shows it in the notebook)
+		publish(lease: float, retries: int) -> JobQueue (saves the run to workdir/work/run.pycpt and puts its Jobs in the shared queue at workdir/work/queue.db)
+		run_worker(poll: float, lease: float) -> list (worker loop - claims jobs from the queue, runs them, and reports back until the whole run is finished. returns names of failed jobs)
 		pltdomain() -> Plots Predictor / Predictand Domains (calls Visualizer.pltdomain )
-		prepFiles(tgt_index: int, model: str) -> Downloads data for a given model and seasn ( calls IRIDLs[tgt_index].prep_files(model) )
+		prepFiles(tgt_index: int, model: str, obs: bool) -> Downloads data for a given model and seasn ( calls IRIDLs[tgt_index].prep_files(model, obs) )
+		prepObs(tgt_index: int) -> tuple (Downloads and parses the observations for a season once, however many models use them - lats, lons, data[T, Y, X], times ( calls IRIDLs[tgt_index].prep_obs() ))
 		CPTscript(tgt_index: int, model: str) -> Writes a CPT script for a given model and season (calls cpt.write_cpt_script(IRIDLs[tgt_index], model)  )
 		run(tgt_ndx: int, model: str) -> Runs CPT for a given model and season ( calls cpt.run(IRIDLs[tgt_index], model) )
 		pltmap(metric: str) -> Plots a metric for all models and seasons  (calls vis.pltmap(metric, models, obs_argsets, MOS))
@@ -93,7 +119,7 @@ class PYCPT:
 		plt_deterministic() -> plots deterministic forecast map based on nextgen  (calls vis.plt_deterministic('NextGen', obs_argsets, 'None'))
 		plt_probabilistic() -> plots probabilistic forecast map based on nextgen (calls vis.plt_probabilistic('NextGen', obs_argsets, 'None'))
 	------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------"""
-	def __init__(self, work, workdir, cptdir, use_topo, shp_file, use_default, map_color, models, tgts, met, obs, station, MOS, xmodes_min, xmodes_max, ymodes_min, ymodes_max, ccamodes_min, ccamodes_max, eofmodes, predictand, predictor, mons, tgti, tgtf, tini, tend,monf, fyr, force_download, nla1, sla1, elo1, wlo1, nla2, sla2, elo2, wlo2, verbose=True):
+	def __init__(self, work, workdir, cptdir, use_topo, shp_file, use_default, map_color, models, tgts, met, obs, station, MOS, xmodes_min, xmodes_max, ymodes_min, ymodes_max, ccamodes_min, ccamodes_max, eofmodes, predictand, predictor, mons, tgti, tgtf, tini, tend,monf, fyr, force_download, nla1, sla1, elo1, wlo1, nla2, sla2, elo2, wlo2, verbose=True, local_seasons=False, local_rfreq=False, wetday_threshold=None, threshold_pctle=None):
 		self.work, self.workdir, self.cptdir = work, workdir, cptdir
 		self.use_topo, self.shp_file, self.use_default, self.map_color = use_topo, shp_file, use_default, map_color
 		self.models, self.tgts, self.met, self.obs, self.station, self.MOS = models, tgts, met, obs, station, MOS
@@ -102,9 +128,11 @@ class PYCPT:
 		self.tini, self.tend, self.monf, self.fyr, self.force_download = tini, tend,monf, fyr, force_download
 		self.nla1, self.sla1, self.elo1, self.wlo1 = nla1, sla1, elo1, wlo1
 		self.nla2, self.sla2, self.elo2, self.wlo2 = nla2, sla2, elo2, wlo2
-		self.verbose = verbose
+		self.verbose, self.local_seasons = verbose, local_seasons
+		self.local_rfreq, self.wetday_threshold, self.threshold_pctle = local_rfreq, wetday_threshold, threshold_pctle
 		self.initialized = 0
 		self.params = copy.deepcopy(vars(self)) #allow us to save run params without the classes
+		self.executor = None #thread pool for submit / background, made the first time its needed
 		self.setup(verbose)
 
 	@classmethod
@@ -122,10 +150,8 @@ class PYCPT:
 			if os.path.isfile(os.path.join(test_dir, testfile)):
 				tests.append(os.path.join(test_dir, testfile))
 				names.append(testfile.split('.')[0])
-		os.chdir(test_dir) #testdir should be a relative path from current directory not absolute
 		for name in names:
-			os.system('mkdir {}'.format(name))
-		os.chdir('..')
+			os.makedirs(os.path.join(test_dir, name), exist_ok=True) #testdir should be a relative path from current directory not absolute
 		for test in range(len(tests)):
 			print('{} Running test for {}.pycpt - '.format(d.datetime.now(),names[test]), end='')
 			sys.stdout.flush()
@@ -134,51 +160,194 @@ class PYCPT:
 				 print(' - success for {}'.format(names[test]))
 			else:
 				 print(' - ' + result + ' for {}'.format(names[test]))
-			print(os.getcwd())
-			os.chdir('..') #go back to start dir so we can find test_dir/nexttest
 
 	def reset(self):
 		self.initialized = 0
-		os.chdir(self.workdir)
+		if self.executor is not None:
+			self.executor.shutdown(wait=False) #steps already handed to background() still finish, then its threads exit
+			self.executor = None #background() makes a new one if its used again
 
 	def initialize(self):
 		#create filemanager object
 		self.filemanager = FileManager(self.workdir, self.work, self.force_download, verbose=self.verbose)
 
-		#create IRIDL objects for each tgt
-		self.IRIDLs = [IRIDL(self.filemanager, self.obs_argsets[i], self.hindcast_argsets[i], self.forecasts_argsets[i], self.models, verbose=self.verbose) for i in range(len(self.tgts))]
+		#create IRIDL objects for each tgt - with local_seasons, tgts with the same init share one download of every lead they need
+		def leads(seasons, i):
+			same = [season for season in seasons if season.init == seasons[i].init]
+			return (min(float(season.tgti) for season in same), max(float(season.tgtf) for season in same))
+		shared = [{'Hindcasts': leads(self.hind_obs_seasons, i), 'Forecasts': leads(self.forecast_seasons, i)} if self.local_seasons else None for i in range(len(self.tgts))]
+		downloaded = {} #queries this run has fetched - new each run, so force_download / 'revalidate' reach the server every time, not just the first run in a process
+		self.IRIDLs = [IRIDL(self.filemanager, self.obs_argsets[i], self.hindcast_argsets[i], self.forecasts_argsets[i], self.models, verbose=self.verbose, leads=shared[i], local_rfreq=self.local_rfreq, wetday_threshold=self.wetday_threshold, threshold_pctle=self.threshold_pctle, downloaded=downloaded) for i in range(len(self.tgts))]
 
 		#store CPT arguments in Modes Object
 		self.modes = Modes(self.xmodes_max, self.xmodes_min, self.ymodes_max, self.ymodes_min, self.ccamodes_max, self.ccamodes_min, self.eofmodes)
 
 		#create CPT object
 		self.cpt = CPT(self.cptdir, self.modes, self.MOS, self.met, verbose=self.verbose)
+		self.ngcpt = copy.copy(self.cpt) #separate CPT object for NextGen so its MOS='None' never leaks into a model's script when jobs run out of order
+		self.ngcpt.set_model_output_statistic('None')
 		self.vis = Visualizer(self.filemanager, shp_file=self.shp_file, map_color=self.map_color, use_topo=self.use_topo, verbose=self.verbose)
 		self.initialized = 1
 
-	def execute(self):
+	def execute(self, workers=1, cpt_workers=None, affinity=False, on_done=None, stream=False, on_map=None, incremental=True):
 		if self.initialized == 0:
 			self.initialize()
-		self.pltdomain() #examine domains
+		ledger = Ledger(self.filemanager.path('ledger.jsonl'), self.filemanager.path(), verbose=self.verbose)
+		if not incremental:
+			ledger.start() #forget what earlier runs did, so everything runs
+		return self.run_jobs(self.build_jobs(stream=stream, on_map=on_map), ledger, workers, cpt_workers, affinity, on_done)
+
+	def resume(self, workers=1, cpt_workers=None, affinity=False, on_done=None, stream=False, on_map=None):
+		"""picks a failed or interrupted run back up - same as an incremental execute, but never wipes the work folder, even with force_download"""
+		if self.initialized == 0:
+			force, self.force_download = self.force_download, False #never wipe the work folder we're resuming in
+			self.initialize()
+			self.force_download, self.filemanager.force_download = force, force
+		return self.execute(workers, cpt_workers, affinity, on_done, stream, on_map)
+
+	def plan(self, workers=1, cpt_workers=None, stream=False, history=None):
+		"""expands the run into its jobs and estimates what each will cost, without doing any of them - see Planner"""
+		if self.initialized == 0:
+			force, self.force_download = self.force_download, False #planning must not wipe the work folder
+			self.initialize()
+			self.force_download, self.filemanager.force_download = force, force
+		planner = Planner(self, history=history, verbose=self.verbose)
+		plan = planner.plan(self.build_jobs(stream=stream), workers, cpt_workers)
+		self.reset()
+		if self.verbose:
+			print(planner.report(plan))
+		return plan
+
+	def run_jobs(self, jobs, ledger, workers=1, cpt_workers=None, affinity=False, on_done=None):
+		"""runs a list of Jobs, recording each one in the ledger as it finishes - a job whose key matches the ledger's last successful run is skipped"""
+		if cpt_workers is not None or affinity is not False:
+			self.cpt.pool = CPTPool(cpt_workers, affinity, verbose=self.verbose)
+			self.ngcpt.pool = self.cpt.pool #nextgen runs share the same cores
+		for job in jobs:
+			job.check = ledger.revalidate if self.force_download == 'revalidate' and job.stage == 'fetch' else ledger.fresh #downloads ask the server, everything after them still only runs if their files changed
+		timings = Planner(self, verbose=self.verbose)
+		def finished(job):
+			ledger.record(job)
+			try:
+				timings.record(job) #what the next plan() learns its rates from
+			except Exception as e:
+				if self.verbose:
+					print('Could not record timing for {}: {}'.format(job.name, e))
+			if on_done is not None:
+				on_done(job)
+		scheduler = Scheduler(jobs, workers=workers, on_done=finished, verbose=self.verbose)
+		failed = scheduler.run()
+		self.reset()
+		if self.verbose:
+			print('{} of {} steps were already up to date'.format(len([job for job in jobs if job.cached]), len(jobs)))
+		if len(failed) > 0:
+			print('{} step(s) failed, {} skipped: {} - fix the problem and call resume() to carry on from there'.format(len(failed), len(scheduler.skipped()), ', '.join(job.fail_msg for job in failed)))
+		return failed
+
+	def submit(self, workers=1, cpt_workers=None, affinity=False, on_done=None, stream=True, on_map=None):
+		"""runs execute in the background so the notebook stays usable - returns a concurrent.futures.Future holding the list of failed jobs"""
+		return self.background(self.execute, workers=workers, cpt_workers=cpt_workers, affinity=affinity, on_done=on_done, stream=stream, on_map=on_map)
+
+	def execute_async(self, workers=1, cpt_workers=None, affinity=False, on_done=None, stream=True, on_map=None):
+		"""same as submit, but awaitable - 'failed = await py.execute_async()' or asyncio.ensure_future(py.execute_async()) in jupyter"""
+		return asyncio.wrap_future(self.submit(workers=workers, cpt_workers=cpt_workers, affinity=affinity, on_done=on_done, stream=stream, on_map=on_map))
+
+	def background(self, func, *args, **kwargs):
+		"""runs any step (prepFiles, run, pltmap...) in a background thread and returns a concurrent.futures.Future for its result"""
+		if self.executor is None:
+			self.executor = ThreadPoolExecutor(max_workers=4)
+		return self.executor.submit(func, *args, **kwargs)
+
+	def build_jobs(self, stream=False, on_map=None):
+		"""turns one run into a graph of Jobs - each job lists the jobs it needs, so the scheduler can run independent ones at the same time"""
+		if self.initialized == 0:
+			self.initialize()
+		look = {'map_color': self.map_color, 'shp_file': self.shp_file, 'use_topo': self.use_topo, 'use_default': self.use_default} #what decides how a map looks, but not whats on it
+		domains = [self.nla1, self.sla1, self.elo1, self.wlo1, self.nla2, self.sla2, self.elo2, self.wlo2]
+		jobs = [Job('pltdomain', self.pltdomain, stage='domain', serial=True, fail_msg='Failed to plot domain', outputs=lambda r: ['images/domain.png'], params=dict(look, domains=domains))] #examine domains
+		cpt_runs = {tgt: [] for tgt in range(len(self.tgts))} #names of the CPT runs each target season's NextGen ensemble needs
+		for tgt in range(len(self.tgts)):
+			jobs.append(Job('obs:{}'.format(tgt), self.prepObs, (tgt,), stage='fetch', fail_msg='Failed to download observations for target {}'.format(tgt+1), outputs=lambda r, i=self.IRIDLs[tgt]: [i.input_file(None, 'Observations')], params=dict({'query': self.IRIDLs[tgt].query(None, 'Observations')}, **({'wet_days': [self.IRIDLs[tgt].wetday_threshold, self.IRIDLs[tgt].threshold_pctle, self.IRIDLs[tgt].daily_query()]} if self.local_rfreq and self.IRIDLs[tgt].daily_query() is not None else {})), io=True)) #every model of a target season trains on the same observations, so they're fetched and checked once
 		for model in self.models:
 			for tgt in range(len(self.tgts)):
-				self.prepFiles(model, tgt) #download data if forced or needed
-				self.CPTscript(model, tgt) #write CPT scripts for models
-				self.run(model, tgt) #run cpt for models
+				key = '{}:{}'.format(model, tgt)
+				jobs.append(Job('fetch:'+key, self.prepFiles, (model, tgt), {'obs': False}, stage='fetch', fail_msg='Failed to download files for {} target {}'.format(model, tgt+1), outputs=lambda r, i=self.IRIDLs[tgt], m=model: [i.input_file(m, 'Hindcasts'), i.input_file(m, 'Forecasts')], params=dict({'queries': [self.IRIDLs[tgt].query(model, 'Hindcasts'), self.IRIDLs[tgt].query(model, 'Forecasts')]}, **({'local_seasons': True} if self.local_seasons else {})), io=True)) #download data if forced or needed - every model and season's downloads start right away, they dont need a worker
+				jobs.append(Job('script:'+key, self.cpt.write_cpt_script, (self.IRIDLs[tgt], model), deps=['fetch:'+key, 'obs:{}'.format(tgt)], stage='script', fail_msg='Failed to write CPT script for {} target {}'.format(model, tgt+1), outputs=lambda r, p=os.path.normpath(self.cpt.job_dir(self.IRIDLs[tgt], model)+'/params'): [p])) #each script goes to its own job directory, so these can run side by side - always rewritten, its cheap and the text it writes is what CPT's key hashes
+				jobs.append(Job('cpt:'+key, self.cpt.run, (self.IRIDLs[tgt], model), deps=['script:'+key], stage='cpt', fail_msg='CPT failed for {} target {}'.format(model, tgt+1), outputs=lambda r: r['outputs'], params={'cptdir': self.cptdir})) #run cpt for models
+				cpt_runs[tgt].append('cpt:'+key)
+				if stream:
+					jobs.append(Job('preview:'+key, self.preview, (model, tgt), {'on_map': on_map}, deps=['cpt:'+key], stage='plot', serial=True, fail_msg='failed to preview {} target {}'.format(model, tgt+1))) #show this model's skill right away
+		model_runs = [name for tgt in cpt_runs for name in cpt_runs[tgt]]
 		for metric in self.met:
-			self.pltmap(metric, self.models) #plot forecast metrics produced by CPT
+			jobs.append(Job('pltmap:'+metric, self.pltmap, (metric, self.models), deps=model_runs, stage='plot', serial=True, fail_msg='failed to plot {} metric'.format(metric), outputs=self.relative, params=dict(look, metric=metric))) #plot forecast metrics produced by CPT
 		for mode in range(self.eofmodes):
-			self.plteofs(mode) #plot eofs calculated by CPT
+			jobs.append(Job('plteofs:{}'.format(mode), self.plteofs, (mode,), deps=model_runs, stage='plot', serial=True, fail_msg='failed to plot {} EOF'.format(mode+1), outputs=lambda r, m=mode: ['images/EOF{}_Models.png'.format(m+1)], params=dict(look, mode=mode))) #plot eofs calculated by CPT
+		ng_runs = []
 		for tgt in range(len(self.tgts)):
-			self.NGensemble(self.models, tgt) #calculate NEXTGEN multi-model ensemble mean
-			self.CPTscript('NextGen', tgt) #write CPT script for nextgen
-			self.run('NextGen', tgt) #run CPT on nextgen ensemble cross-validated Prediction files
+			key = 'NextGen:{}'.format(tgt)
+			jobs.append(Job('ngensemble:{}'.format(tgt), self.NGensemble, (self.models, tgt), deps=cpt_runs[tgt], stage='nextgen', fail_msg='Failed to calculate nextgen ensemble mean', outputs=lambda r: [r], params={'models': self.models, 'MOS': self.MOS})) #calculate NEXTGEN multi-model ensemble mean
+			jobs.append(Job('script:'+key, self.ngcpt.write_cpt_script, (self.IRIDLs[tgt], 'NextGen'), deps=['ngensemble:{}'.format(tgt)], stage='script', fail_msg='Failed to write CPT script for NextGen target {}'.format(tgt+1), outputs=lambda r, p=os.path.normpath(self.ngcpt.job_dir(self.IRIDLs[tgt], 'NextGen')+'/params'): [p])) #write CPT script for nextgen
+			jobs.append(Job('cpt:'+key, self.ngcpt.run, (self.IRIDLs[tgt], 'NextGen'), deps=['script:'+key], stage='cpt', fail_msg='CPT failed for NextGen target {}'.format(tgt+1), outputs=lambda r: r['outputs'], params={'cptdir': self.cptdir})) #run CPT on nextgen ensemble cross-validated Prediction files
+			ng_runs.append('cpt:'+key)
 		for metric in self.met:
-			self.pltmap(metric, ['NextGen'], MOS="None") #plot nextgen metrics
-		self.plt_deterministic()  #make deterministic forecast with nextgen
-		self.plt_probabilistic() #make probabilistic forecast with nextgen
-		self.ensemblefiles() #packages files in ./output/nextgen/ asdlkfj.tar.gz for sending to IRI
+			jobs.append(Job('pltmap:NextGen:'+metric, self.pltmap, (metric, ['NextGen']), {'MOS': 'None'}, deps=ng_runs, stage='plot', serial=True, fail_msg='failed to plot {} metric for nextgen'.format(metric), outputs=self.relative, params=dict(look, metric=metric))) #plot nextgen metrics
+		jobs.append(Job('plt_deterministic', self.plt_deterministic, deps=ng_runs, stage='plot', serial=True, fail_msg='deterministic forecast plot failed ', outputs=lambda r: ['images/NextGen_DeterministicForecast_RT.png'], params=look)) #make deterministic forecast with nextgen
+		jobs.append(Job('plt_probabilistic', self.plt_probabilistic, deps=ng_runs, stage='plot', serial=True, fail_msg='probabilistic forecast plot failed', outputs=lambda r: ['images/NextGen_ProbabilisticForecast_RT.png'], params=look)) #make probabilistic forecast with nextgen
+		jobs.append(Job('ensemblefiles', self.ensemblefiles, deps=ng_runs, stage='package', fail_msg='failed to generate ensemblefiles ')) #packages files in ./output/nextgen/ asdlkfj.tar.gz for sending to IRI
+		return jobs
+
+	def publish(self, lease=300, retries=2):
+		"""sets the run up once, then hands its jobs to a queue any number of worker processes (on any host that can see workdir) can drain"""
+		if self.initialized == 0:
+			self.initialize() #the only place force_download wipes the work folder - workers must not
+		config = self.filemanager.path('run.pycpt')
+		force, workdir = self.force_download, self.workdir
+		self.force_download = False #workers load this file, and shouldnt delete what other workers already made
+		self.workdir = str(Path(self.workdir).absolute()) #workers may start somewhere else
+		self.save(config)
+		self.force_download, self.workdir = force, workdir
+		queue = JobQueue(self.filemanager.path('queue.db'), lease=lease, retries=retries, verbose=self.verbose)
+		queue.publish(self.build_jobs(), config)
+		return queue
+
+	@classmethod
+	def worker(self, queue_path, poll=5, lease=None):
+		"""loads the run a queue was published from and works on it - what 'python -m pycpt_oo work' calls on each host. lease None keeps the one it was published with"""
+		queue = JobQueue(queue_path, lease=lease)
+		py = PYCPT.from_file(queue.config())
+		return py.run_worker(poll=poll, lease=lease)
+
+	def run_worker(self, poll=5, lease=None):
+		if self.initialized == 0:
+			self.initialize()
+		queue = JobQueue(self.filemanager.path('queue.db'), lease=lease, verbose=self.verbose)
+		jobs = {job.name: job for job in self.build_jobs()}
+		me = JobQueue.worker_name()
+		while not queue.finished():
+			name = queue.claim(me)
+			if name is None: #everything left is waiting on someone elses job
+				time.sleep(poll)
+				continue
+			job = jobs[name]
+			if self.verbose:
+				print('{} {} running {}'.format(d.datetime.now(), me, name))
+				sys.stdout.flush()
+			runner = threading.Thread(target=job) #jobs never raise, so the thread always ends
+			runner.start()
+			while runner.is_alive():
+				runner.join(queue.lease / 3.0)
+				if runner.is_alive() and not queue.renew(name, me):
+					print('{} lost its lease on {} - another worker will redo it'.format(me, name))
+			queue.complete(name, me, None if job.status == 'done' else '{}: {}'.format(type(job.error).__name__, job.error), job.walltime())
+			if job.status == 'failed':
+				print('{} - {}: {}'.format(job.fail_msg, type(job.error).__name__, job.error))
+				sys.stdout.flush()
 		self.reset()
+		return queue.failed()
+
+	def relative(self, path):
+		"""[path relative to the work directory] - for Jobs whose func returns the one file it made"""
+		return [] if path is None else [os.path.relpath(str(path), self.filemanager.path())]
 
 	def test(self):
 		self.verbose = False
@@ -288,13 +457,20 @@ class PYCPT:
 		if self.initialized != 1:
 			print('PYCPT not initialized - call .initialize()')
 			return
-		self.vis.pltdomain(self.obs_argsets[0], self.hindcast_argsets[0])
+		with Visualizer.lock: #pyplot isnt thread safe, and other PYCPTs in this process may be plotting
+			self.vis.pltdomain(self.obs_argsets[0], self.hindcast_argsets[0])
+
+	def prepFiles(self, model, tgt, obs=True):
+		if self.initialized != 1:
+			print('PYCPT not initialized - call .initialize()')
+			return
+		self.IRIDLs[tgt].prep_files(model, obs=obs)
 
-	def prepFiles(self, model, tgt):
+	def prepObs(self, tgt):
 		if self.initialized != 1:
 			print('PYCPT not initialized - call .initialize()')
 			return
-		self.IRIDLs[tgt].prep_files(model)
+		return self.IRIDLs[tgt].prep_obs()
 
 	def CPTscript(self, model, tgt):
 		if self.initialized != 1:
@@ -315,31 +491,52 @@ class PYCPT:
 		if self.initialized != 1:
 			print('PYCPT not initialized - call .initialize()')
 			return
-		self.vis.pltmap(metric, models, self.obs_argsets, MOS)
+		with Visualizer.lock:
+			return self.vis.pltmap(metric, models, self.obs_argsets, MOS)
+
+	def preview(self, model, tgt, on_map=None):
+		"""plots every metric for one model and target season as soon as its CPT run is done, instead of waiting for all of them"""
+		if self.initialized != 1:
+			print('PYCPT not initialized - call .initialize()')
+			return
+		on_map = PYCPT.show_image if on_map is None else on_map
+		for metric in self.met:
+			with Visualizer.lock:
+				path = self.vis.pltmap(metric, [model], [self.obs_argsets[tgt]], self.MOS, filename='{}_{}_{}'.format(model, metric, self.tgts[tgt]), show=False) #pyplot can only draw inline from the kernel's thread, so save the png and hand it over instead
+			on_map(path)
+
+	@classmethod
+	def show_image(self, path):
+		"""default on_map - puts a saved map into the notebook cell that started the run, does nothing outside of jupyter"""
+		if get_ipython() is not None:
+			display(Image(filename=path, width=600))
 
 	def plteofs(self, mode):
 		if self.initialized != 1:
 			print('PYCPT not initialized - call .initialize()')
 			return
-		self.vis.plteofs(self.models, self.MOS, self.eofmodes, mode, self.obs_argsets)
+		with Visualizer.lock:
+			self.vis.plteofs(self.models, self.MOS, self.eofmodes, mode, self.obs_argsets)
 
 	def NGensemble(self, models, tgt):
 		if self.initialized != 1:
 			print('PYCPT not initialized - call .initialize()')
 			return
-		self.filemanager.NGensemble(models, self.forecasts_argsets[tgt], self.MOS)
+		return self.filemanager.NGensemble(models, self.forecasts_argsets[tgt], self.MOS)
 
 	def plt_deterministic(self):
 		if self.initialized != 1:
 			print('PYCPT not initialized - call .initialize()')
 			return
-		self.vis.plt_deterministic('NextGen', self.forecasts_argsets, 'None')
+		with Visualizer.lock:
+			self.vis.plt_deterministic('NextGen', self.forecasts_argsets, 'None')
 
 	def plt_probabilistic(self):
 		if self.initialized != 1:
 			print('PYCPT not initialized - call .initialize()')
 			return
-		self.vis.plt_probabilistic('NextGen', self.forecasts_argsets, 'None')
+		with Visualizer.lock:
+			self.vis.plt_probabilistic('NextGen', self.forecasts_argsets, 'None')
 
 	def ensemblefiles(self):
 		if self.initialized != 1:
@@ -364,7 +561,7 @@ class PYCPT:
 	def save(self, fname=None):
 		self.params = {}
 		for key in vars(self).keys():
-			if key not in ['IRIDLs', 'params','modes', 'cpt', 'vis', 'filemanager', 'obs_argsets', 'hindcast_argsets', 'forecasts_argsets', 'hind_obs_seasons', 'forecast_seasons', 'obs_domain' , 'hindcast_domain', 'forecast_domain']:
+			if key not in ['IRIDLs', 'params','modes', 'cpt', 'ngcpt', 'executor', 'vis', 'filemanager', 'obs_argsets', 'hindcast_argsets', 'forecasts_argsets', 'hind_obs_seasons', 'forecast_seasons', 'obs_domain' , 'hindcast_domain', 'forecast_domain']:
 				self.params[key] = vars(self)[key]
 		if fname is None:
 			fname = self.work
@@ -376,26 +573,32 @@ class PYCPT:
 	def from_file(self, fname):
 		f = open(fname, 'r')
 		params = json.loads(f.read())
-		return PYCPT(params['work'], params['workdir'], params['cptdir'], params['use_topo'], params['shp_file'], params['use_default'], params['map_color'], params['models'], params['tgts'], params['met'], params['obs'], params['station'], params['MOS'], params['xmodes_min'], params['xmodes_max'], params['ymodes_min'], params['ymodes_max'], params['ccamodes_min'], params['ccamodes_max'], params['eofmodes'], params['predictor'], params['predictand'], params['mons'], params['tgti'], params['tgtf'], params['tini'], params['tend'], params['monf'], params['fyr'], params['force_download'], params['nla1'], params['sla1'], params['elo1'], params['wlo1'], params['nla2'], params['sla2'], params['elo2'], params['wlo2'], verbose=params['verbose'])
+		f.close()
+		return PYCPT.from_dict(params)
+
+	@classmethod
+	def from_dict(self, params):
+		"""builds a PYCPT from the same fields save() writes - what from_file and the Service use"""
+		return PYCPT(params['work'], params['workdir'], params['cptdir'], params['use_topo'], params['shp_file'], params['use_default'], params['map_color'], params['models'], params['tgts'], params['met'], params['obs'], params['station'], params['MOS'], params['xmodes_min'], params['xmodes_max'], params['ymodes_min'], params['ymodes_max'], params['ccamodes_min'], params['ccamodes_max'], params['eofmodes'], params['predictor'], params['predictand'], params['mons'], params['tgti'], params['tgtf'], params['tini'], params['tend'], params['monf'], params['fyr'], params['force_download'], params['nla1'], params['sla1'], params['elo1'], params['wlo1'], params['nla2'], params['sla2'], params['elo2'], params['wlo2'], verbose=params['verbose'], local_seasons=params.get('local_seasons', False), local_rfreq=params.get('local_rfreq', False), wetday_threshold=params.get('wetday_threshold'), threshold_pctle=params.get('threshold_pctle'))
 
 	def __str__(self):
 		self.params = {}
 		for key in vars(self).keys():
-			if key not in ['IRIDLs', 'params','modes', 'cpt', 'vis', 'filemanager', 'obs_argsets', 'hindcast_argsets', 'forecasts_argsets', 'hind_obs_seasons', 'forecast_seasons', 'obs_domain' , 'hindcast_domain', 'forecast_domain']:
+			if key not in ['IRIDLs', 'params','modes', 'cpt', 'ngcpt', 'executor', 'vis', 'filemanager', 'obs_argsets', 'hindcast_argsets', 'forecasts_argsets', 'hind_obs_seasons', 'forecast_seasons', 'obs_domain' , 'hindcast_domain', 'forecast_domain']:
 				self.params[key] = vars(self)[key]
 		return json.dumps(self.params, indent=8)
 
 	def __repr__(self):
 		self.params = {}
 		for key in vars(self).keys():
-			if key not in ['IRIDLs', 'params','modes', 'cpt', 'vis', 'filemanager', 'obs_argsets', 'hindcast_argsets', 'forecasts_argsets', 'hind_obs_seasons', 'forecast_seasons', 'obs_domain' , 'hindcast_domain', 'forecast_domain']:
+			if key not in ['IRIDLs', 'params','modes', 'cpt', 'ngcpt', 'executor', 'vis', 'filemanager', 'obs_argsets', 'hindcast_argsets', 'forecasts_argsets', 'hind_obs_seasons', 'forecast_seasons', 'obs_domain' , 'hindcast_domain', 'forecast_domain']:
 				self.params[key] = vars(self)[key]
 		return json.dumps(self.params, indent=8)
 
 	def __eq__(self, other):
 		ret = True
 		for key in vars(self).keys():
-			if key not in ['shape_feature', 'states_provinces']:
+			if key not in ['shape_feature', 'states_provinces', 'executor']:
 				if vars(self)[key] != vars(other)[key]:
 					ret = False
 		return ret
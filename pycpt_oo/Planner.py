@@ -0,0 +1,221 @@
+from __future__ import print_function
+import sys, os
+import json, time, socket
+import threading
+from pathlib import Path
+
+from .CPTPool import CPTPool
+
+
+class Planner:
+	"""Class for estimating what a PyCPT run will cost before running it - bytes to download, seconds per step, and when the whole run should finish
+	Estimates scale each step by the size of its grids (from the Domain boxes) and number of years, at a rate learned from past runs in a timings file
+	---------------------------------------------------------------------------
+	Variables:
+		py (PYCPT)		:	initialized PYCPT whose run is being planned
+		history (str)	:	path to the timings file - JSON lines, one per finished step of any run (default: workdir/timings.jsonl, shared by every work folder in workdir)
+		samples (dict)	:	kind of step -> list of past timings for it
+		rates (dict)	:	class-level default seconds per unit of work for each kind of step, used until the history has samples of that kind
+		resolutions (dict):	class-level grid spacing (degrees) of each data source, for counting grid points from a Domain box
+		verbose (bool)	:	whether or not to print stuff
+	---------------------------------------------------------------------------
+	Class Methods (callable without instantiation):
+		kind(name: str) -> str (what kind of step a job is, from its name - 'fetch', 'obs', 'cpt', 'pltmap'...)
+		cells(domain: Domain, resolution: float) -> int (number of grid points in a Domain box)
+		report(plan: dict) -> str (human readable table of a plan)
+	---------------------------------------------------------------------------
+	Object Methods:
+		__init__(py: PYCPT, history: str, verbose: bool) -> Planner (loads the timings file, if there is one)
+		units(job: Job) -> (float, str) (how much work a job is, in the units its kind is timed in, and the variant its timed separately as - eg MOS for cpt)
+		estimate(job: Job) -> dict (urls, bytes, seconds and whether the rate came from history or the defaults)
+		plan(jobs: list, workers: int, cpt_workers: int) -> dict (estimates every job, finds the critical path and simulates the scheduler for an expected finish time)
+		simulate(jobs: list, seconds: dict, workers: int, cpt_workers: int, io_workers: int) -> dict (job name -> (start, end) seconds from the start of the run)
+		critical_path(jobs: list, seconds: dict) -> list (names of the longest chain of dependent jobs)
+		record(job: Job) -> None (appends a finished job's timing to the history)
+	---------------------------------------------------------------------------"""
+
+	rates = {'fetch': 2e-4, 'obs': 2e-4, 'script': 0.05, 'cpt': 2e-6, 'ngensemble': 1e-6, 'pltdomain': 10.0, 'pltmap': 6.0, 'preview': 6.0, 'plteofs': 6.0, 'plt_deterministic': 8.0, 'plt_probabilistic': 8.0, 'ensemblefiles': 2.0}
+	bytes_per_value = 9.0 #cptv10.tsv values, like '-999.000' plus a tab, until the history says otherwise
+	resolutions = {'Models': 1.0, 'CPC-CMAP-URD': 2.5, 'TRMM': 1.5, 'CPC': 1.5, 'CHIRPS': 0.25, 'GPCC': 0.5, 'ENACTS-BD': 0.0375, 'CRU': 0.5, 'Chilestations': None}
+	stations = 100 #station data has no grid - guess a network size
+	history_lock = threading.Lock()
+
+	def __init__(self, py, history=None, verbose=True):
+		self.verbose = verbose
+		self.py = py
+		self.history = str(Path(py.workdir, 'timings.jsonl').absolute()) if history is None else str(history)
+		self.samples = {}
+		if os.path.isfile(self.history):
+			f = open(self.history, 'r')
+			for line in f:
+				try:
+					sample = json.loads(line)
+				except ValueError:
+					continue #half a line from a crash
+				self.samples.setdefault(sample['kind'], []).append(sample)
+			f.close()
+
+	@classmethod
+	def kind(self, name):
+		return name.split(':')[0]
+
+	@classmethod
+	def cells(self, domain, resolution):
+		if resolution is None:
+			return Planner.stations
+		width = domain.elo - domain.wlo if domain.elo >= domain.wlo else domain.elo - domain.wlo + 360 #going around the other way
+		return (int(abs(domain.nla - domain.sla) / resolution) + 1) * (int(width / resolution) + 1)
+
+	def grids(self, tgt):
+		"""grid points and years of the predictor (model) and predictand (obs) data for a target season"""
+		iridl = self.py.IRIDLs[tgt]
+		obs = 'CRU' if iridl.fprefix == 'RFREQ' and not iridl.threshold_pctle else iridl.obs #RFREQ obs come from CRU TS unless thresholding by percentile
+		x = Planner.cells(iridl.hindcasts_domain, Planner.resolutions['Models'])
+		y = Planner.cells(iridl.observations_domain, Planner.resolutions[obs])
+		years = iridl.hindcasts_domain.tend - iridl.hindcasts_domain.tini + 1
+		return x, y, years
+
+	def combos(self, MOS):
+		"""number of mode combinations CPT tries while cross-validating - its running time goes up with each"""
+		m = self.py.modes
+		if MOS == 'CCA':
+			return (m.xmodes_max - m.xmodes_min + 1) * (m.ymodes_max - m.ymodes_min + 1) * (m.ccamodes_max - m.ccamodes_min + 1)
+		if MOS == 'PCR':
+			return m.xmodes_max - m.xmodes_min + 1
+		return 1
+
+	def units(self, job):
+		kind, parts = Planner.kind(job.name), job.name.split(':')
+		py = self.py
+		if kind == 'fetch':
+			x, y, years = self.grids(int(parts[2]))
+			return float(x * years + x), kind #values in hindcasts + one year of forecasts
+		if kind == 'obs':
+			x, y, years = self.grids(int(parts[1]))
+			return float(y * years), kind #observations are fetched once per target season, not per model
+		if kind == 'cpt':
+			x, y, years = self.grids(int(parts[2]))
+			if parts[1] == 'NextGen':
+				return float(2 * y * years), 'None' #nextgen runs on the obs grid, without MOS
+			return float((x + y) * years * self.combos(py.MOS)), py.MOS
+		if kind == 'ngensemble':
+			x, y, years = self.grids(int(parts[1]))
+			return float(len(py.models) * y * years), kind
+		if kind == 'pltmap':
+			return float(len(py.tgts) * (1 if parts[1] == 'NextGen' else len(py.models))), kind #one panel per model and target season
+		if kind == 'plteofs':
+			return float(len(py.tgts) * len(py.models)), kind
+		if kind == 'preview':
+			return float(len(py.met)), kind
+		if kind == 'pltdomain':
+			return 2.0, kind
+		if kind in ['plt_deterministic', 'plt_probabilistic']:
+			return float(len(py.tgts)), kind
+		return 1.0, kind
+
+	def rate(self, kind, variant, field='walltime'):
+		"""median of field / units over the last 50 timings of this kind (and variant), or None if there arent any"""
+		ratios = [s[field] / s['units'] for s in self.samples.get(kind, []) if s.get('variant') == variant and s.get(field) is not None and s['units'] > 0]
+		ratios = sorted(ratios[-50:])
+		if len(ratios) == 0:
+			return None
+		return ratios[len(ratios) // 2]
+
+	def estimate(self, job):
+		kind = Planner.kind(job.name)
+		units, variant = self.units(job)
+		rate = self.rate(kind, variant)
+		estimate = {'name': job.name, 'stage': job.stage, 'deps': job.deps, 'serial': job.serial, 'units': units, 'urls': [], 'bytes': 0, 'seconds': units * (Planner.rates.get(kind, 1.0) if rate is None else rate), 'source': 'default' if rate is None else 'history'}
+		if kind in ['fetch', 'obs']:
+			parts = job.name.split(':')
+			estimate['urls'] = [self.py.IRIDLs[int(parts[2])].query(parts[1], datatype) for datatype in ['Hindcasts', 'Forecasts']] if kind == 'fetch' else [self.py.IRIDLs[int(parts[1])].query(None, 'Observations')]
+			per_value = self.rate(kind, variant, 'bytes')
+			estimate['bytes'] = int(units * (Planner.bytes_per_value if per_value is None else per_value))
+		return estimate
+
+	def critical_path(self, jobs, seconds):
+		finish, prev = {}, {}
+		for job in jobs: #build_jobs lists every job after the jobs it needs
+			before = [dep for dep in job.deps if dep in finish]
+			prev[job.name] = max(before, key=lambda dep: finish[dep]) if len(before) > 0 else None
+			finish[job.name] = (finish[prev[job.name]] if prev[job.name] is not None else 0) + seconds[job.name]
+		path, name = [], max(finish, key=lambda name: finish[name]) if len(finish) > 0 else None
+		while name is not None:
+			path.insert(0, name)
+			name = prev[name]
+		return path
+
+	def simulate(self, jobs, seconds, workers=1, cpt_workers=None, io_workers=8):
+		"""plays the Scheduler forward with estimated times - parallel jobs on 'workers' threads, io jobs on io_workers more, cpt jobs limited by the pool, and serial jobs on the scheduler's own thread, which starts nothing else while one runs"""
+		cpt_workers = CPTPool.physical_cores() if cpt_workers is None else cpt_workers
+		times, running, now = {}, {}, 0.0
+		pending = [job for job in jobs]
+		while len(pending) > 0 or len(running) > 0:
+			ready = [job for job in pending if all(dep in times and times[dep][1] <= now for dep in job.deps)]
+			if not any(job.serial for job in running.values()): #a serial job blocks the scheduler until its done
+				for job in [job for job in ready if job.io and not job.serial]:
+					if len([other for other in running.values() if other.io]) >= io_workers:
+						break
+					times[job.name], running[job.name] = (now, now + seconds[job.name]), job
+					pending.remove(job)
+				for job in [job for job in ready if not job.serial and not job.io]: #same order the scheduler starts them in
+					if len([other for other in running.values() if not other.io]) >= workers:
+						break
+					if Planner.kind(job.name) == 'cpt' and len([other for other in running.values() if Planner.kind(other.name) == 'cpt']) >= cpt_workers:
+						continue #would sit in the pool waiting for a core
+					times[job.name], running[job.name] = (now, now + seconds[job.name]), job
+					pending.remove(job)
+				serial = [job for job in ready if job.serial]
+				if len(serial) > 0 and len([other for other in running.values() if not other.io]) < workers:
+					times[serial[0].name], running[serial[0].name] = (now, now + seconds[serial[0].name]), serial[0]
+					pending.remove(serial[0])
+			if len(running) == 0:
+				break #whats left depends on jobs that arent in the list
+			now = min(times[name][1] for name in running)
+			for name in [name for name in running if times[name][1] <= now]:
+				del running[name]
+		return times
+
+	def plan(self, jobs, workers=1, cpt_workers=None):
+		cpt_workers = CPTPool.physical_cores() if cpt_workers is None else cpt_workers
+		estimates = [self.estimate(job) for job in jobs]
+		seconds = {e['name']: e['seconds'] for e in estimates}
+		times = self.simulate(jobs, seconds, workers, cpt_workers)
+		path = self.critical_path(jobs, seconds)
+		for e in estimates:
+			e['start'], e['end'] = times.get(e['name'], (None, None))
+			e['critical'] = e['name'] in path
+		return {'work': self.py.work, 'jobs': estimates, 'bytes': sum(e['bytes'] for e in estimates), 'urls': len([url for e in estimates for url in e['urls']]), 'cpu_seconds': sum(seconds.values()),
+				'critical_path': path, 'critical_seconds': sum(seconds[name] for name in path), 'makespan': max([end for start, end in times.values()] + [0]), 'workers': workers, 'cpt_workers': cpt_workers}
+
+	def record(self, job):
+		if job.status != 'done' or job.cached or job.walltime() is None:
+			return
+		kind = Planner.kind(job.name)
+		units, variant = self.units(job)
+		walltime = job.walltime()
+		if kind == 'cpt' and type(job.result) == dict and job.result.get('walltime') is not None:
+			walltime = job.result['walltime'] #time CPT itself ran, not time spent waiting for a free core
+		sample = {'kind': kind, 'variant': variant, 'units': units, 'walltime': walltime, 'bytes': None, 'host': socket.gethostname(), 'time': time.time()}
+		if kind in ['fetch', 'obs']:
+			sizes = [os.path.getsize(self.py.filemanager.path(path)) for path in job.files() if os.path.isfile(self.py.filemanager.path(path))]
+			sample['bytes'] = sum(sizes)
+			if walltime < 1.0: #files were already there or linked from another run - the size is still worth knowing, the time isnt
+				sample['walltime'] = None
+		with Planner.history_lock:
+			f = open(self.history, 'a')
+			f.write(json.dumps(sample) + '\n')
+			f.close()
+		self.samples.setdefault(kind, []).append(sample)
+
+	@classmethod
+	def report(self, plan):
+		lines = ['{:<36} {:<8} {:>12} {:>10} {:>10} {:>8}'.format('job', 'stage', 'bytes', 'seconds', 'start', 'source')]
+		for e in plan['jobs']:
+			lines.append('{:<36} {:<8} {:>12} {:>10.1f} {:>10} {:>8}{}'.format(e['name'], str(e['stage']), e['bytes'] if e['bytes'] > 0 else '', e['seconds'], '' if e['start'] is None else '{:.0f}'.format(e['start']), e['source'], ' *' if e['critical'] else ''))
+		lines.append('{}: {} jobs, {} IRIDL queries, ~{:.1f} MB to download, ~{:.0f} cpu seconds'.format(plan['work'], len(plan['jobs']), plan['urls'], plan['bytes'] / 1e6, plan['cpu_seconds']))
+		lines.append('expected to finish in ~{:.1f} min with {} workers - critical path (*) is ~{:.1f} min'.format(plan['makespan'] / 60.0, plan['workers'], plan['critical_seconds'] / 60.0))
+		return '\n'.join(lines)
+
+	def __str__(self):
+		return "Planner for {}: {} past timings in {}".format(self.py.work, sum(len(s) for s in self.samples.values()), self.history)
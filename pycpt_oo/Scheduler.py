@@ -0,0 +1,132 @@
+from __future__ import print_function
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Scheduler:
+	"""Class for running a graph of Jobs - each job starts as soon as all the jobs it depends on are done
+	---------------------------------------------------------------------------
+	Variables:
+		jobs (list)		:	list of Job objects, in the order they would run one at a time
+		by_name (dict)	:	dict mapping job name -> Job
+		workers (int)	:	maximum number of jobs running at the same time (serial jobs count too, io jobs dont)
+		io_workers (int):	maximum number of io jobs (downloads) running at the same time, on top of workers
+		on_done (callable): optional function called with each Job as it finishes, on the scheduler's thread
+		finished (set)	:	names of the jobs the scheduler has finished its bookkeeping for - a job marks itself done on its worker thread before on_done has seen it
+		verbose (bool)	:	whether or not to print failures as they happen
+	---------------------------------------------------------------------------
+	Class Methods:
+		None
+	---------------------------------------------------------------------------
+	Object Methods:
+		__init__(jobs: list, workers: int, on_done: callable, verbose: bool, io_workers: int) -> Scheduler
+		validate_args(jobs: list, workers: int, io_workers: int) -> Boolean (checks names are unique, deps exist and there are no cycles)
+		ready() -> list (pending jobs whose dependencies are all done and finished)
+		run() -> list (runs every job, returns the list of failed jobs)
+		failed() -> list (jobs that raised an error)
+		skipped() -> list (jobs that never ran because something they depend on failed)
+	---------------------------------------------------------------------------"""
+
+	def __init__(self, jobs, workers=1, on_done=None, verbose=True, io_workers=8):
+		self.verbose = verbose
+		if not self.validate_args(jobs, workers, io_workers):
+			raise ValueError('Invalid job graph - check job names and dependencies')
+		self.jobs = list(jobs)
+		self.by_name = {job.name: job for job in self.jobs}
+		self.workers, self.io_workers = workers, io_workers
+		self.on_done = on_done
+		self.finished = set()
+
+	def validate_args(self, jobs, workers, io_workers):
+		"""makes sure the graph can actually be run"""
+		retval = True
+		if type(workers) != int or workers < 1:
+			print('workers must be an int >= 1')
+			retval = retval and False
+		if type(io_workers) != int or io_workers < 1:
+			print('io_workers must be an int >= 1')
+			retval = retval and False
+		names = [job.name for job in jobs]
+		if len(set(names)) != len(names):
+			print('Job names must be unique')
+			retval = retval and False
+		for job in jobs:
+			for dep in job.deps:
+				if dep not in names:
+					print('{} depends on {}, which is not a job'.format(job.name, dep))
+					retval = retval and False
+		if retval: #only look for cycles if the graph is otherwise sane - kahn's algorithm, if we cant order everything theres a cycle
+			deps = {job.name: set(job.deps) for job in jobs}
+			ordered = set()
+			while len(ordered) < len(deps):
+				free = [name for name in deps if name not in ordered and deps[name] <= ordered]
+				if len(free) == 0:
+					print('Job graph has a cycle - {}'.format([name for name in deps if name not in ordered]))
+					retval = retval and False
+					break
+				ordered.update(free)
+		return retval
+
+	def ready(self):
+		"""pending jobs whose dependencies have all finished successfully, in submission order - only once _finish has run for them, so on_done (the Ledger) always sees a job before the jobs after it"""
+		return [job for job in self.jobs if job.status == 'pending' and all(dep in self.finished and self.by_name[dep].status == 'done' for dep in job.deps)]
+
+	def _skip_blocked(self):
+		"""marks jobs that can never run because a dependency failed or was skipped"""
+		changed = True
+		while changed: #propagate down the graph until nothing changes
+			changed = False
+			for job in self.jobs:
+				if job.status == 'pending' and any(self.by_name[dep].status == 'skipped' or dep in self.finished and self.by_name[dep].status == 'failed' for dep in job.deps):
+					job.status = 'skipped'
+					changed = True
+
+	def _finish(self, job):
+		"""bookkeeping for a job that just finished, always on the scheduler's thread"""
+		if job.status == 'failed' and self.verbose:
+			print('{} - {}: {}'.format(job.fail_msg, type(job.error).__name__, job.error))
+			sys.stdout.flush()
+		if self.on_done is not None:
+			self.on_done(job)
+		self.finished.add(job.name)
+
+	def run(self):
+		"""runs the whole graph - parallel jobs go to a thread pool, io jobs to their own, serial jobs run right here one at a time"""
+		running = {} #future -> job
+		self.finished = set()
+		with ThreadPoolExecutor(max_workers=self.workers) as pool, ThreadPoolExecutor(max_workers=self.io_workers) as io_pool:
+			while True:
+				self._skip_blocked()
+				ready = self.ready()
+				for job in [j for j in ready if j.io and not j.serial]:
+					if len([j for j in running.values() if j.io]) >= self.io_workers:
+						break
+					job.status = 'running'
+					running[io_pool.submit(job)] = job
+				busy = len([j for j in running.values() if not j.io])
+				for job in [j for j in ready if not j.serial and not j.io]:
+					if busy >= self.workers:
+						break
+					job.status = 'running' #mark now so ready() doesnt hand it out twice
+					running[pool.submit(job)] = job
+					busy += 1
+				serial = [j for j in ready if j.serial]
+				if len(serial) > 0 and busy < self.workers: #run one serial job on this thread, then look again
+					serial[0]()
+					self._finish(serial[0])
+					continue
+				if len(running) == 0: #nothing running and nothing we can start - we're done
+					break
+				done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+				for future in done:
+					self._finish(running.pop(future))
+		return self.failed()
+
+	def failed(self):
+		return [job for job in self.jobs if job.status == 'failed']
+
+	def skipped(self):
+		return [job for job in self.jobs if job.status == 'skipped']
+
+	def __str__(self):
+		return "Scheduler: {} jobs, {} workers\n  ".format(len(self.jobs), self.workers) + "\n  ".join(str(job) for job in self.jobs)
@@ -0,0 +1,233 @@
+from __future__ import print_function
+import sys, os
+import json, time
+import hashlib, mimetypes, threading
+import datetime as d
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+from cartopy import feature
+
+from .CPTPool import CPTPool
+from .PYCPT import PYCPT
+from .Visualizer import Visualizer
+
+
+class Service:
+	"""Class for running PyCPT as a long-lived process that takes runs over a local HTTP/JSON API
+	Imports, map features, parsed CTL files and the IRIDL url tables stay loaded between runs, so re-runs dont pay to start python again
+	---------------------------------------------------------------------------
+	Variables:
+		host (str)		:	address to listen on - keep it local, there's no authentication
+		port (int)		:	port to listen on
+		runs (int)		:	number of runs executed at the same time
+		workers (int)	:	workers passed to PYCPT.execute for each run
+		pool (CPTPool)	:	one CPTPool shared by every run, so the machine never runs more CPTs than it has cores for
+		records (dict)	:	run id -> dict describing the run (status, times, finished jobs, failures)
+		verbose (bool)	:	whether or not to print stuff
+	---------------------------------------------------------------------------
+	Class Methods (callable without instantiation):
+		run_id(spec: dict) -> str (hash of a run spec - identical specs get the same id, which is how duplicates are caught)
+	---------------------------------------------------------------------------
+	Object Methods:
+		__init__(host: str, port: int, runs: int, workers: int, cpt_workers: int, verbose: bool) -> Service
+		validate_args(host: str, port: int, runs: int, workers: int) -> Boolean
+		warm() -> None (loads the things every run needs before the first request comes in)
+		submit(spec: dict, force: bool) -> (str, bool) (queues a run unless an identical one is queued, running or done - returns its id and whether it was a duplicate)
+		status(id: str) -> dict (the run's record, plus its artifacts)
+		artifacts(id: str) -> list (images and output files the run has written so far, relative to its work directory)
+		serve_forever() -> None (answers HTTP requests until interrupted)
+	---------------------------------------------------------------------------
+	HTTP API:
+		POST /runs[?force=1]				body is a run spec, the same JSON PYCPT.save() writes -> {"id": ..., "status": ..., "duplicate": ...}
+		GET  /runs						-> list of run records
+		GET  /runs/<id>					-> run record, with the finished jobs and artifacts
+		GET  /runs/<id>/artifacts/<path>	-> the file itself
+	---------------------------------------------------------------------------"""
+
+	def __init__(self, host='127.0.0.1', port=8080, runs=1, workers=1, cpt_workers=None, verbose=True):
+		self.verbose = verbose
+		if not self.validate_args(host, port, runs, workers):
+			raise ValueError('Invalid Service parameters')
+		self.host, self.port, self.runs, self.workers = host, port, runs, workers
+		self.pool = CPTPool(cpt_workers, verbose=verbose)
+		self.records, self.lock = {}, threading.Lock()
+		self.dirlocks = {} #working directory -> lock, two different specs writing into the same folder must take turns
+		self.executor = ThreadPoolExecutor(max_workers=runs)
+		self.server = None
+
+	def validate_args(self, host, port, runs, workers):
+		retval = True
+		if type(host) != str:
+			print('host must be a string')
+			retval = retval and False
+		if type(port) != int or port < 0 or port > 65535:
+			print('port must be an int between 0 and 65535')
+			retval = retval and False
+		if type(runs) != int or runs < 1:
+			print('runs must be an int >= 1')
+			retval = retval and False
+		if type(workers) != int or workers < 1:
+			print('workers must be an int >= 1')
+			retval = retval and False
+		return retval
+
+	@classmethod
+	def run_id(self, spec):
+		return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+	def warm(self):
+		"""reads the natural earth borders now, instead of during the first run's first map"""
+		with Visualizer.lock:
+			if Visualizer.states_provinces is None:
+				Visualizer.states_provinces = feature.NaturalEarthFeature(category='cultural', name='admin_0_countries',scale='10m',facecolor='none')
+			try:
+				list(Visualizer.states_provinces.geometries()) #cartopy keeps what it reads here for every later draw
+			except Exception as e:
+				if self.verbose:
+					print('Could not preload map borders ({}) - first map will load them'.format(e))
+
+	def submit(self, spec, force=False):
+		run = Service.run_id(spec) #duplicates are caught by the hash alone - only new specs pay for a PYCPT
+		with self.lock:
+			record = self.records.get(run)
+			if record is not None and (record['status'] in ['queued', 'running'] or (record['status'] == 'done' and not force)):
+				return run, True
+			self.records[run] = {'id': run, 'status': 'queued', 'work': spec['work'], 'submitted': time.time(), 'started': None, 'finished': None, 'jobs': {}, 'failed': [], 'error': None, 'directory': None} #claimed now, so the same spec sent again meanwhile is a duplicate
+		try:
+			py = PYCPT.from_dict(spec) #raises on a bad spec, before we queue anything
+		except Exception:
+			with self.lock:
+				if record is None:
+					del self.records[run]
+				else:
+					self.records[run] = record #the earlier run of this spec is still the one to report
+			raise
+		self.executor.submit(self._run, run, py)
+		return run, False
+
+	def _dirlock(self, path):
+		with self.lock:
+			if path not in self.dirlocks:
+				self.dirlocks[path] = threading.Lock()
+			return self.dirlocks[path]
+
+	def _run(self, run, py):
+		record = self.records[run]
+		directory = str(Path(py.workdir, py.work).absolute())
+		with self._dirlock(directory):
+			record['status'], record['started'], record['directory'] = 'running', time.time(), directory
+			def on_done(job):
+				record['jobs'][job.name] = {'status': job.status, 'walltime': job.walltime(), 'error': None if job.error is None else str(job.error)}
+			try:
+				py.initialize()
+				py.cpt.pool = self.pool
+				py.ngcpt.pool = self.pool
+				failed = py.execute(workers=self.workers, on_done=on_done)
+				record['failed'] = [job.fail_msg for job in failed]
+				record['status'] = 'done' if len(failed) == 0 else 'failed'
+			except Exception as e:
+				record['status'], record['error'] = 'failed', '{}: {}'.format(type(e).__name__, e)
+			record['finished'] = time.time()
+		if self.verbose:
+			print('{} run {} ({}) {}'.format(d.datetime.now(), run, record['work'], record['status']))
+			sys.stdout.flush()
+
+	def status(self, run):
+		with self.lock:
+			if run not in self.records:
+				return None
+			record = dict(self.records[run])
+			record['jobs'] = dict(record['jobs'])
+		record['artifacts'] = self.artifacts(run)
+		return record
+
+	def artifacts(self, run):
+		directory = self.records[run]['directory']
+		if directory is None:
+			return []
+		found = []
+		for sub in ['images', 'output']:
+			for root, dirs, files in os.walk(os.path.join(directory, sub)):
+				found.extend(os.path.relpath(os.path.join(root, f), directory) for f in sorted(files))
+		return found
+
+	def artifact_path(self, run, relpath):
+		"""absolute path of one of a run's files, or None if it isnt one - never lets a request out of the run's images / output folders"""
+		if run not in self.records or self.records[run]['directory'] is None:
+			return None
+		directory = Path(self.records[run]['directory']).resolve()
+		path = Path(directory, relpath).resolve()
+		if not any(str(path).startswith(str(Path(directory, sub)) + os.sep) for sub in ['images', 'output']) or not path.is_file():
+			return None
+		return str(path)
+
+	def serve_forever(self):
+		self.warm()
+		handler = type('Handler', (_Handler,), {'service': self})
+		self.server = ThreadingHTTPServer((self.host, self.port), handler)
+		if self.verbose:
+			print('PyCPT service listening on http://{}:{}/runs'.format(self.host, self.server.server_address[1]))
+			sys.stdout.flush()
+		try:
+			self.server.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			self.server.server_close()
+			self.executor.shutdown(wait=False)
+
+	def shutdown(self):
+		if self.server is not None:
+			self.server.shutdown()
+
+	def __str__(self):
+		return "Service on {}:{}: {} runs".format(self.host, self.port, len(self.records))
+
+
+class _Handler(BaseHTTPRequestHandler):
+	"""turns HTTP requests into Service calls - 'service' is set on a subclass by Service.serve_forever"""
+	service = None
+
+	def _reply(self, code, body, content_type='application/json'):
+		data = body if type(body) == bytes else json.dumps(body, indent=4).encode('utf-8')
+		self.send_response(code)
+		self.send_header('Content-Type', content_type)
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def do_POST(self):
+		url = urlparse(self.path)
+		if url.path.rstrip('/') != '/runs':
+			return self._reply(404, {'error': 'not found'})
+		try:
+			spec = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+			run, duplicate = self.service.submit(spec, force=parse_qs(url.query).get('force', ['0'])[0] in ['1', 'true', 'True'])
+		except KeyError as e:
+			return self._reply(400, {'error': 'run spec is missing {}'.format(e)})
+		except Exception as e:
+			return self._reply(400, {'error': '{}: {}'.format(type(e).__name__, e)})
+		self._reply(200 if duplicate else 202, {'id': run, 'status': self.service.records[run]['status'], 'duplicate': duplicate})
+
+	def do_GET(self):
+		parts = [unquote(part) for part in urlparse(self.path).path.strip('/').split('/')]
+		if parts == ['runs']:
+			with self.service.lock:
+				records = [dict(record, jobs=len(record['jobs'])) for record in self.service.records.values()]
+			return self._reply(200, records)
+		if len(parts) == 2 and parts[0] == 'runs':
+			record = self.service.status(parts[1])
+			return self._reply(404, {'error': 'no run {}'.format(parts[1])}) if record is None else self._reply(200, record)
+		if len(parts) > 3 and parts[0] == 'runs' and parts[2] == 'artifacts':
+			path = self.service.artifact_path(parts[1], '/'.join(parts[3:]))
+			if path is None:
+				return self._reply(404, {'error': 'no artifact {}'.format('/'.join(parts[3:]))})
+			with open(path, 'rb') as f:
+				return self._reply(200, f.read(), mimetypes.guess_type(path)[0] or 'application/octet-stream')
+		self._reply(404, {'error': 'not found'})
+
+	def log_message(self, format, *args):
+		if self.service.verbose:
+			BaseHTTPRequestHandler.log_message(self, format, *args)
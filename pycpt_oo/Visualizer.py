@@ -5,6 +5,7 @@ from pathlib import Path
 import platform, copy, warnings
 import subprocess
 import struct, copy, json
+import threading
 import numpy as np
 import datetime as d
 
@@ -41,14 +42,17 @@ class Visualizer:
 		use_default (Bool): True/False if function should use default cartopy shp_files
 		fm (FileManager):	FileManager Object for loading data and validating parameters
 		use_custom (Bool): 	Whether or not to use a user-supplied shape file
-		states_provinces (Cartopy Feature):	A default Cartopy map used for plotting if use_custom = True
+		states_provinces (Cartopy Feature):	A default Cartopy map used for plotting if use_custom = True - class-level, built by the first Visualizer in the process
+		shape_features (dict): class-level cache of custom shape files already read, shp_file -> Cartopy Feature
+		lock (threading.RLock): class-level lock - pyplot keeps global state, so only one thread in the process may plot at a time
 	---------------------------------------------------------------------------
 	Class Methods (Callable without Instantiation)
+		load_shape(shp_file: str) -> Cartopy Feature (reads a custom shape file once per process and hands back the same feature after that)
 	---------------------------------------------------------------------------
 	Object Methods
 		__init__(tgts, inits, shp_file, map_color, use_topo) -> Visualizer (constructor)
 		set_models(models: list) -> None (updates the models variable)
-		pltmap(met: str, hindcast_args: [list ArgSet], map_color: str, use_custom: str, use_default:str) -> None (plots metrics for each model for each target season)
+		pltmap(met: str, hindcast_args: [list ArgSet], map_color: str, use_custom: str, use_default:str, filename: str, show: bool) -> str (plots metrics for each model for each target season, returns the path of the saved image - filename / show override the default name and verbose)
 		pltdomain(obs_args: ArgSet, hindcast_args: ArgSet) -> None (plots spatial domains in list of provided )
 		plteof(MOS, obs_args: [list ArgSet],  map_color: str, use_custom: str, use_default:str) -> None (plots EOF[mode] calculated by CPT)
 		plt_probabilistic(model: str, obs_args: ArgSet, MOS:str, shp_file: str, map_color:str, use_custom: str, use_default: str, use_topo:str) -> None ( plots probabilistic forecast generated by Model's CPT run )
@@ -57,6 +61,10 @@ class Visualizer:
 		make_cmap_blue(x: int) -> cmap (creates custom blue colormap used in plt_probabilistic)
 		make_cmap(x: int) -> cmap (creates custom colormap based on user specification of map_color variable -> specifically, adds CPT colorscheme)
 	---------------------------------------------------------------------------"""
+	lock = threading.RLock() #shared by every Visualizer in the process
+	states_provinces = None #country borders - cartopy reads the natural earth file the first time its drawn, so sharing one feature keeps that warm
+	shape_features = {}
+
 	def __init__(self, fm, shp_file="False", map_color="CPT", use_topo="False", use_default="True", verbose=True):
 		self.verbose, self.use_default, self.use_topo = verbose, use_default, use_topo #set variables needed before validation
 		if not self.validate_args(shp_file, map_color, str(use_topo), str(use_default)): #if parameters were not allowed
@@ -66,10 +74,21 @@ class Visualizer:
 		self.shp_file, self.map_color = shp_file, map_color #setting more variables
 		self.use_topo = str(self.use_topo) #setting more variables
 		self.use_default = str(self.use_default) #setting more variables
-		self.states_provinces = feature.NaturalEarthFeature(category='cultural', name='admin_0_countries',scale='10m',facecolor='none')#setting more variables
+		with Visualizer.lock:
+			if Visualizer.states_provinces is None:
+				Visualizer.states_provinces = feature.NaturalEarthFeature(category='cultural', name='admin_0_countries',scale='10m',facecolor='none')#setting more variables
 		self.models = [] #create a stub #setting more variables
 		self.MOSs = {"None": "noMOS", "CCA":"CCA", "PCR":"PCR", "ELR":"ELRho"} #just so we can set mpref, though its only used in filenames now
 
+	@classmethod
+	def load_shape(self, shp_file):
+		"""reads a custom shape file the first time its asked for - Reader(...).geometries() is a generator, so keep them in a list we can draw again"""
+		key = str(Path(str(shp_file)).absolute())
+		with Visualizer.lock:
+			if key not in Visualizer.shape_features:
+				Visualizer.shape_features[key] = ShapelyFeature(list(Reader(str(shp_file)).geometries()), ccrs.PlateCarree(), facecolor='none')
+			return Visualizer.shape_features[key]
+
 	def __eq__(self, other):
 		ret = True
 		for key in vars(self).keys():
@@ -106,7 +125,7 @@ class Visualizer:
 		self.use_topo = str(self.use_topo) # helps with the allowing user override
 		self.use_default = str(self.use_default) # helps with the allowing user override
 		if str(use_custom) == "True":
-			self.shape_feature = ShapelyFeature(Reader(self.shp_file).geometries(), ccrs.PlateCarree(), facecolor='none')
+			self.shape_feature = Visualizer.load_shape(self.shp_file)
 
 		x_offset = 0.6 if obs_args[0].obs == 'ENACTS-BD' else 0 #xoffset helps correct ENACTS-BD data weirdness
 		y_offset = 0.4 if obs_args[0].obs == 'ENACTS-BD' else 0 #yoffset helps correct ENACTS-BD data weirdness
@@ -199,7 +218,7 @@ class Visualizer:
 
 
 		filename =  '{}_ProbabilisticForecast_RT'.format(model) # where to save plot
-		fig.savefig('./images/' + filename + '.png', dpi=500, bbox_inches='tight') #saves the plot
+		fig.savefig(self.fm.path('images', filename + '.png'), dpi=500, bbox_inches='tight') #saves the plot
 		if self.verbose: # if we ant to show plot, show plot if not the n dont
 			plt.show()
 		else:
@@ -218,7 +237,7 @@ class Visualizer:
 		self.use_topo = str(self.use_topo)  # allow user to override plot setting
 		self.use_default = str(self.use_default)  # allow user to override plot setting
 		if str(use_custom) == "True":
-			self.shape_feature = ShapelyFeature(Reader(self.shp_file).geometries(), ccrs.PlateCarree(), facecolor='none')
+			self.shape_feature = Visualizer.load_shape(self.shp_file)
 		x_offset = 0.6 if obs_args[0].obs == 'ENACTS-BD' else 0 #fix enacts BD plotting
 		y_offset = 0.4 if obs_args[0].obs == 'ENACTS-BD' else 0 #fix enacts BD plotting
 		self.nsea = len(obs_args) #self.nmods is set in self.set_models - for this its always 1: 'NextGen' is passed as the model
@@ -271,7 +290,7 @@ class Visualizer:
 				cbar_bdet = fig.colorbar(CS_det, ax=ax[i][j],  cax=axins, orientation='vertical', pad = 0.02) #add colorbar based on forecast data
 				cbar_bdet.set_label('Rainfall (mm)')# add colorbar label
 		filename =  '{}_DeterministicForecast_RT'.format(model) #where to savve file
-		fig.savefig('./images/' + filename + '.png', dpi=500, bbox_inches='tight') #save file
+		fig.savefig(self.fm.path('images', filename + '.png'), dpi=500, bbox_inches='tight') #save file
 		if self.verbose:
 			plt.show() #if we want to show the plot, show it .
 		else:
@@ -290,7 +309,7 @@ class Visualizer:
 		pl.xlabels_top, pl.ylabels_left = False, False #turn off labels for top and left for gridlines
 		pl.xformatter, pl.yformatter = LONGITUDE_FORMATTER, LATITUDE_FORMATTER #add formatters , arcane cartopy stuff
 		if str(use_custom) == "True":
-			self.shape_feature = ShapelyFeature(Reader(self.shp_file).geometries(), ccrs.PlateCarree(), facecolor='none')
+			self.shape_feature = Visualizer.load_shape(self.shp_file)
 
 		ax.add_feature(feature.LAND) #adds gray land imagerhy
 		ax.add_feature(feature.OCEAN) #adds blue water imagery
@@ -317,7 +336,7 @@ class Visualizer:
 			ax.add_feature(self.shape_feature, edgecolor='black') #add their shapep file
 		ax.set_title('Predictand') #sets plot title
 
-		plt.savefig("./images/domain.png",dpi=300, bbox_inches='tight') #SAVE_FILE 0_domain.png
+		plt.savefig(self.fm.path('images', 'domain.png'),dpi=300, bbox_inches='tight') #SAVE_FILE 0_domain.png
 		if self.verbose:
 			plt.show() #show file if desired, else close to prevent it
 		else:
@@ -355,7 +374,7 @@ class Visualizer:
 			self.use_default, self.use_custom = True, False
 		else:
 			try:
-				self.shape_feature = ShapelyFeature(Reader(shp_file).geometries(), ccrs.PlateCarree(), facecolor='none')
+				self.shape_feature = Visualizer.load_shape(shp_file)
 			except:
 				print('Unable to load ShapeFile - using default')
 				self.use_default, self.use_custom =True, False
@@ -399,7 +418,7 @@ class Visualizer:
 		self.nmods = self.nmods + 1 if MOS =='CCA' else self.nmods #for MOS=CCA, we plot the EOFS of the observations 'which are stored in the EOFY file at the top of the grid
 
 		if str(use_custom) == "True":
-			self.shape_feature = ShapelyFeature(Reader(self.shp_file).geometries(), ccrs.PlateCarree(), facecolor='none')
+			self.shape_feature = Visualizer.load_shape(self.shp_file)
 		fig, ax = plt.subplots(nrows=self.nmods, ncols=self.nsea, sharex=False,sharey=False, figsize=(10*self.nsea,6*self.nmods), subplot_kw={'projection': ccrs.PlateCarree()}) #create grid of plots with maps
 		if self.nsea==1 and self.nmods == 1: ## this if/else makes sure ax[i][j] refers to the (ith, jth) image in the plotting grid
 			ax = [[ax]]
@@ -454,9 +473,9 @@ class Visualizer:
 
 		#save file
 		if self.models[0] == 'NextGen':
-			fig.savefig('./images/EOF{}_NextGen.png'.format(cur_mode+1, dpi=500, bbox_inches='tight'))
+			fig.savefig(self.fm.path('images', 'EOF{}_NextGen.png'.format(cur_mode+1)), dpi=500, bbox_inches='tight')
 		else:
-			fig.savefig('./images/EOF{}_Models.png'.format(cur_mode+1, dpi=500, bbox_inches='tight'))
+			fig.savefig(self.fm.path('images', 'EOF{}_Models.png'.format(cur_mode+1)), dpi=500, bbox_inches='tight')
 
 		#show plot if we want that right now
 		if self.verbose:
@@ -464,7 +483,7 @@ class Visualizer:
 		else:
 			plt.close()
 
-	def pltmap(self, met, models,  obs_args, MOS, shp_file="False", map_color=None, use_custom=None, use_default=None,ng=[], use_topo="False"):
+	def pltmap(self, met, models,  obs_args, MOS, shp_file="False", map_color=None, use_custom=None, use_default=None,ng=[], use_topo="False", filename=None, show=None):
 		use_custom = self.use_custom if use_custom is None else use_custom #allow user to add custom map
 		use_default = self.use_default if use_default is None else use_default #allow user  to turn off default map
 		if use_custom: #if were using a custom map
@@ -484,7 +503,7 @@ class Visualizer:
 		fig, ax = plt.subplots(nrows=self.nmods, ncols=self.nsea, figsize=(6*self.nsea, 6*self.nmods),sharex=False,sharey=False, subplot_kw={'projection': ccrs.PlateCarree()}) #create nmods x nseas grid of plots with maps
 
 		if str(use_custom) == "True":
-			self.shape_feature = ShapelyFeature(Reader(self.shp_file).geometries(), ccrs.PlateCarree(), facecolor='none')
+			self.shape_feature = Visualizer.load_shape(self.shp_file)
 
 		if self.nsea==1 and self.nmods == 1: #this if else is so ax[i][j] refers to the plot at position [model][season]
 			ax = [[ax]]
@@ -543,9 +562,11 @@ class Visualizer:
 					cbar = fig.colorbar(CS, ax=ax[i][j], cax=axins, orientation='vertical', pad=0.02, ticks=self.pltmap_argdict[met]['bounds']) # add colorbar to plot with specified ticks, and spacing
 				cbar.set_label(self.pltmap_argdict[met]['label']) #set label for each metric
 
-		filename =  'NextGen_' + met if self.models[0] == 'NextGen' else 'Models_'+met #where to save
-		fig.savefig('./images/' + filename + '.png', dpi=500, bbox_inches='tight') #save image
-		if self.verbose: #if we want to,
+		if filename is None:
+			filename =  'NextGen_' + met if self.models[0] == 'NextGen' else 'Models_'+met #where to save
+		fig.savefig(self.fm.path('images', filename + '.png'), dpi=500, bbox_inches='tight') #save image
+		if (self.verbose if show is None else show): #if we want to,
 			plt.show() #show the plot
 		else:
 			plt.close() #else prevent plot from showing
+		return self.fm.path('images', filename + '.png')
@@ -1,11 +1,21 @@
 from .ArgSet import ArgSet
+from .Batch import Batch
 from .CPT import CPT
+from .CPTPool import CPTPool
 from .Domain import Domain
+from .DownloadCache import DownloadCache
+from .Downloader import Downloader
 from .FileManager import FileManager
 from .IRIDL import IRIDL
+from .Job import Job
+from .JobQueue import JobQueue
+from .Ledger import Ledger
 from .MetaTensor import MetaTensor
 from .MidpointNormalize import MidpointNormalize
 from .Modes import Modes
 from .PYCPT import PYCPT
+from .Planner import Planner
+from .Scheduler import Scheduler
+from .Service import Service
 from .TargetSeason import TargetSeason
 from .Visualizer import Visualizer
@@ -0,0 +1,113 @@
+"""command line for running PyCPT across several processes / hosts that share the work directory
+	python -m pycpt_oo publish run.pycpt				(sets the run up and queues its jobs in <workdir>/<work>/queue.db)
+	python -m pycpt_oo work <workdir>/<work>/queue.db	(start one of these on every host, as many as you like)
+	python -m pycpt_oo status <workdir>/<work>/queue.db
+	python -m pycpt_oo serve --port 8080				(long-lived service that takes runs over HTTP, see Service)
+	python -m pycpt_oo batch configs/ --root runs/		(runs every .pycpt in configs/ side by side, see Batch)
+	python -m pycpt_oo plan configs/ --deadline 14:00	(estimates what a run or batch will download and how long it will take, see Planner)
+	python -m pycpt_oo prefetch configs/ --monf Jun --fyr 2024 --until 2024-06-20T06:00	(downloads everything the configs need for next month's run into the download cache, as the IRIDL publishes it - see Batch.warm)"""
+from __future__ import print_function
+import sys, os
+import json
+import argparse
+import time
+import datetime as d
+from .PYCPT import PYCPT
+from .Batch import Batch
+from .JobQueue import JobQueue
+from .Planner import Planner
+from .Service import Service
+
+def when(text):
+	"""HH:MM today, or YYYY-MM-DDTHH:MM"""
+	try:
+		return d.datetime.strptime(text, '%Y-%m-%dT%H:%M')
+	except ValueError:
+		return d.datetime.combine(d.datetime.now().date(), d.datetime.strptime(text, '%H:%M').time())
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog='python -m pycpt_oo', description='Run PyCPT jobs from a queue on a shared work directory')
+	sub = parser.add_subparsers(dest='command')
+	publish = sub.add_parser('publish', help='set up a saved .pycpt run and queue its jobs')
+	publish.add_argument('config', help='.pycpt file saved with PYCPT.save()')
+	publish.add_argument('--lease', type=float, default=300, help='seconds before a silent worker loses its job')
+	publish.add_argument('--retries', type=int, default=2, help='times a job from a dead worker is handed out again')
+	work = sub.add_parser('work', help='claim and run jobs until the run is finished')
+	work.add_argument('queue', help='queue.db in the work directory')
+	work.add_argument('--poll', type=float, default=5, help='seconds to wait when no job is ready')
+	work.add_argument('--lease', type=float, default=None, help='seconds before a silent worker loses its job (default: what the run was published with)')
+	status = sub.add_parser('status', help='print how far a run has got')
+	status.add_argument('queue', help='queue.db in the work directory')
+	serve = sub.add_parser('serve', help='take runs over a local HTTP/JSON API, keeping everything loaded between them')
+	serve.add_argument('--host', default='127.0.0.1', help='address to listen on')
+	serve.add_argument('--port', type=int, default=8080, help='port to listen on')
+	serve.add_argument('--runs', type=int, default=1, help='runs executed at the same time')
+	serve.add_argument('--workers', type=int, default=1, help='steps of one run executed at the same time')
+	serve.add_argument('--cpt-workers', type=int, default=None, help='CPT processes shared by all runs (default: one per physical core)')
+	batch = sub.add_parser('batch', help='run many saved .pycpt configs side by side and report on each')
+	batch.add_argument('configs', nargs='+', help='directories and / or globs of .pycpt files')
+	batch.add_argument('--root', default=None, help='directory each config gets its own work folder in (default: the config\'s own workdir)')
+	batch.add_argument('--runs', type=int, default=2, help='configs run at the same time')
+	batch.add_argument('--workers', type=int, default=2, help='steps of one config run at the same time')
+	batch.add_argument('--cpt-workers', type=int, default=None, help='CPT processes shared by all configs (default: one per physical core)')
+	batch.add_argument('--report', default='batch_report.json', help='where to write the report')
+	batch.add_argument('--superset', action='store_true', help='download one box around every config\'s domain per dataset first, and cut each config\'s domain from it')
+	plan = sub.add_parser('plan', help='estimate downloads, run time and the critical path without running anything')
+	plan.add_argument('configs', nargs='+', help='.pycpt files, directories and / or globs of them')
+	plan.add_argument('--root', default=None, help='same as for batch')
+	plan.add_argument('--runs', type=int, default=2, help='same as for batch')
+	plan.add_argument('--workers', type=int, default=2, help='same as for batch')
+	plan.add_argument('--cpt-workers', type=int, default=None, help='same as for batch')
+	plan.add_argument('--deadline', default=None, help='HH:MM today, or YYYY-MM-DDTHH:MM - exits 1 if the batch isnt expected to finish by then')
+	plan.add_argument('--json', default=None, help='also write the full plan here')
+	prefetch = sub.add_parser('prefetch', help='download everything the configs need for their next run into the download cache, waiting for what the IRIDL hasnt published yet')
+	prefetch.add_argument('configs', nargs='+', help='.pycpt files, directories and / or globs of them')
+	prefetch.add_argument('--monf', default=None, help='forecast start month for every target season, like Jun (default: each config\'s own)')
+	prefetch.add_argument('--fyr', type=int, default=None, help='forecast year (default: each config\'s own)')
+	prefetch.add_argument('--poll', type=float, default=3600, help='seconds between tries at queries the IRIDL doesnt have yet')
+	prefetch.add_argument('--until', default=None, help='HH:MM today, or YYYY-MM-DDTHH:MM - give up on whatever isnt there by then, exits 1 (default: wait for everything)')
+	args = parser.parse_args(argv)
+
+	if args.command == 'publish':
+		queue = PYCPT.from_file(args.config).publish(lease=args.lease, retries=args.retries)
+		print('Start workers with: python -m pycpt_oo work {}'.format(queue.path))
+	elif args.command == 'work':
+		failed = PYCPT.worker(args.queue, poll=args.poll, lease=args.lease)
+		return 1 if len(failed) > 0 else 0
+	elif args.command == 'status':
+		queue = JobQueue(args.queue, verbose=False)
+		print(queue)
+		for name in queue.failed():
+			print('  failed: {}'.format(name))
+	elif args.command == 'serve':
+		Service(args.host, args.port, runs=args.runs, workers=args.workers, cpt_workers=args.cpt_workers).serve_forever()
+	elif args.command == 'batch':
+		runner = Batch(args.configs, root=args.root, runs=args.runs, workers=args.workers, cpt_workers=args.cpt_workers)
+		report = runner.run(superset=args.superset)
+		runner.write_report(args.report)
+		return 1 if any(r['status'] != 'done' for r in report) else 0
+	elif args.command == 'plan':
+		runner = Batch(args.configs, root=args.root, runs=args.runs, workers=args.workers, cpt_workers=args.cpt_workers)
+		batch = runner.plan()
+		if len(batch['configs']) == 1 and 'error' not in batch['configs'][0]:
+			print(Planner.report(batch['configs'][0])) #one config - show its jobs too
+		if args.json is not None:
+			f = open(args.json, 'w')
+			json.dump(batch, f, indent=4)
+			f.close()
+		if args.deadline is not None:
+			deadline = when(args.deadline)
+			finish = d.datetime.now() + d.timedelta(seconds=batch['makespan'])
+			print('Expected to finish at {:%Y-%m-%d %H:%M} - {} the {:%H:%M} deadline'.format(finish, 'before' if finish <= deadline else '\033[1mAFTER\033[0;0m', deadline))
+			return 0 if finish <= deadline else 1
+	elif args.command == 'prefetch':
+		runner = Batch(args.configs)
+		missing = runner.warm(monf=args.monf, fyr=args.fyr, poll=args.poll, until=None if args.until is None else time.mktime(when(args.until).timetuple()))
+		return 1 if len(missing) > 0 else 0
+	else:
+		parser.print_help()
+		return 2
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
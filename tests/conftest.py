@@ -0,0 +1,22 @@
+import pytest
+
+
+def write_grid(path, lats, lons, years, field='prec'):
+	"""writes a small gridded cptv10.tsv file the way the IRIDL sends them - one block per year, later headers only saying what changed"""
+	with open(str(path), 'w') as f:
+		f.write('xmlns:cpt=http://iri.columbia.edu/CPT/v10/\n')
+		f.write('cpt:nfields=1\n')
+		for i, year in enumerate(years):
+			stamps = 'cpt:S={}-05-01T00:00, cpt:T={}-06/08'.format(year, year)
+			if i == 0:
+				f.write('cpt:field={}, {}, cpt:nrow={}, cpt:ncol={}, cpt:row=Y, cpt:col=X, cpt:units=mm, cpt:missing=-999.\n'.format(field, stamps, len(lats), len(lons)))
+			else:
+				f.write(stamps + '\n')
+			f.write('\t' + '\t'.join('{:g}'.format(lon) for lon in lons) + '\n')
+			for lat in lats:
+				f.write('{:g}\t'.format(lat) + '\t'.join('{:g}'.format(year + lat / 100.0 + lon / 10000.0) for lon in lons) + '\n')
+	return str(path)
+
+@pytest.fixture
+def grid():
+	return write_grid
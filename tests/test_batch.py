@@ -0,0 +1,96 @@
+import datetime as d
+import json, os
+
+import pytest
+
+from pycpt_oo.Batch import Batch
+from pycpt_oo.Downloader import Downloader
+from pycpt_oo.DownloadCache import DownloadCache
+from pycpt_oo.Job import Job
+from pycpt_oo.PYCPT import PYCPT
+
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_dir', 'test.pycpt')
+URL = 'http://iridl.example/SOURCES/.Models/.NMME/.X/.FORECAST/.MONTHLY/.prec/S/%280000%201%20May%202020%29/VALUES/Y/-7.5/12.5/RANGEEDGES/X/-2.5/22.5/RANGEEDGES/data.tsv'
+
+
+def config(tmp_path, name, **changes):
+	"""test.pycpt, saved as tmp_path/name with a CPT.x it can find"""
+	with open(CONFIG) as f:
+		params = json.load(f)
+	os.makedirs(str(tmp_path / 'cpt'), exist_ok=True)
+	open(str(tmp_path / 'cpt' / 'CPT.x'), 'w').close()
+	params.update(dict(workdir=str(tmp_path), cptdir=str(tmp_path / 'cpt'), verbose=False), **changes)
+	os.makedirs(os.path.dirname(str(tmp_path / name)), exist_ok=True)
+	with open(str(tmp_path / name), 'w') as f:
+		json.dump(params, f)
+	return str(tmp_path / name)
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+	cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=10 ** 9, compress='gzip', verbose=False)
+	monkeypatch.setattr(DownloadCache, 'instance', cache)
+	return cache
+
+class IRIDL:
+	"""stands in for Downloader.shared() - answers once 'published' is set, like a forecast the IRIDL hasnt got yet"""
+	def __init__(self, grid):
+		self.grid, self.published, self.asked = grid, False, []
+
+	def download(self, url, path, check=None, validators=None):
+		self.asked.append(url)
+		if not self.published:
+			self.published = True #there the next time we ask
+			raise IOError('404 - not there yet')
+		self.grid(path, [10, 5], [0, 5], [2020])
+		return {'status': 200}
+
+
+def test_bound_groups_overlapping_boxes():
+	west, east, far = (0, 10, 0, 10), (5, 15, 5, 15), (50, 60, 50, 60)
+	groups = Batch.bound([west, east, far, west])
+	assert sorted(groups) == [((0, 15, 0, 15), [west, east]), (far, [far])] #225 <= 2 * (100 + 100), the far one would be mostly ocean
+	assert len(Batch.bound([west, east], growth=1.0)) == 2 #225 > 1 * 200
+
+def test_unique_names(tmp_path):
+	batch = Batch([config(tmp_path, 'a/run.pycpt'), config(tmp_path, 'b/run.pycpt'), config(tmp_path, 'other.pycpt')], root=str(tmp_path / 'root'), verbose=False)
+	assert batch.names == ['run', 'run_2', 'other']
+
+def test_run_one_reports_the_first_failure(tmp_path, monkeypatch):
+	def execute(py, workers=1, on_done=None):
+		ok, early, late = Job('fetch:a', None, stage='fetch'), Job('cpt:a', None, stage='cpt'), Job('plot:a', None, stage='plot', fail_msg='Failed to plot')
+		for job, end, error in [(ok, 1.0, None), (late, 3.0, IOError('no map')), (early, 2.0, ValueError('CPT exited 1'))]:
+			job.end, job.error, job.status = end, error, 'done' if error is None else 'failed'
+			on_done(job)
+		return [late, early]
+	monkeypatch.setattr(PYCPT, 'execute', execute)
+	os.makedirs(str(tmp_path / 'root')) #run() makes it before any run_one
+	batch = Batch([config(tmp_path, 'run.pycpt'), config(tmp_path, 'broken.pycpt', models=None)], root=str(tmp_path / 'root'), verbose=False)
+	result = batch.run_one(batch.names[0], batch.configs[0])
+	assert result['status'] == 'failed' and result['directory'] == str(tmp_path / 'root' / 'run')
+	assert (result['stage'], result['error']) == ('cpt', 'ValueError: CPT exited 1') #the one that broke first, not the first in the list
+	assert result['failed'] == ['Failed to plot', 'Failed at cpt:a']
+	assert result['skipped'] == len(batch.load('run', batch.configs[0]).build_jobs()) - 3
+	result = batch.run_one(batch.names[1], batch.configs[1])
+	assert result['status'] == 'failed' and result['stage'] == 'initialize' and result['error'].startswith('TypeError')
+
+def test_expected():
+	history = {Batch.dataset(URL): [9, 7, 12]}
+	assert Batch.dataset(URL) == URL.split('/S/')[0] + '/S/'
+	assert Batch.expected(history, URL, 'Dec', 2021) == d.datetime(2021, 12, 7) #a day before the earliest - the 8th
+	assert Batch.expected(history, URL, 'Feb', 2024) == d.datetime(2024, 2, 7)
+	assert Batch.expected({}, URL, 'Dec', 2021) is None
+
+def test_warm_remembers_when_forecasts_showed_up(tmp_path, cache, grid, monkeypatch):
+	iridl = IRIDL(grid)
+	monkeypatch.setattr(Downloader, 'shared', classmethod(lambda cls: iridl))
+	batch = Batch([config(tmp_path, 'run.pycpt')], root=str(tmp_path / 'root'), verbose=False)
+	monkeypatch.setattr(batch, 'upcoming', lambda monf, fyr: {URL: ('May', 2020)})
+	assert Batch.available(cache) == {}
+	assert batch.warm(poll=0) == []
+	assert len(iridl.asked) == 2 and os.path.isfile(cache.entry(URL))
+	days = (d.date.today() - d.date(2020, 5, 1)).days
+	assert Batch.available(cache) == {Batch.dataset(URL): [days]} #read back from available.json
+	assert Batch.expected(Batch.available(cache), URL, 'May', 2020).date() == d.date.today() - d.timedelta(days=1)
+	assert batch.warm(poll=0) == [] and len(iridl.asked) == 2 #cached, and nothing missed - the history stays as it was
+	assert Batch.available(cache) == {Batch.dataset(URL): [days]}
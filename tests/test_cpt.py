@@ -0,0 +1,12 @@
+import os
+
+from pycpt_oo.CPT import CPT
+
+
+def test_cpt_path_is_absolute(tmp_path, monkeypatch):
+	os.makedirs(str(tmp_path / 'cpt'))
+	open(str(tmp_path / 'cpt' / 'CPT.x'), 'w').close()
+	monkeypatch.chdir(str(tmp_path))
+	cpt = CPT('cpt', 3, 'CCA', ['Pearson'], verbose=False) #relative to where we were started
+	monkeypatch.chdir('/')
+	assert os.path.isabs(cpt.cpt) and os.path.isfile(cpt.cpt) #still found from wherever CPT.x runs
@@ -0,0 +1,43 @@
+import os, stat
+from concurrent.futures import ThreadPoolExecutor
+
+from pycpt_oo.CPTPool import CPTPool
+
+
+SCRIPT = '''#!/bin/sh
+read code
+touch running/$$
+ls running | wc -l
+sleep 0.3
+rm running/$$
+exit $code
+'''
+
+
+def fake_cpt(tmp_path, codes):
+	"""a CPT.x that reads an exit code from its params, and says how many copies of itself were running when it started"""
+	exe = tmp_path / 'CPT.x'
+	exe.write_text(SCRIPT)
+	exe.chmod(exe.stat().st_mode | stat.S_IEXEC)
+	os.makedirs(str(tmp_path / 'running'))
+	jobs = []
+	for i, code in enumerate(codes):
+		(tmp_path / 'params{}'.format(i)).write_text('{}\n'.format(code))
+		jobs.append({'exe': str(exe), 'params': str(tmp_path / 'params{}'.format(i)), 'log': str(tmp_path / 'log{}'.format(i)), 'cwd': str(tmp_path), 'name': 'job{}'.format(i)})
+	return jobs
+
+
+def test_run_one(tmp_path):
+	pool = CPTPool(workers=2, verbose=False)
+	jobs = fake_cpt(tmp_path, [0, 3, 0, 0, 0, 0])
+	with ThreadPoolExecutor(max_workers=len(jobs)) as threads: #more callers than slots - the pool has to make the rest wait
+		results = list(threads.map(lambda job: pool.run_one(job['exe'], job['params'], job['log'], cwd=job['cwd'], name=job['name']), jobs))
+	assert [r['name'] for r in results] == ['job{}'.format(i) for i in range(6)]
+	assert [r['returncode'] for r in results] == [0, 3, 0, 0, 0, 0]
+	assert all(type(r['maxrss']) == int and r['maxrss'] > 0 for r in results) #peak RSS of each one, in kB
+	running = [int((tmp_path / 'log{}'.format(i)).read_text()) for i in range(len(jobs))]
+	assert max(running) == 2 #never more than workers at once
+	assert len(pool.results) == 6
+	assert [r['returncode'] for r in pool.map(jobs[:2])] == [0, 3] #same through map, in order
+	result = pool.run_one(jobs[1]['exe'], jobs[1]['params'], jobs[1]['log'], cwd=str(tmp_path))
+	assert result['returncode'] == 3 and result['name'] == jobs[1]['params']
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from pycpt_oo.DownloadCache import DownloadCache
+from pycpt_oo.FileManager import FileManager
+
+
+LATS, LONS = [10, 5, 0, -5], [0, 5, 10, 15, 20]
+BOX = 'http://iridl.example/SOURCES/.prec/Y/-7.5/12.5/RANGEEDGES/X/-2.5/22.5/RANGEEDGES/data.tsv'
+YEARS = 'http://iridl.example/SOURCES/.prec/S/%280000%201%20May%201982-1984%29/VALUES/data.tsv'
+
+
+def server(grid, asked):
+	"""a download callable for DownloadCache.fetch - writes the file the query would get, and notes what was asked for"""
+	def download(path, url=None, validators=None):
+		asked.append(url)
+		template, box = DownloadCache.box(url or BOX)
+		template, years = DownloadCache.years(url or YEARS)
+		lats = LATS if box is None else [lat for lat in LATS if box[0] < lat < box[1]]
+		lons = LONS if box is None else [lon for lon in LONS if box[2] < lon < box[3]]
+		grid(path, lats, lons, range(1982, 1985) if years is None else range(years[0], years[1] + 1))
+		return {'status': 200}
+	return download
+
+def nothing(path, url=None, validators=None):
+	raise AssertionError('should not have downloaded {}'.format(url))
+
+def text(path):
+	with FileManager.open_tsv(path) as f:
+		return f.read()
+
+@pytest.fixture
+def cache(tmp_path):
+	return DownloadCache(str(tmp_path / 'cache'), max_bytes=10 ** 9, compress='gzip', verbose=False)
+
+
+def test_downloads_are_stored_compressed(cache, grid, tmp_path):
+	asked = []
+	assert cache.fetch(BOX, tmp_path / 'a.tsv', server(grid, asked)) == 'downloaded'
+	assert DownloadCache.codec(cache.entry(BOX)) == 'gzip'
+	assert os.path.samefile(str(tmp_path / 'a.tsv'), cache.entry(BOX)) #linked, not copied
+	assert text(tmp_path / 'a.tsv') == text(grid(tmp_path / 'plain.tsv', LATS, LONS, range(1982, 1985)))
+	assert cache.fetch(BOX, tmp_path / 'b.tsv', nothing) == 'cached'
+	assert cache.fetch(BOX, tmp_path / 'b.tsv', server(grid, asked), refresh=True) == 'downloaded'
+	assert len(asked) == 2
+
+def test_pack_round_trips(grid, tmp_path):
+	plain = grid(tmp_path / 'plain.tsv', LATS, LONS, range(1982, 1985))
+	DownloadCache.pack(plain, str(tmp_path / 'a.gz'))
+	DownloadCache.pack(plain, str(tmp_path / 'b.gz'))
+	with open(str(tmp_path / 'a.gz'), 'rb') as a, open(str(tmp_path / 'b.gz'), 'rb') as b:
+		assert a.read() == b.read() #same data, same bytes - ledger hashes dont change
+	assert DownloadCache.same(plain, str(tmp_path / 'a.gz'))
+	DownloadCache.unpack(str(tmp_path / 'a.gz'), str(tmp_path / 'back.tsv'))
+	with open(plain, 'rb') as a, open(str(tmp_path / 'back.tsv'), 'rb') as b:
+		assert a.read() == b.read()
+	assert DownloadCache.codec(plain) is None
+
+def test_uncompressed_cache(grid, tmp_path):
+	cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=10 ** 9, compress='none', verbose=False)
+	cache.fetch(BOX, None, server(grid, []))
+	assert DownloadCache.codec(cache.entry(BOX)) is None
+
+def test_smaller_box_is_cut_from_the_cache(cache, grid, tmp_path):
+	cache.fetch(BOX, None, server(grid, []))
+	small = DownloadCache.with_box(BOX, (-2.5, 7.5, 2.5, 12.5))
+	assert cache.covering(small) == [(BOX, cache.entry(BOX))]
+	assert cache.fetch(small, tmp_path / 'small.tsv', nothing, cut=FileManager.subset_tsv) == 'cut'
+	assert DownloadCache.codec(cache.entry(small)) == 'gzip'
+	assert text(tmp_path / 'small.tsv') == text(grid(tmp_path / 'expected.tsv', [5, 0], [5, 10], range(1982, 1985)))
+	assert DownloadCache.validators(cache.entry(small)) is None #never sent by the server - nothing to revalidate with
+
+def test_bigger_or_mixed_boxes_are_downloaded(cache, grid, tmp_path):
+	cache.fetch(BOX, None, server(grid, []))
+	asked = []
+	bigger = DownloadCache.with_box(BOX, (-12.5, 12.5, -2.5, 22.5))
+	assert cache.fetch(bigger, None, server(grid, asked), cut=FileManager.subset_tsv) == 'downloaded'
+	averaged = BOX.replace('data.tsv', '%5BX/Y%5Daverage/data.tsv') #cells mixed together after the box
+	assert DownloadCache.box(averaged) == (None, None)
+	assert cache.fetch(averaged, None, server(grid, asked), cut=FileManager.subset_tsv) == 'downloaded'
+	assert len(asked) == 2
+
+def test_more_years_only_downloads_the_new_ones(cache, grid, tmp_path):
+	cache.fetch(YEARS, None, server(grid, []))
+	longer, asked = DownloadCache.with_years(YEARS, 1982, 1986), []
+	assert cache.prefixes(longer) == [(YEARS, cache.entry(YEARS), 1984)]
+	assert cache.fetch(longer, tmp_path / 'longer.tsv', server(grid, asked), splice=FileManager.splice_tsv) == 'spliced'
+	assert asked == [DownloadCache.with_years(YEARS, 1985, 1986)]
+	assert FileManager.check_tsv(str(tmp_path / 'longer.tsv')) == 5
+	with FileManager.open_tsv(str(tmp_path / 'longer.tsv')) as f:
+		assert [line.split('cpt:T=')[1][:4] for line in f if 'cpt:T=' in line] == ['1982', '1983', '1984', '1985', '1986']
+
+def test_revalidate(cache, grid, tmp_path):
+	cache.fetch(BOX, None, server(grid, []))
+	assert cache.fetch(BOX, None, server(grid, []), revalidate=True) == 'unchanged' #same bytes, though the server couldnt say
+	def changed(path, url=None, validators=None):
+		grid(path, LATS, LONS, range(1990, 1993))
+		return {'status': 200, 'etag': '"v2"'}
+	assert cache.fetch(BOX, None, changed, revalidate=True) == 'changed'
+	assert DownloadCache.validators(cache.entry(BOX)) == {'etag': '"v2"', 'last_modified': None}
+	def not_modified(path, url=None, validators=None):
+		assert validators['etag'] == '"v2"'
+		return {'status': 304}
+	assert cache.fetch(BOX, None, not_modified, revalidate=True) == 'unchanged'
@@ -0,0 +1,176 @@
+import gzip, os, shutil, socket, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from pycpt_oo.Downloader import Downloader, HTTPStatusError
+
+
+class Handler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1' #keep-alive, like the IRIDL
+
+	def do_GET(self):
+		self.server.requests.append((self.path, dict(self.headers)))
+		answers = self.server.routes.get(self.path, [{'status': 404, 'body': b'no such query'}])
+		answer = answers.pop(0) if len(answers) > 1 else answers[0] #the last answer repeats
+		time.sleep(answer.get('delay', 0))
+		status, body, headers = answer.get('status', 200), answer.get('body', b''), {}
+		if answer.get('ranges') and 'Range' in self.headers:
+			start = int(self.headers['Range'].split('=')[1].split('-')[0])
+			status, headers['Content-Range'] = 206, 'bytes {}-{}/{}'.format(start, len(body) - 1, len(body))
+			body = body[start:]
+		try:
+			self.send_response(status)
+			for name, value in headers.items():
+				self.send_header(name, value)
+			self.send_header('Content-Length', str(len(body)))
+			self.end_headers()
+			if answer.get('truncate') is not None: #hangs up in the middle of the body
+				self.wfile.write(body[:answer['truncate']])
+				self.close_connection = True
+				return
+			self.wfile.write(body)
+		except (BrokenPipeError, ConnectionResetError): #a hedge that lost
+			self.close_connection = True
+
+	def log_message(self, *args):
+		pass
+
+
+def start():
+	httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+	httpd.daemon_threads = True
+	httpd.routes, httpd.requests = {}, []
+	httpd.url = 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+	threading.Thread(target=httpd.serve_forever, daemon=True).start()
+	return httpd
+
+@pytest.fixture
+def server():
+	httpd = start()
+	yield httpd
+	httpd.shutdown()
+	httpd.server_close()
+
+@pytest.fixture
+def mirror():
+	httpd = start()
+	yield httpd
+	httpd.shutdown()
+	httpd.server_close()
+
+@pytest.fixture
+def downloader():
+	downloader = Downloader(retries=3, backoff=0, timeout=5, verbose=False)
+	yield downloader
+	downloader.close()
+
+def dead_port():
+	s = socket.socket()
+	s.bind(('127.0.0.1', 0))
+	port = s.getsockname()[1]
+	s.close()
+	return port
+
+def read(path):
+	with open(str(path), 'rb') as f:
+		return f.read()
+
+def only(text):
+	def check(path):
+		if read(path) != text:
+			raise ValueError('not the file we asked for')
+	return check
+
+
+def test_server_errors_are_retried(server, downloader, tmp_path):
+	server.routes['/q'] = [{'status': 503, 'body': b'busy'}, {'status': 503, 'body': b'busy'}, {'body': b'data'}]
+	result = downloader.download(server.url + '/q', tmp_path / 'q.tsv')
+	assert read(tmp_path / 'q.tsv') == b'data'
+	assert result['status'] == 200 and result['attempts'] == 3 and result['bytes'] == 4
+	assert not os.path.exists(str(tmp_path / 'q.tsv.download'))
+
+def test_cut_off_download_resumes_with_range(server, downloader, tmp_path):
+	body = bytes(range(256)) * 64
+	server.routes['/q'] = [{'body': body, 'truncate': 5000, 'ranges': True}, {'body': body, 'ranges': True}]
+	result = downloader.download(server.url + '/q', tmp_path / 'q.tsv')
+	assert read(tmp_path / 'q.tsv') == body
+	assert result['status'] == 206 and result['attempts'] == 2
+	assert 'Range' not in server.requests[0][1]
+	assert server.requests[1][1]['Range'] == 'bytes=5000-'
+
+def test_rejected_file_is_downloaded_again(server, downloader, tmp_path):
+	server.routes['/q'] = [{'body': b'an error page, longer than the file'}, {'body': b'good'}]
+	result = downloader.download(server.url + '/q', tmp_path / 'q.tsv', check=only(b'good'))
+	assert read(tmp_path / 'q.tsv') == b'good' #not the tail of the error page
+	assert result['attempts'] == 2
+	assert 'Range' not in server.requests[1][1]
+
+def test_check_can_replace_the_download(server, downloader, tmp_path):
+	server.routes['/q.gz'] = [{'body': gzip.compress(b'bad')}, {'body': gzip.compress(b'good')}]
+	def check(path): #what IRIDL.download does - gunzip under a new inode, then look at it
+		with gzip.open(path, 'rb') as src, open(path + '.gunzip', 'wb') as dest:
+			shutil.copyfileobj(src, dest)
+		os.replace(path + '.gunzip', path)
+		only(b'good')(path)
+	result = downloader.download(server.url + '/q.gz', tmp_path / 'q.tsv', check=check)
+	assert read(tmp_path / 'q.tsv') == b'good'
+	assert result['attempts'] == 2
+
+def test_client_errors_are_not_retried(server, downloader, tmp_path):
+	with pytest.raises(HTTPStatusError) as error:
+		downloader.download(server.url + '/missing', tmp_path / 'q.tsv')
+	assert error.value.status == 404
+	assert len(server.requests) == 1
+	assert os.listdir(str(tmp_path)) == []
+
+def test_out_of_retries_raises(server, tmp_path):
+	server.routes['/q'] = [{'status': 500, 'body': b'broken'}]
+	downloader = Downloader(retries=1, backoff=0, timeout=5, verbose=False)
+	try:
+		with pytest.raises(HTTPStatusError):
+			downloader.download(server.url + '/q', tmp_path / 'q.tsv')
+	finally:
+		downloader.close()
+	assert len(server.requests) == 2
+	assert os.listdir(str(tmp_path)) == []
+
+def test_dead_server_fails_over_to_its_mirror(mirror, tmp_path):
+	mirror.routes['/q'] = [{'body': b'data'}]
+	host = 'http://localhost:{}'.format(dead_port())
+	downloader = Downloader(retries=2, backoff=0, timeout=5, mirrors={'localhost': [mirror.url]}, verbose=False)
+	try:
+		result = downloader.download(host + '/q', tmp_path / 'q.tsv')
+		health = downloader.health()
+	finally:
+		downloader.close()
+	assert read(tmp_path / 'q.tsv') == b'data'
+	assert result['attempts'] == 1 #the probe found it down, so the first try already went to the mirror
+	assert health[host]['cooldown'] > 0
+	assert health[mirror.url]['failures'] == 0
+
+def test_busy_server_fails_over_to_its_mirror(server, mirror, tmp_path):
+	server.routes['/q'] = [{'status': 503, 'body': b'busy'}]
+	mirror.routes['/q'] = [{'body': b'data'}]
+	host = server.url.replace('127.0.0.1', 'localhost')
+	downloader = Downloader(retries=2, backoff=0, timeout=5, mirrors={'localhost': [mirror.url]}, verbose=False)
+	try:
+		result = downloader.download(host + '/q', tmp_path / 'q.tsv')
+	finally:
+		downloader.close()
+	assert read(tmp_path / 'q.tsv') == b'data'
+	assert result['attempts'] <= 2
+	assert len(server.requests) <= 1
+
+def test_slow_server_is_hedged(server, mirror, tmp_path):
+	server.routes['/q'] = [{'body': b'slow', 'delay': 2.0}]
+	mirror.routes['/q'] = [{'body': b'fast'}]
+	host = server.url.replace('127.0.0.1', 'localhost')
+	downloader = Downloader(retries=0, backoff=0, timeout=5, mirrors={'localhost': [mirror.url]}, hedge=0.2, verbose=False)
+	try:
+		result = downloader.download(host + '/q', tmp_path / 'q.tsv')
+	finally:
+		downloader.close()
+	assert read(tmp_path / 'q.tsv') == b'fast'
+	assert result['walltime'] < 1.5
+	assert os.listdir(str(tmp_path)) == ['q.tsv'] #the hedge's own file is gone
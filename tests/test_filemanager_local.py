@@ -0,0 +1,88 @@
+import datetime as d
+
+import numpy as np
+import pytest
+
+from pycpt_oo.FileManager import FileManager
+
+
+@pytest.fixture
+def fm(tmp_path):
+	return FileManager(str(tmp_path), 'work', False, verbose=False)
+
+def daily(fm, name, days, cells):
+	"""writes a one-row daily observations file - cells[x](i) is cell x's rain on day i of the record"""
+	with open(fm.path('input', name), 'w') as f:
+		f.write('xmlns:cpt=http://iri.columbia.edu/CPT/v10/\n')
+		f.write('cpt:nfields=1\n')
+		for i, day in enumerate(days):
+			if i == 0:
+				f.write('cpt:field=prcp, cpt:T={}, cpt:nrow=1, cpt:ncol={}, cpt:row=Y, cpt:col=X, cpt:units=mm, cpt:missing=-999.\n'.format(day.isoformat(), len(cells)))
+			else:
+				f.write('cpt:T={}\n'.format(day.isoformat()))
+			f.write('\t' + '\t'.join('{:g}'.format(80 + x) for x in range(len(cells))) + '\n')
+			f.write('10\t' + '\t'.join('{:g}'.format(cell(i)) for cell in cells) + '\n')
+	return 'input/' + name
+
+
+def test_wet_days_percentile_flags_every_tied_day(fm):
+	days = [d.date(1982, 12, 1) + d.timedelta(days=i) for i in range((d.date(1984, 3, 1) - d.date(1982, 12, 1)).days)] #two whole Dec-Feb seasons, and the months between
+	dry = lambda i: 4.0 if i % 5 == 0 else 0.0 #80% of days dry - the 50th percentile is 0 mm
+	steps = lambda i: i % 3 + 1.0 #1, 2, 3 mm in turn - the 50th percentile is 2 mm
+	src = daily(fm, 'daily.tsv', days, [dry, steps])
+	seasons = [[i for i, day in enumerate(days) if day.month in [12, 1, 2] and (day.year if day.month == 12 else day.year - 1) == year] for year in [1982, 1983]]
+	fm.wet_days(src, 'input/median.tsv', 'Dec-Feb', 0.5, pctle=True)
+	lats, lons, data, times = fm.read_tsv('input/median.tsv')
+	assert times == ['1982-12/1983-02', '1983-12/1984-02']
+	assert data[:, 0, 0].tolist() == [sum(1 for i in season if i % 5 != 0) for season in seasons] #every 0 mm day, not half of them
+	assert data[:, 0, 1].tolist() == [sum(1 for i in season if i % 3 != 2) for season in seasons]
+	fm.wet_days(src, 'input/high.tsv', 'Dec-Feb', 0.9, pctle=True) #the 3 mm days are the top third - all of them tie at the 90th percentile
+	assert fm.read_tsv('input/high.tsv')[2][:, 0, 1].tolist() == [len(season) for season in seasons]
+	fm.wet_days(src, 'input/mm.tsv', 'Dec-Feb', 3)
+	assert fm.read_tsv('input/mm.tsv')[2][:, 0, 0].tolist() == [sum(1 for i in season if i % 5 == 0) for season in seasons]
+	assert [len(season) for season in seasons] == [90, 91] #1984 is a leap year
+
+def test_wet_days_percentile_hand_counted(fm):
+	days = [d.date(1982, 6, 1) + d.timedelta(days=i) for i in range(10)]
+	rain = [0, 0, 0, 0, 0, 0, 0, 1, 2, 5] #0.3 * 9 = 2.7 - among the dry days, so the 30th percentile is 0 mm
+	src = daily(fm, 'daily.tsv', days, [lambda i: rain[i]])
+	fm.wet_days(src, 'input/p30.tsv', 'Jun', 0.3, pctle=True)
+	assert fm.read_tsv('input/p30.tsv')[2][:, 0, 0].tolist() == [7]
+	fm.wet_days(src, 'input/p80.tsv', 'Jun', 0.8, pctle=True) #0.8 * 9 = 7.2 - between the 1 and 2 mm days, so 1.2 mm
+	assert fm.read_tsv('input/p80.tsv')[2][:, 0, 0].tolist() == [8]
+
+def leads(fm, name, starts, cells):
+	"""writes a one-row file of monthly model leads from November starts - cells[x](s, lead) is cell x's value, None where its missing"""
+	with open(fm.path('input', name), 'w') as f:
+		f.write('xmlns:cpt=http://iri.columbia.edu/CPT/v10/\n')
+		f.write('cpt:nfields=1\n')
+		for s, year in enumerate(starts):
+			for l, lead in enumerate([0.5, 1.5, 2.5, 3.5, 4.5]):
+				target = '{}-{:02d}'.format(year + (10 + l) // 12, (10 + l) % 12 + 1) #1982-11 at lead 0.5, 1983-01 at 2.5
+				stamps = 'cpt:L={:g} months, cpt:S={}-11-01T00:00, cpt:T={}'.format(lead, year, target)
+				if s == 0 and l == 0:
+					f.write('cpt:field=prec, {}, cpt:nrow=1, cpt:ncol={}, cpt:row=Y, cpt:col=X, cpt:units=mm/day, cpt:missing=-999.\n'.format(stamps, len(cells)))
+				else:
+					f.write(stamps + '\n')
+				f.write('\t' + '\t'.join('{:g}'.format(80 + x) for x in range(len(cells))) + '\n')
+				f.write('10\t' + '\t'.join('{:g}'.format(-999 if cell(s, lead) is None else cell(s, lead)) for cell in cells) + '\n')
+	return 'input/' + name
+
+
+def test_aggregate_leads_averages_the_season(fm):
+	plain = lambda s, lead: 10.0 * s + lead
+	gap = lambda s, lead: None if lead == 2.5 else 10.0 * s + lead #one month missing - the mean of the others
+	empty = lambda s, lead: None
+	src = leads(fm, 'leads.tsv', [1982, 1983], [plain, gap, empty])
+	fm.aggregate_leads(src, 'input/djf.tsv', 1.5, 3.5, factor=90) #Dec-Feb from November starts
+	lats, lons, data, times = fm.read_tsv('input/djf.tsv')
+	assert times == ['1982-12/1983-02', '1983-12/1984-02'] #across the year boundary
+	assert data[:, 0, 0].tolist() == [2.5 * 90, 12.5 * 90] #mean of leads 1.5, 2.5 and 3.5, times the days in the season
+	assert data[:, 0, 1].tolist() == [2.5 * 90, 12.5 * 90] #(1.5 + 3.5) / 2 - the missing month left out, not counted as 0
+	assert np.isnan(data[:, 0, 2]).all()
+	with open(fm.path('input', 'djf.tsv')) as f:
+		assert 'cpt:L=2.5 months, cpt:S=1982-11-01T00:00, cpt:T=1982-12/1983-02' in f.read()
+	fm.aggregate_leads(src, 'input/jan.tsv', 2.5, 2.5)
+	assert fm.read_tsv('input/jan.tsv')[3] == ['1983-01', '1984-01']
+	with pytest.raises(ValueError):
+		fm.aggregate_leads(src, 'input/late.tsv', 3.5, 5.5) #the file stops at lead 4.5
@@ -0,0 +1,109 @@
+import gzip, shutil
+
+import pytest
+
+from pycpt_oo.FileManager import FileManager
+
+
+LATS, LONS = [10, 5, 0, -5], [0, 5, 10, 15, 20]
+
+
+def read(path):
+	with FileManager.open_tsv(str(path)) as f:
+		return f.read()
+
+
+def test_check_tsv(grid, tmp_path):
+	assert FileManager.check_tsv(grid(tmp_path / 'a.tsv', LATS, LONS, range(1982, 1986))) == 4
+	with open(str(tmp_path / 'a.tsv')) as f:
+		lines = f.readlines()
+	for name, text in [('error.tsv', '<html>Error</html>\n'), ('short.tsv', ''.join(lines[:-1])), ('wide.tsv', ''.join(lines[:-1] + [lines[-1].rstrip('\n') + '\t1\n']))]:
+		with open(str(tmp_path / name), 'w') as f:
+			f.write(text)
+		with pytest.raises(ValueError):
+			FileManager.check_tsv(str(tmp_path / name))
+
+def test_subset_keeps_the_cells_overlapping_the_box(grid, tmp_path):
+	src = grid(tmp_path / 'big.tsv', LATS, LONS, range(1982, 1985))
+	assert FileManager.subset_tsv(src, str(tmp_path / 'small.tsv'), (-1, 6, 4, 9)) == 4 #touches the cells at 5 and 0, 5 and 10
+	assert read(tmp_path / 'small.tsv') == read(grid(tmp_path / 'expected.tsv', [5, 0], [5, 10], range(1982, 1985)))
+	with pytest.raises(ValueError):
+		FileManager.subset_tsv(src, str(tmp_path / 'none.tsv'), (40, 50, 0, 20))
+
+def test_subset_wraps_longitudes(grid, tmp_path):
+	src = grid(tmp_path / 'big.tsv', LATS, [340, 345, 350, 355], range(1982, 1984))
+	FileManager.subset_tsv(src, str(tmp_path / 'small.tsv'), (-2.5, 7.5, -12.5, -2.5)) #a -180-180 box on a 0-360 grid
+	assert read(tmp_path / 'small.tsv') == read(grid(tmp_path / 'expected.tsv', [5, 0], [350, 355], range(1982, 1984)))
+
+def test_subset_reads_compressed_files(grid, tmp_path):
+	src = grid(tmp_path / 'big.tsv', LATS, LONS, range(1982, 1985))
+	with open(src, 'rb') as f, gzip.open(str(tmp_path / 'big.tsv.gz'), 'wb') as out:
+		shutil.copyfileobj(f, out)
+	FileManager.subset_tsv(str(tmp_path / 'big.tsv.gz'), str(tmp_path / 'small.tsv'), (-1, 6, 4, 9))
+	assert read(tmp_path / 'small.tsv') == read(grid(tmp_path / 'expected.tsv', [5, 0], [5, 10], range(1982, 1985)))
+
+def test_splice_appends_later_years(grid, tmp_path):
+	old = grid(tmp_path / 'old.tsv', LATS, LONS, range(1982, 1985))
+	new = grid(tmp_path / 'new.tsv', LATS, LONS, range(1985, 1987))
+	assert FileManager.splice_tsv(old, new, str(tmp_path / 'all.tsv')) == 2
+	assert FileManager.check_tsv(str(tmp_path / 'all.tsv')) == 5
+	assert read(tmp_path / 'all.tsv').startswith(read(old))
+	assert read(tmp_path / 'all.tsv').endswith(read(new).split('\n', 2)[2]) #without its xmlns / cpt:nfields lines
+
+def test_splice_refuses_what_doesnt_fit(grid, tmp_path):
+	old = grid(tmp_path / 'old.tsv', LATS, LONS, range(1982, 1985))
+	for name, lats, lons, years, field in [('overlap.tsv', LATS, LONS, range(1984, 1986), 'prec'), ('grid.tsv', LATS, [0, 5, 10], range(1985, 1987), 'prec'), ('field.tsv', LATS, LONS, range(1985, 1987), 'temp')]:
+		with pytest.raises(ValueError):
+			FileManager.splice_tsv(old, grid(tmp_path / name, lats, lons, years, field), str(tmp_path / 'all.tsv'))
+
+def test_split_is_what_the_shorter_query_sends(grid, tmp_path):
+	src = grid(tmp_path / 'all.tsv', LATS, LONS, range(1982, 1990))
+	assert FileManager.split_tsv(src, str(tmp_path / 'first.tsv'), (1982, 1984)) == 3
+	assert read(tmp_path / 'first.tsv') == read(grid(tmp_path / 'expected_first.tsv', LATS, LONS, range(1982, 1985)))
+	assert FileManager.split_tsv(src, str(tmp_path / 'later.tsv'), (1986, 1989)) == 4 #its first block gets the whole header
+	assert read(tmp_path / 'later.tsv') == read(grid(tmp_path / 'expected_later.tsv', LATS, LONS, range(1986, 1990)))
+	with pytest.raises(ValueError):
+		FileManager.split_tsv(src, str(tmp_path / 'none.tsv'), (2000, 2010))
+
+def test_stitch_puts_tiles_back_together(grid, tmp_path):
+	full = grid(tmp_path / 'full.tsv', LATS, LONS, range(1982, 1985))
+	tiles = [[grid(tmp_path / 'tile{}{}.tsv'.format(i, j), lats, lons, range(1982, 1985)) for j, lons in enumerate([[0, 5, 10], [10, 15, 20]])] for i, lats in enumerate([[0, -5], [10, 5, 0]])] #south band first, edges shared
+	assert FileManager.stitch_tsv(tiles, str(tmp_path / 'stitched.tsv')) == 3
+	assert read(tmp_path / 'stitched.tsv') == read(full)
+
+def test_stitch_refuses_tiles_that_dont_match(grid, tmp_path):
+	west = grid(tmp_path / 'west.tsv', LATS, [0, 5], range(1982, 1985))
+	for name, lats, years in [('years.tsv', LATS, range(1983, 1986)), ('blocks.tsv', LATS, range(1982, 1984)), ('rows.tsv', [10, 5], range(1982, 1985))]:
+		with pytest.raises(ValueError):
+			FileManager.stitch_tsv([[west, grid(tmp_path / name, lats, [10, 15], years)]], str(tmp_path / 'stitched.tsv'))
+
+def test_shards_stitch_to_the_whole_query(grid, tmp_path, monkeypatch):
+	from pycpt_oo.DownloadCache import DownloadCache
+	from pycpt_oo.IRIDL import IRIDL
+	monkeypatch.setattr(IRIDL, 'shard_degrees', 10.0)
+	monkeypatch.setattr(IRIDL, 'shard_years', 4)
+	url = 'http://iridl.example/SOURCES/.prec/S/%280000%201%20May%201982-1989%29/VALUES/Y/-7.5/12.5/RANGEEDGES/X/-2.5/22.5/RANGEEDGES/data.tsv'
+	shards = IRIDL.shards(url)
+	assert [len(block) for block in shards] == [2, 2] and all(len(band) == 3 for block in shards for band in block) #25 degrees of longitude in 10 degree tiles
+	assert [DownloadCache.years(block[0][0])[1] for block in shards] == [(1982, 1985), (1986, 1989)]
+	assert [DownloadCache.box(band[0])[1][:2] for band in shards[0]] == [(-7.5, 2.5), (2.5, 12.5)] #south to north
+	full = grid(tmp_path / 'full.tsv', LATS, LONS, range(1982, 1990))
+	whole = None
+	for b, block in enumerate(shards): #what IRIDL.sharded does with the downloads
+		first, last = DownloadCache.years(block[0][0])[1]
+		FileManager.split_tsv(full, str(tmp_path / 'years{}.tsv'.format(b)), (first, last))
+		tiles = [[str(tmp_path / 'shard{}{}{}.tsv'.format(b, i, j)) for j in range(len(band))] for i, band in enumerate(block)]
+		for i, band in enumerate(block):
+			for j, shard in enumerate(band):
+				FileManager.subset_tsv(str(tmp_path / 'years{}.tsv'.format(b)), tiles[i][j], DownloadCache.box(shard)[1]) #the IRIDL's answer for the shard
+		FileManager.stitch_tsv(tiles, str(tmp_path / 'block{}.tsv'.format(b)))
+		if whole is None:
+			whole = str(tmp_path / 'block{}.tsv'.format(b))
+		else:
+			FileManager.splice_tsv(whole, str(tmp_path / 'block{}.tsv'.format(b)), str(tmp_path / 'whole.tsv'))
+			whole = str(tmp_path / 'whole.tsv')
+	assert FileManager.check_tsv(whole) == 8
+	assert read(tmp_path / 'block0.tsv') == read(grid(tmp_path / 'expected.tsv', LATS, LONS, range(1982, 1986)))
+	FileManager.split_tsv(whole, str(tmp_path / 'got.tsv'), (1986, 1989))
+	FileManager.split_tsv(full, str(tmp_path / 'want.tsv'), (1986, 1989))
+	assert read(tmp_path / 'got.tsv') == read(tmp_path / 'want.tsv')
@@ -0,0 +1,85 @@
+import os, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from pycpt_oo.Downloader import Downloader
+from pycpt_oo.DownloadCache import DownloadCache
+from pycpt_oo.PYCPT import PYCPT
+
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_dir', 'test.pycpt')
+
+
+class Handler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+		self.server.requests.append(dict(self.headers))
+		if self.headers.get('If-None-Match') == '"v1"':
+			self.send_response(304)
+			self.send_header('ETag', '"v1"')
+			self.send_header('Content-Length', '0')
+			self.end_headers()
+			return
+		self.send_response(200)
+		self.send_header('ETag', '"v1"')
+		self.send_header('Content-Length', str(len(self.server.body)))
+		self.end_headers()
+		self.wfile.write(self.server.body)
+
+	def log_message(self, *args):
+		pass
+
+
+@pytest.fixture
+def server(grid, tmp_path):
+	httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+	httpd.daemon_threads, httpd.requests = True, []
+	with open(grid(tmp_path / 'served.tsv', [10, 5], [80, 85], range(1982, 1985)), 'rb') as f:
+		httpd.body = f.read()
+	httpd.url = 'http://127.0.0.1:{}/q.tsv'.format(httpd.server_address[1])
+	threading.Thread(target=httpd.serve_forever, daemon=True).start()
+	yield httpd
+	httpd.shutdown()
+	httpd.server_close()
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+	"""the process-wide Downloader and DownloadCache every IRIDL uses, pointed at this test"""
+	downloader = Downloader(retries=0, backoff=0, timeout=5, verbose=False)
+	monkeypatch.setattr(Downloader, 'instance', downloader)
+	monkeypatch.setattr(DownloadCache, 'instance', DownloadCache(str(tmp_path / 'cache'), max_bytes=10 ** 9, compress='gzip', verbose=False))
+	yield
+	downloader.close()
+
+def pycpt(tmp_path, force_download):
+	os.makedirs(str(tmp_path / 'cpt'), exist_ok=True)
+	open(str(tmp_path / 'cpt' / 'CPT.x'), 'w').close()
+	py = PYCPT.from_file(CONFIG)
+	py.workdir, py.cptdir, py.force_download = str(tmp_path), str(tmp_path / 'cpt'), force_download
+	return py
+
+def run(py, url):
+	"""one run's worth of downloads - both target seasons ask for the same query"""
+	py.initialize()
+	for iridl in py.IRIDLs:
+		iridl.download(url, py.filemanager.path('input', 'q.tsv'), 'Hindcasts')
+	py.reset()
+
+
+def test_force_download_reaches_the_server_every_run(server, shared, tmp_path):
+	py = pycpt(tmp_path, True)
+	run(py, server.url)
+	assert len(server.requests) == 1 #once per run, however many seasons share it
+	run(py, server.url)
+	assert len(server.requests) == 2
+	assert os.path.isfile(py.filemanager.path('input', 'q.tsv'))
+
+def test_revalidate_asks_the_server_every_run(server, shared, tmp_path):
+	run(pycpt(tmp_path, False), server.url)
+	py = pycpt(tmp_path, 'revalidate')
+	run(py, server.url)
+	run(py, server.url)
+	assert len(server.requests) == 3
+	assert [request.get('If-None-Match') for request in server.requests] == [None, '"v1"', '"v1"']
@@ -0,0 +1,89 @@
+import json, time
+import multiprocessing
+
+from pycpt_oo.Job import Job
+from pycpt_oo.JobQueue import JobQueue
+
+
+def noop():
+	return None
+
+def drain(path, log):
+	"""a worker process - claims and completes jobs until the queue is finished, writing what it ran to log"""
+	queue, me = JobQueue(path, verbose=False), JobQueue.worker_name()
+	ran = []
+	while not queue.finished():
+		name = queue.claim(me)
+		if name is None:
+			time.sleep(0.01)
+			continue
+		time.sleep(0.01)
+		ran.append(name)
+		queue.complete(name, me, None, 0.01)
+	with open(log, 'w') as f:
+		json.dump(ran, f)
+
+def claim_and_die(path):
+	queue = JobQueue(path, verbose=False)
+	queue.claim('dead:1') #never renewed, never completed
+
+
+def test_two_processes_share_the_queue(tmp_path):
+	path = str(tmp_path / 'queue.db')
+	jobs = [Job('fetch:{}'.format(i), noop) for i in range(6)] + [Job('cpt:{}'.format(i), noop, deps=['fetch:{}'.format(i)]) for i in range(6)] + [Job('plot', noop, deps=['cpt:{}'.format(i) for i in range(6)])]
+	JobQueue(path, lease=30, retries=1, verbose=False).publish(jobs, 'run.pycpt')
+	logs = [str(tmp_path / 'worker{}.json'.format(i)) for i in range(2)]
+	workers = [multiprocessing.get_context('spawn').Process(target=drain, args=(path, log)) for log in logs]
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join(60)
+		assert worker.exitcode == 0
+	ran = [name for log in logs for name in json.load(open(log))]
+	assert sorted(ran) == sorted(job.name for job in jobs) #every job exactly once
+	assert set(JobQueue(path, verbose=False).status().values()) == {'done'}
+
+def test_claims_follow_dependencies(tmp_path):
+	queue = JobQueue(str(tmp_path / 'queue.db'), verbose=False)
+	queue.publish([Job('a', noop), Job('b', noop, deps=['a'])])
+	assert queue.claim('w:1') == 'a'
+	assert queue.claim('w:2') is None #b waits on a
+	queue.complete('a', 'w:1')
+	assert queue.claim('w:2') == 'b'
+
+def test_expired_lease_is_handed_out_again(tmp_path):
+	path = str(tmp_path / 'queue.db')
+	JobQueue(path, lease=2, retries=1, verbose=False).publish([Job('a', noop), Job('b', noop, deps=['a'])])
+	dead = multiprocessing.get_context('spawn').Process(target=claim_and_die, args=(path,))
+	dead.start()
+	dead.join(60)
+	queue = JobQueue(path, verbose=False) #lease and retries come from the publisher
+	assert queue.lease == 2 and queue.retries == 1
+	assert queue.claim('w:2') is None #still leased
+	time.sleep(2.2)
+	assert queue.claim('w:2') == 'a'
+	queue.complete('a', 'dead:1', 'RuntimeError: late') #the dead worker's late report is ignored
+	assert queue.status()['a'] == 'running'
+	queue.complete('a', 'w:2')
+	assert queue.status()['a'] == 'done'
+
+def test_job_fails_after_retries_and_skips_dependents(tmp_path):
+	path = str(tmp_path / 'queue.db')
+	JobQueue(path, lease=0.1, retries=0, verbose=False).publish([Job('a', noop), Job('b', noop, deps=['a'])])
+	queue = JobQueue(path, verbose=False)
+	assert queue.claim('w:1') == 'a'
+	time.sleep(0.2)
+	assert queue.finished()
+	assert queue.status() == {'a': 'failed', 'b': 'skipped'}
+	assert queue.failed() == ['a']
+
+def test_renew_and_complete_only_for_the_lease_holder(tmp_path):
+	queue = JobQueue(str(tmp_path / 'queue.db'), lease=30, verbose=False)
+	queue.publish([Job('a', noop)])
+	assert queue.claim('w:1') == 'a'
+	assert queue.renew('a', 'w:1')
+	assert not queue.renew('a', 'w:2')
+	queue.complete('a', 'w:2', 'not mine')
+	assert queue.status()['a'] == 'running'
+	queue.complete('a', 'w:1', 'RuntimeError: broken')
+	assert queue.failed() == ['a']
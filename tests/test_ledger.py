@@ -0,0 +1,77 @@
+import os
+
+from pycpt_oo.Job import Job
+from pycpt_oo.Ledger import Ledger
+
+
+def write(root, name, text):
+	with open(os.path.join(str(root), name), 'w') as f:
+		f.write(text)
+	return name
+
+def finish(ledger, job, check=None):
+	"""runs a job the way the scheduler does - check first, then record it"""
+	job.check = ledger.fresh if check is None else check
+	job()
+	ledger.record(job)
+	return job
+
+def graph(root, params='a'):
+	fetch = Job('fetch', write, (root, 'input.tsv', 'data'), outputs=lambda r: [r], params={'query': params})
+	cpt = Job('cpt', write, (root, 'output.txt', 'result'), deps=['fetch'], outputs=lambda r: [r], params={'modes': 3})
+	return fetch, cpt
+
+
+def test_unchanged_jobs_are_fresh(tmp_path):
+	ledger = Ledger(tmp_path / 'ledger.jsonl', tmp_path, verbose=False)
+	for job in graph(tmp_path):
+		finish(ledger, job)
+		assert not job.cached
+	again = Ledger(tmp_path / 'ledger.jsonl', tmp_path, verbose=False) #a later run reads the file back
+	for job in graph(tmp_path):
+		finish(again, job)
+		assert job.cached
+
+def test_changed_params_or_inputs_rerun_downstream(tmp_path):
+	ledger = Ledger(tmp_path / 'ledger.jsonl', tmp_path, verbose=False)
+	for job in graph(tmp_path):
+		finish(ledger, job)
+	for job in graph(tmp_path, params='b'): #a new query - it and everything after it runs again
+		finish(ledger, job)
+		assert not job.cached
+	fetch, cpt = graph(tmp_path, params='b')
+	finish(ledger, fetch)
+	assert fetch.cached
+	write(tmp_path, 'input.tsv', 'other data') #same settings, but the file it made changed underneath
+	assert not ledger.fresh(cpt)
+
+def test_missing_outputs_or_no_params_rerun(tmp_path):
+	ledger = Ledger(tmp_path / 'ledger.jsonl', tmp_path, verbose=False)
+	fetch, cpt = graph(tmp_path)
+	finish(ledger, fetch)
+	os.remove(str(tmp_path / 'input.tsv'))
+	assert not ledger.fresh(graph(tmp_path)[0])
+	always = Job('plot', write, (tmp_path, 'plot.png', 'x'), outputs=lambda r: [r])
+	finish(ledger, always)
+	assert not ledger.fresh(Job('plot', write, (tmp_path, 'plot.png', 'x'), outputs=lambda r: [r]))
+
+def test_job_that_made_nothing_is_never_fresh(tmp_path):
+	ledger = Ledger(tmp_path / 'ledger.jsonl', tmp_path, verbose=False)
+	empty = lambda: Job('cpt', lambda: None, outputs=lambda r: [], params={'modes': 3})
+	finish(ledger, empty())
+	assert not ledger.fresh(empty())
+	quiet = lambda: Job('script', lambda: None, params={'modes': 3}) #never said it makes anything
+	finish(ledger, quiet())
+	assert ledger.fresh(quiet())
+
+def test_revalidate_always_runs_but_keys_like_fresh(tmp_path):
+	ledger = Ledger(tmp_path / 'ledger.jsonl', tmp_path, verbose=False)
+	for job in graph(tmp_path):
+		finish(ledger, job)
+	fetch, cpt = graph(tmp_path)
+	assert not ledger.revalidate(fetch)
+	assert fetch.key == ledger.key(graph(tmp_path)[0])
+	finish(ledger, fetch, ledger.revalidate)
+	assert not fetch.cached
+	finish(ledger, cpt)
+	assert cpt.cached #the download came out the same
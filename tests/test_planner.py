@@ -0,0 +1,49 @@
+import types
+
+from pycpt_oo.Job import Job
+from pycpt_oo.Planner import Planner
+
+
+SECONDS = {'fetch:a': 2.0, 'fetch:b': 3.0, 'pltdomain': 3.0, 'cpt:a': 4.0, 'cpt:b': 4.0, 'pltmap:a': 1.0}
+
+
+def graph():
+	"""two downloads, a CPT run after each, a serial plot that needs nothing, and a map that needs both CPT runs - listed like build_jobs lists them, after what they need"""
+	return [Job('fetch:a', None, io=True), Job('fetch:b', None, io=True), Job('pltdomain', None, serial=True),
+			Job('cpt:a', None, deps=['fetch:a']), Job('cpt:b', None, deps=['fetch:b']), Job('pltmap:a', None, deps=['cpt:a', 'cpt:b'])]
+
+def planner(tmp_path):
+	return Planner(types.SimpleNamespace(workdir=str(tmp_path), work='work'), history=str(tmp_path / 'timings.jsonl'), verbose=False)
+
+
+def test_simulate(tmp_path):
+	times = planner(tmp_path).simulate(graph(), SECONDS, workers=2, cpt_workers=1, io_workers=1)
+	assert times == {
+		'fetch:a': (0.0, 2.0),
+		'pltdomain': (0.0, 3.0), #serial - nothing else starts while it runs
+		'fetch:b': (3.0, 6.0), #the io pool was full until 2, and the serial job held it up until 3
+		'cpt:a': (3.0, 7.0), #ready at 2, held up by the serial job
+		'cpt:b': (7.0, 11.0), #ready at 6, but there's only one CPT core
+		'pltmap:a': (11.0, 12.0)}
+	times = planner(tmp_path).simulate([job for job in graph() if not job.serial], SECONDS, workers=2, cpt_workers=2, io_workers=2)
+	assert times['cpt:b'] == (3.0, 7.0) and max(end for start, end in times.values()) == 8.0 #room for everything - the critical path is the makespan
+
+def test_critical_path(tmp_path):
+	plan = planner(tmp_path)
+	assert plan.critical_path(graph(), SECONDS) == ['fetch:b', 'cpt:b', 'pltmap:a'] #3 + 4 + 1, the longest chain of dependencies
+	assert plan.critical_path(graph(), dict(SECONDS, **{'fetch:a': 5.0})) == ['fetch:a', 'cpt:a', 'pltmap:a']
+	assert plan.critical_path([], {}) == []
+
+def test_record(tmp_path):
+	plan = planner(tmp_path)
+	job = Job('pltdomain', None, serial=True)
+	assert plan.estimate(job)['source'] == 'default'
+	job.status, job.start, job.end = 'done', 100.0, 105.0
+	plan.record(job)
+	cached = Job('pltdomain', None, serial=True)
+	cached.status, cached.start, cached.end, cached.cached = 'done', 100.0, 100.1, True
+	plan.record(cached) #came from the ledger, says nothing about how long a plot takes
+	again = planner(tmp_path) #reads back what the first one wrote
+	assert [sample['walltime'] for sample in again.samples['pltdomain']] == [5.0]
+	estimate = again.estimate(job)
+	assert estimate['source'] == 'history' and estimate['seconds'] == 5.0 #2 domains at 2.5 seconds each
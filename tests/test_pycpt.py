@@ -0,0 +1,23 @@
+import os, threading
+
+from pycpt_oo.PYCPT import PYCPT
+
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_dir', 'test.pycpt')
+
+
+def test_reset_shuts_the_background_executor_down():
+	py = PYCPT.from_file(CONFIG)
+	release = threading.Event()
+	running = py.background(release.wait, 10)
+	executor = py.executor
+	assert py.background(lambda: 'done').result(timeout=10) == 'done'
+	py.reset()
+	assert py.executor is None
+	release.set()
+	assert running.result(timeout=10) is True #what was already running still finishes
+	for thread in list(executor._threads):
+		thread.join(timeout=10)
+		assert not thread.is_alive() #and the threads go away with it
+	assert py.background(lambda: 'again').result(timeout=10) == 'again' #a new pool the next time its needed
+	py.reset()
@@ -0,0 +1,65 @@
+import threading, time
+
+import pytest
+
+from pycpt_oo.Job import Job
+from pycpt_oo.Scheduler import Scheduler
+
+
+def step(log, name, delay=0.0):
+	def run():
+		time.sleep(delay)
+		log.append(name)
+		return name
+	return run
+
+def boom():
+	raise RuntimeError('broken')
+
+
+def test_dependencies_run_first():
+	log = []
+	jobs = [Job('a', step(log, 'a', 0.05)), Job('b', step(log, 'b'), deps=['a']), Job('c', step(log, 'c'), deps=['a']), Job('d', step(log, 'd'), deps=['b', 'c'])]
+	assert Scheduler(jobs, workers=3, verbose=False).run() == []
+	assert log[0] == 'a' and log[-1] == 'd'
+	assert all(job.status == 'done' for job in jobs)
+
+def test_serial_jobs_run_on_the_scheduler_thread():
+	threads = {}
+	def where(name):
+		threads[name] = threading.current_thread()
+	jobs = [Job('parallel', where, ('parallel',)), Job('serial', where, ('serial',), deps=['parallel'], serial=True)]
+	Scheduler(jobs, workers=2, verbose=False).run()
+	assert threads['serial'] is threading.current_thread()
+	assert threads['parallel'] is not threading.current_thread()
+
+def test_failure_skips_everything_downstream():
+	log = []
+	jobs = [Job('bad', boom), Job('after', step(log, 'after'), deps=['bad']), Job('later', step(log, 'later'), deps=['after']), Job('other', step(log, 'other'))]
+	scheduler = Scheduler(jobs, workers=2, verbose=False)
+	failed = scheduler.run()
+	assert [job.name for job in failed] == ['bad']
+	assert sorted(job.name for job in scheduler.skipped()) == ['after', 'later']
+	assert log == ['other']
+	assert isinstance(jobs[0].error, RuntimeError)
+
+def test_dependents_wait_for_on_done():
+	seen, order = [], []
+	def on_done(job):
+		time.sleep(0.05) #a slow ledger write - nothing after the job may start before it's done
+		seen.append(job.name)
+	def after(name):
+		order.append((name, list(seen)))
+	jobs = [Job('a', after, ('a',)), Job('plot', after, ('plot',), deps=['a'], serial=True), Job('b', after, ('b',), deps=['a']), Job('c', after, ('c',), deps=['plot', 'b'])]
+	Scheduler(jobs, workers=2, on_done=on_done, verbose=False).run()
+	started = dict(order)
+	assert 'a' in started['plot'] and 'a' in started['b']
+	assert 'plot' in started['c'] and 'b' in started['c']
+
+def test_invalid_graphs_are_refused():
+	with pytest.raises(ValueError):
+		Scheduler([Job('a', boom, deps=['b']), Job('b', boom, deps=['a'])], verbose=False)
+	with pytest.raises(ValueError):
+		Scheduler([Job('a', boom, deps=['missing'])], verbose=False)
+	with pytest.raises(ValueError):
+		Scheduler([Job('a', boom), Job('a', boom)], verbose=False)
@@ -0,0 +1,94 @@
+import http.client, json, os, threading, time
+from pathlib import Path
+
+import pytest
+
+from pycpt_oo.PYCPT import PYCPT
+from pycpt_oo.Service import Service
+
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_dir', 'test.pycpt')
+
+
+def finish(service, run, py):
+	"""stands in for Service._run - what a run leaves behind, without downloading or running CPT"""
+	record = service.records[run]
+	record['directory'] = str(Path(py.workdir, py.work).absolute())
+	for sub, name in [('images', 'map.png'), ('output', 'skill.txt')]:
+		os.makedirs(os.path.join(record['directory'], sub), exist_ok=True)
+		with open(os.path.join(record['directory'], sub, name), 'w') as f:
+			f.write(name)
+	record['status'], record['finished'] = 'done', time.time()
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+	monkeypatch.setattr(Service, 'warm', lambda self: None) #no map borders to load here
+	monkeypatch.setattr(Service, '_run', finish)
+	service = Service(port=0, verbose=False)
+	thread = threading.Thread(target=service.serve_forever, daemon=True)
+	thread.start()
+	while service.server is None:
+		time.sleep(0.01)
+	yield service
+	service.shutdown()
+	thread.join()
+
+@pytest.fixture
+def spec(tmp_path):
+	with open(CONFIG) as f:
+		spec = json.load(f)
+	os.makedirs(str(tmp_path / 'cpt'))
+	open(str(tmp_path / 'cpt' / 'CPT.x'), 'w').close()
+	spec.update(workdir=str(tmp_path), cptdir=str(tmp_path / 'cpt'), verbose=False)
+	return spec
+
+def request(service, method, path, body=None):
+	conn = http.client.HTTPConnection('127.0.0.1', service.server.server_address[1], timeout=10)
+	conn.request(method, path, body=None if body is None else json.dumps(body))
+	response = conn.getresponse()
+	data = response.read()
+	conn.close()
+	return response.status, data
+
+def wait(service, run):
+	while service.records[run]['status'] in ['queued', 'running']:
+		time.sleep(0.01)
+
+
+def test_submit_dedupe_and_status(service, spec, monkeypatch):
+	built, from_dict = [], PYCPT.from_dict
+	monkeypatch.setattr(PYCPT, 'from_dict', lambda params: built.append(params['work']) or from_dict(params))
+	code, body = request(service, 'POST', '/runs', spec)
+	assert code == 202
+	run = json.loads(body)['id']
+	assert run == Service.run_id(spec)
+	wait(service, run)
+	code, body = request(service, 'POST', '/runs', spec)
+	assert code == 200 and json.loads(body) == {'id': run, 'status': 'done', 'duplicate': True}
+	assert len(built) == 1 #the duplicate never got as far as a PYCPT
+	code, body = request(service, 'POST', '/runs?force=1', spec)
+	assert code == 202 and len(built) == 2
+	wait(service, run)
+	code, body = request(service, 'GET', '/runs/' + run)
+	record = json.loads(body)
+	assert code == 200 and record['status'] == 'done'
+	assert record['artifacts'] == ['images/map.png', 'output/skill.txt']
+	assert json.loads(request(service, 'GET', '/runs')[1])[0]['id'] == run
+	assert request(service, 'GET', '/runs/nope')[0] == 404
+
+def test_bad_spec_is_not_kept(service, spec):
+	bad = {key: value for key, value in spec.items() if key != 'models'}
+	code, body = request(service, 'POST', '/runs', bad)
+	assert code == 400 and 'models' in json.loads(body)['error']
+	assert Service.run_id(bad) not in service.records #sending it again, fixed or not, isnt taken for a duplicate
+
+def test_artifacts_stay_inside_the_run(service, spec, tmp_path):
+	run = json.loads(request(service, 'POST', '/runs', spec)[1])['id']
+	wait(service, run)
+	with open(str(tmp_path / 'secret.txt'), 'w') as f:
+		f.write('not for the API')
+	code, body = request(service, 'GET', '/runs/{}/artifacts/images/map.png'.format(run))
+	assert code == 200 and body == b'map.png'
+	for path in ['images/../../secret.txt', '..%2F..%2Fsecret.txt', 'output/..%2F..%2Fsecret.txt', '%2F' + str(tmp_path / 'secret.txt').lstrip('/')]:
+		code, body = request(service, 'GET', '/runs/{}/artifacts/{}'.format(run, path))
+		assert code == 404 and b'not for the API' not in body